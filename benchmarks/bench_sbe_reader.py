@@ -0,0 +1,167 @@
+"""
+Benchmark SBEReader hex decoding against the original per-field decoder.
+
+Run with ctdcal installed (e.g. ``pip install -e .``):
+
+    python benchmarks/bench_sbe_reader.py [n_scans]
+
+A synthetic 911plus cast (5 frequencies, 8 voltages, NMEA position/time, scan time)
+is generated in memory, so no raw data files are needed. Parallel decoding
+(SBEReader workers) is timed on a temporary copy of it, from 1 worker up to the
+number of CPUs.
+"""
+
+import os
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ctdcal import sbe_reader as sbe_rd
+from ctdcal import synthetic
+
+XMLCON = """<?xml version="1.0" encoding="UTF-8"?>
+<SBE_InstrumentConfiguration>
+  <Instrument>
+    <FrequencyChannelsSuppressed>0</FrequencyChannelsSuppressed>
+    <VoltageWordsSuppressed>0</VoltageWordsSuppressed>
+    <SurfaceParVoltageAdded>0</SurfaceParVoltageAdded>
+    <ScanTimeAdded>1</ScanTimeAdded>
+    <NmeaPositionDataAdded>1</NmeaPositionDataAdded>
+    <NmeaDepthDataAdded>0</NmeaDepthDataAdded>
+    <NmeaTimeAdded>1</NmeaTimeAdded>
+    <SensorArray Size="0"></SensorArray>
+  </Instrument>
+</SBE_InstrumentConfiguration>
+"""
+
+HEADER = (
+    "* Sea-Bird SBE 9 Data File:\r\n* System UTC = May 04 2019 18:22:44\r\n*END*\r\n"
+)
+
+
+def synthetic_hex(n_scans, scan_length, seed=0):
+    """Random uppercase hex lines of the correct length, CRLF terminated"""
+    rng = np.random.default_rng(seed)
+    digits = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+    chars = digits[rng.integers(0, 16, size=(n_scans, scan_length))]
+    lines = np.empty((n_scans, scan_length + 2), dtype=np.uint8)
+    lines[:, :scan_length] = chars
+    lines[:, scan_length:] = np.frombuffer(b"\r\n", dtype=np.uint8)
+    return HEADER + lines.tobytes().decode("ascii")
+
+
+def legacy_parse_scans(reader):
+    """The struct.iter_unpack + int(x, 16) decoder previously used by _parse_scans"""
+    unpack_str = "6s" * 5 + "3s" * 8 + f"{reader.scan_length - 54}s"
+    measurements = np.array(
+        [
+            [int(x, 16) for x in line]
+            for line in struct.iter_unpack(unpack_str, b"".join(reader.raw_bytes))
+        ]
+    )
+    measurements[:, :5] = measurements[:, :5] / 256
+    measurements[:, 5:13] = 5 * (1 - (measurements[:, 5:13] / 4095))
+    return measurements[:, 0:-1]
+
+
+def legacy_parse_scans_meta(reader):
+    """The per-scan CSV string metadata decoder previously used by _parse_scans_meta"""
+    output = []
+    for line in struct.iter_unpack("54s14s8s3s1s2s8s", b"".join(reader.raw_bytes)):
+        _, pos, nmea_time, pressure_temp, status, _, scan_time = line
+        tokens = [pos[i : i + 2] for i in range(0, 14, 2)]
+        output.append(
+            f"{reader._location_fix(*tokens)},"
+            f"{reader._sbe_time(reader._reverse_bytes(nmea_time), 'nmea')},"
+            f"{int(pressure_temp, 16)},"
+            f"{reader._pump_status(status)},{reader._bottle_fire(status)},"
+            f"{reader._sbe_time(reader._reverse_bytes(scan_time), 'scan')}"
+        )
+    return [row.split(",") for row in output]
+
+
+def timeit(func, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_workers(n_scans):
+    """Decode a memory-mapped file with 1 to (number of CPUs) worker processes"""
+    reader = sbe_rd.SBEReader(HEADER, XMLCON)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        hex_path, xmlcon_path = (
+            Path(tmp_dir) / "bench.hex",
+            Path(tmp_dir) / "bench.xmlcon",
+        )
+        hex_path.write_text(synthetic_hex(n_scans, reader.scan_length), newline="")
+        xmlcon_path.write_text(XMLCON)
+
+        n_cpus = os.cpu_count() or 1
+        t_serial = None
+        for workers in sorted({1, 2, 4, 8, n_cpus} & set(range(1, n_cpus + 1))):
+            reader = sbe_rd.SBEReader.from_paths(
+                hex_path, xmlcon_path, mmap=True, workers=workers
+            )
+
+            def decode():
+                reader.clear_cache()
+                return reader.parsed_scans, reader.parsed_meta
+
+            t_workers, _ = timeit(decode)
+            t_serial = t_serial or t_workers
+            print(
+                f"{workers:2d} worker(s):  {t_workers:8.3f} s  "
+                f"({t_serial / t_workers:.1f}x)"
+            )
+
+
+def main(n_scans=250_000):
+    reader = sbe_rd.SBEReader(HEADER, XMLCON)
+    reader = sbe_rd.SBEReader(synthetic_hex(n_scans, reader.scan_length), XMLCON)
+    print(f"{n_scans} scans, {reader.scan_length} chars/scan")
+
+    t_legacy, legacy = timeit(lambda: legacy_parse_scans(reader), repeat=1)
+    t_new, new = timeit(reader._parse_scans)
+    assert np.array_equal(new, legacy.astype(float))
+
+    print(f"legacy decoder:     {t_legacy:8.3f} s")
+    print(f"vectorized decoder: {t_new:8.3f} s  ({t_legacy / t_new:.0f}x faster)")
+
+    # pressure + primary T/C only
+    reader.channels = [0, 1, 2]
+    t_projected, _ = timeit(reader._parse_scans)
+    reader.channels = None
+    print(
+        f"3 of 13 channels:   {t_projected:8.3f} s  ({t_new / t_projected:.1f}x faster)"
+    )
+
+    t_legacy, _ = timeit(lambda: legacy_parse_scans_meta(reader), repeat=1)
+    t_new, _ = timeit(reader._parse_scans_meta)
+    print(f"legacy metadata decoder:     {t_legacy:8.3f} s")
+    print(
+        f"structured metadata decoder: {t_new:8.3f} s  ({t_legacy / t_new:.0f}x faster)"
+    )
+
+    # synthetic cast generation (profile -> raw counts -> hex scan lines)
+    profile = synthetic.cast_profile(max_pressure=n_scans / 48)
+    t_gen, _ = timeit(
+        lambda: synthetic.encode_scans(XMLCON, synthetic.raw_counts(XMLCON, profile))
+    )
+    print(
+        f"synthetic .hex encoder:      {t_gen:8.3f} s  "
+        f"({len(profile) / t_gen:,.0f} scans/s)"
+    )
+
+    bench_workers(n_scans)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
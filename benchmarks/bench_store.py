@@ -0,0 +1,109 @@
+"""
+Benchmark loading intermediate CTD files from the columnar store (ctdcal.store)
+against the pickles previously used for converted/time/bottle files.
+
+Run with ctdcal installed (e.g. ``pip install -e .``):
+
+    python benchmarks/bench_store.py [n_scans]
+
+A synthetic converted cast (24 float channels plus metadata columns) is written in
+both formats to a temporary directory. Each load is timed in a fresh process, which
+also reports how much its resident memory (RSS, read from /proc so Linux only) grew.
+Loads are of the whole file and of the 3 columns a stage typically needs, both just
+loaded and after reading every value (column means).
+"""
+
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ctdcal import store
+
+COLUMNS = ["CTDPRS", "CTDTMP1", "CTDCOND1"]
+
+# run in a fresh interpreter: time the load, then report RSS growth (in MiB)
+LOAD_SCRIPT = """
+import json, os, sys, time
+import pandas as pd
+from ctdcal import store
+
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+fmt, path, columns, use = sys.argv[1:]
+columns = json.loads(columns)
+baseline = rss()
+start = time.perf_counter()
+if fmt == "pickle":
+    df = pd.read_pickle(path)
+    if columns is not None:
+        df = df[columns]
+else:
+    df = store.load(path, columns=columns)
+if use == "1":
+    df.mean()
+elapsed = time.perf_counter() - start
+print(json.dumps({"time": elapsed, "rss": rss() - baseline}))
+"""
+
+
+def converted_df(n_scans, seed=0):
+    """Converted-like cast: float64 channels, bool/int metadata, unix times"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        rng.normal(size=(n_scans, 24)),
+        columns=COLUMNS + [f"CHANNEL{i}" for i in range(21)],
+    )
+    df["pump_on"] = rng.random(n_scans) > 0.01
+    df["btl_fire"] = rng.random(n_scans) > 0.99
+    df["pressure_temp_int"] = rng.integers(0, 4096, n_scans)
+    df["scan_datetime"] = 1.6e9 + np.arange(n_scans) / 24
+    return df
+
+
+def load(fmt, path, columns=None, use=False):
+    result = subprocess.run(
+        [sys.executable, "-c", LOAD_SCRIPT, fmt, str(path), json.dumps(columns)]
+        + ["1" if use else "0"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def main(n_scans=500_000):
+    df = converted_df(n_scans)
+    size = df.memory_usage().sum() / 2**20
+    print(f"{n_scans} scans x {df.shape[1]} columns ({size:.0f} MiB in memory)")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pickle_file = Path(tmp_dir) / "pickle" / "00101.pkl"
+        pickle_file.parent.mkdir()
+        df.to_pickle(pickle_file)
+        store_dir = Path(tmp_dir) / "store" / "00101"
+        store.save(df, store_dir)
+
+        for columns, label in [(None, "all columns"), (COLUMNS, "3 columns")]:
+            for use in [False, True]:
+                print(f"{label}, {'values read' if use else 'loaded only'}:")
+                results = {
+                    fmt: load(fmt, path, columns, use)
+                    for fmt, path in [("pickle", pickle_file), ("store", store_dir)]
+                }
+                for fmt, result in results.items():
+                    speedup = results["pickle"]["time"] / result["time"]
+                    print(
+                        f"  {fmt:6s}  {result['time']:8.3f} s ({speedup:5.1f}x)  "
+                        f"+{result['rss']:6.1f} MiB RSS"
+                    )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
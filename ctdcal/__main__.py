@@ -94,25 +94,46 @@ def import_data():
     type=click.Choice(["ODF", "PMEL"], case_sensitive=False),
     default="ODF",
 )
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of casts to convert from .hex in parallel",
+)
 # @click.option(
 #     "-t",
 #     "--type",
 #     type=click.Choice(["bottle", "ctd", "all"], case_sensitive=False),
 #     default="all",
 # )
-def process(group):
+def process(group, jobs):
     """Process data using a particular group's methodology"""
 
     if group == "ODF":
         from .scripts.odf_process_all import odf_process_all
 
         log.info("Starting ODF processing run")
-        odf_process_all()
+        odf_process_all(jobs=jobs)
     elif group == "PMEL":
         # pmel_process()
         raise NotImplementedError
 
 
+@cli.command()
+@click.argument("ssscc", nargs=-1)
+def recalibrate(ssscc):
+    """Reconvert casts from cached raw counts with updated .XMLCON coefficients
+
+    Converts all casts in ssscc.csv unless SSSCC are given.
+    """
+    from . import convert, process_ctd
+
+    ssscc_list = list(ssscc) or process_ctd.get_ssscc_list()
+    log.info(f"Recalibrating {len(ssscc_list)} casts")
+    convert.recalibrate(ssscc_list)
+
+
 @cli.command()
 def cruise_report():
     """Generate bottle residual figures for cruise report"""
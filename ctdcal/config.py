@@ -40,6 +40,7 @@ dirs = {
     "reft": "data/reft/",
     "oxygen": "data/oxygen/",
     "logs": "data/logs/",
+    "cache": "data/cache/",
 }
 fig_dirs = {
     "t1": "data/logs/fitting_figs/temp_primary/",
@@ -50,6 +51,27 @@ fig_dirs = {
     "rinko": "data/logs/fitting_figs/oxy_rinko/",
 }
 
+# Storage dtypes of converted, time and bottle mean data by column name pattern
+# (fnmatch-style, first match wins). Columns not matched keep their converted dtype,
+# i.e. float64 for pressure, temperature, conductivity, salinity and oxygen.
+# Channels with far less precision than float32 (voltages, fluorometer,
+# transmissometer, altimeter) are stored as float32. Set to {} to keep float64.
+ctd_dtypes = {
+    "CTDOXYVOLTS": "float32",
+    "U_DEF_*": "float32",
+    "FREE*": "float32",
+    "ALT": "float32",
+    "CTDXMISS*": "float32",
+    "*FLUOR*": "float32",
+    "*PAR": "float32",
+    "CTDBACKSCATTER*": "float32",
+    "pump_on": "bool",
+    "btl_fire": "bool",
+    "new_fix": "bool",
+    "pressure_temp_int": "int16",
+    "*_FLAG_W": "int16",
+}
+
 # remnant of old system, will be pushed into xarray metadata/attrs
 # Labels for CTD columns
 column = {
@@ -2,7 +2,11 @@
 A module for handling SeaBird raw .HEX files, including the generation of bottle-extractions, downcast isolation, and SBE3/4C handling.
 """
 
+import json
 import logging
+import re
+import traceback
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import gsw
@@ -10,10 +14,12 @@ import numpy as np
 import pandas as pd
 
 from . import equations_sbe as sbe_eq
-from . import get_ctdcal_config
+from . import get_ctdcal_config, io
 from . import process_bottle as btl
 from . import process_ctd as process_ctd
 from . import sbe_reader as sbe_rd
+from . import store
+from .manifest import Manifest, value_hash
 
 cfg = get_ctdcal_config()
 log = logging.getLogger(__name__)
@@ -117,40 +123,375 @@ short_lookup = {
 }
 
 
-def hex_to_ctd(ssscc_list):
+def xmlcon_summary(ssscc_list):
+    """
+    Hash the .XMLCON file of each cast and parse each distinct configuration once,
+    storing the results in the cruise-wide cache (see sbe_reader.parse_xmlcon).
+
+    Parameters
+    ----------
+    ssscc_list : list of str
+        List of stations to check
+
+    Returns
+    -------
+    pd.DataFrame
+        SSSCC and xmlcon_hash of each cast
+    """
+    hashes = []
+    for ssscc in ssscc_list:
+        with open(cfg.dirs["raw"] + ssscc + ".XMLCON", encoding="cp437") as f:
+            xml_config = f.read()
+        sbe_rd.parse_xmlcon(xml_config, cache_dir=cfg.dirs["cache"])
+        hashes.append(sbe_rd.xmlcon_hash(xml_config))
+
+    summary = pd.DataFrame({"SSSCC": ssscc_list, "xmlcon_hash": hashes})
+    n_configs = summary["xmlcon_hash"].nunique()
+    log.info(f"{len(summary)} casts use {n_configs} distinct .XMLCON configuration(s)")
+    if n_configs > 1:
+        for xml_hash, casts in summary.groupby("xmlcon_hash", sort=False)["SSSCC"]:
+            log.info(
+                f"  {xml_hash[:12]}: {casts.iloc[0]}-{casts.iloc[-1]} ({len(casts)})"
+            )
+
+    return summary
+
+
+def _hex_files(ssscc):
+    """
+    Raw .hex file(s) of a cast. Casts split by acquisition restarts (e.g. 00101.hex,
+    00101a.hex, 00101b.hex) are returned as an ordered list, to be stitched together.
+    """
+    hex_files = sorted(
+        str(f)
+        for f in Path(cfg.dirs["raw"]).glob(f"{ssscc}*.hex")
+        if re.fullmatch(f"{ssscc}[a-z]?", f.stem)
+    )
+    if len(hex_files) <= 1:
+        return cfg.dirs["raw"] + ssscc + ".hex"
+    return hex_files
+
+
+def hex_to_ctd(ssscc_list, salvage=None, jobs=None):
     # TODO: add (some) error handling from odf_convert_sbe.py
     """
-    Convert raw CTD data and export to .pkl files.
+    Convert raw CTD data and save to the converted directory (see ctdcal.store).
+
+    Casts are skipped if already converted, unless their .hex or .XMLCON files have
+    changed since (tracked by content hash in the build manifest, see
+    ctdcal.manifest). Casts split across several .hex files (00101.hex, 00101a.hex,
+    ...) are stitched back together.
+
+    A cast that fails to convert is logged and the remaining casts are still
+    converted; a RuntimeError listing the failed casts is raised at the end.
 
     Parameters
     ----------
     ssscc_list : list of str
         List of stations to convert
+    salvage : {None, "drop", "nan"}, optional
+        How to handle malformed scan lines (see SBEReader._check_scan_lengths),
+        default is to raise an error
+    jobs : int, optional
+        Number of casts to convert in parallel (in separate processes), default
+        is one at a time. Output files and log messages are the same either way.
 
     Returns
     -------
 
     """
     log.info("Converting .hex files")
-    for ssscc in ssscc_list:
-        if not Path(cfg.dirs["converted"] + ssscc + ".pkl").exists():
-            hexFile = cfg.dirs["raw"] + ssscc + ".hex"
-            xmlconFile = cfg.dirs["raw"] + ssscc + ".XMLCON"
-            sbeReader = sbe_rd.SBEReader.from_paths(hexFile, xmlconFile)
-            converted_df = convertFromSBEReader(sbeReader, ssscc)
-            converted_df.to_pickle(cfg.dirs["converted"] + ssscc + ".pkl")
+    summary = xmlcon_summary(ssscc_list)
+    manifest = Manifest(cfg.dirs["cache"])
+    legacy_hashes = _load_xmlcon_hashes()
+    casts = []
+    for ssscc, xml_hash in summary.itertuples(index=False):
+        inputs = _convert_inputs(manifest, ssscc, xml_hash, salvage)
+        if manifest.inputs("convert", ssscc) is None and ssscc in legacy_hashes:
+            # .XMLCON hash tracked before the build manifest (.hex assumed unchanged)
+            manifest.record(
+                "convert", ssscc, {**inputs, "xmlcon": legacy_hashes[ssscc]}
+            )
+        recorded = manifest.inputs("convert", ssscc)
+        output_exists = store.exists(cfg.dirs["converted"] + ssscc)
+        if manifest.outdated("convert", ssscc, inputs, output_exists):
+            # if only coefficients/dtypes changed, start from cached raw counts
+            from_counts = recorded is not None and all(
+                recorded.get(key) == value
+                for key, value in inputs.items()
+                if key not in ("xmlcon", "dtypes")
+            )
+            casts.append((ssscc, inputs, from_counts))
+
+    if jobs is not None and jobs > 1 and len(casts) > 1:
+        errors = _convert_casts_parallel(casts, salvage, jobs)
+    else:
+        errors = [
+            _try_convert_cast(ssscc, from_counts, salvage)
+            for ssscc, _, from_counts in casts
+        ]
+
+    # failed casts keep their old record (if any), so they are retried next time
+    failed = []
+    for (ssscc, inputs, _), error in zip(casts, errors):
+        if error is None:
+            manifest.record("convert", ssscc, inputs)
+        else:
+            failed.append(ssscc)
+    manifest.save()
+    Path(cfg.dirs["cache"] + "xmlcon_hashes.csv").unlink(missing_ok=True)
+    if failed:
+        raise RuntimeError(f"Failed to convert {len(failed)} cast(s): {failed}")
+
+    return True
+
+
+def _try_convert_cast(ssscc, from_counts=False, salvage=None):
+    """
+    Convert a cast for hex_to_ctd, starting from cached raw counts if from_counts.
+    Errors are logged and returned (as a string) instead of raised, None on success.
+    """
+    try:
+        sbeReader = _read_counts(ssscc) if from_counts else None
+        _convert_cast(ssscc, sbeReader, salvage=salvage)
+    except Exception as err:
+        log.error(f"Failed to convert {ssscc}: {err!r}\n{traceback.format_exc()}")
+        return repr(err)
+    return None
+
+
+class _RecordList(logging.Handler):
+    """Collects log records (made picklable) to send back from worker processes."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        self.records.append(record)
+
+
+def _convert_cast_job(ssscc, from_counts, salvage, dirs, log_level):
+    """
+    Run _try_convert_cast in a hex_to_ctd worker process. Log records are collected
+    and returned alongside the result, for the parent process to emit in cast order.
+    """
+    cfg.dirs = dirs  # e.g. if worker processes are spawned rather than forked
+    ctdcal_log = logging.getLogger("ctdcal")
+    ctdcal_log.setLevel(log_level)
+    ctdcal_log.propagate = False
+    records = _RecordList()
+    ctdcal_log.addHandler(records)
+    try:
+        error = _try_convert_cast(ssscc, from_counts, salvage)
+    finally:
+        ctdcal_log.removeHandler(records)
+        ctdcal_log.propagate = True
+    return error, records.records
+
+
+def _convert_casts_parallel(casts, salvage, jobs):
+    """
+    Convert (ssscc, inputs, from_counts) casts in a pool of jobs processes. Each
+    cast's log messages are emitted together, in cast order, once it is done.
+    Returns the error (or None) of each cast.
+    """
+    log.info(f"Converting {len(casts)} casts with {jobs} processes")
+    log_level = logging.getLogger("ctdcal").getEffectiveLevel()
+    errors = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(
+                _convert_cast_job, ssscc, from_counts, salvage, cfg.dirs, log_level
+            )
+            for ssscc, _, from_counts in casts
+        ]
+        for future in futures:
+            error, records = future.result()
+            for record in records:
+                logging.getLogger(record.name).handle(record)
+            errors.append(error)
+    return errors
+
+
+def recalibrate(ssscc_list):
+    """
+    Re-apply sensor conversions with the current .XMLCON coefficients to the raw
+    counts cached by hex_to_ctd, without decoding the .hex files again. Casts
+    without a (compatible) raw-count cache, or whose .hex files changed since they
+    were cached, are decoded from .hex instead, with the salvage mode they were last
+    converted with.
+
+    Parameters
+    ----------
+    ssscc_list : list of str
+        List of stations to recalibrate
+
+    Returns
+    -------
+
+    """
+    log.info("Recalibrating from cached raw counts")
+    summary = xmlcon_summary(ssscc_list)
+    manifest = Manifest(cfg.dirs["cache"])
+    try:
+        for ssscc, xml_hash in summary.itertuples(index=False):
+            # cached counts were decoded with the recorded salvage mode, and .hex
+            # files are decoded with it again
+            recorded = manifest.inputs("convert", ssscc) or {}
+            salvage = recorded.get("salvage")
+            inputs = _convert_inputs(manifest, ssscc, xml_hash, salvage)
+            if recorded.get("hex") != inputs["hex"]:
+                # counts (if any) are from other .hex data, or can't be checked
+                log.warning(f"{ssscc} .hex file(s) changed since cached, decoding")
+                sbeReader = None
+            else:
+                sbeReader = _read_counts(ssscc)
+                if sbeReader is None:
+                    log.warning(
+                        f"No usable raw-count cache for {ssscc}, decoding .hex file"
+                    )
+            _convert_cast(ssscc, sbeReader, salvage=salvage)
+            manifest.record("convert", ssscc, inputs)
+    finally:
+        manifest.save()
 
     return True
 
 
+def _convert_inputs(manifest, ssscc, xml_hash, salvage=None):
+    """
+    Build manifest inputs of a converted cast: raw files, salvage mode and storage
+    dtypes.
+    """
+    return {
+        "hex": manifest.files_hash(_hex_files(ssscc)),
+        "xmlcon": xml_hash,
+        "salvage": salvage,
+        "dtypes": value_hash(cfg.ctd_dtypes),
+    }
+
+
+def _load_xmlcon_hashes():
+    """
+    .XMLCON hash of each cast at its last conversion, as {SSSCC: hash}, from the
+    xmlcon_hashes.csv used before the build manifest (empty if there is none).
+    """
+    hash_file = Path(cfg.dirs["cache"] + "xmlcon_hashes.csv")
+    if not hash_file.exists():
+        return {}
+    converted_hashes = pd.read_csv(hash_file, dtype=str)
+    return dict(converted_hashes.itertuples(index=False))
+
+
+def _read_counts(ssscc):
+    """
+    SBEReader of a cast's cached raw counts with its current .XMLCON, or None if
+    there is no cache or its scan layout no longer matches.
+    """
+    counts_file = Path(cfg.dirs["cache"] + "counts/" + ssscc + ".npz")
+    if not counts_file.exists():
+        return None
+    with open(cfg.dirs["raw"] + ssscc + ".XMLCON", encoding="cp437") as f:
+        xml_config = f.read()
+    try:
+        return sbe_rd.SBEReader.from_npz(counts_file, xml_config=xml_config)
+    except ValueError as err:
+        log.warning(f"Ignoring raw-count cache for {ssscc}: {err}")
+        return None
+
+
+def _converted_data(ssscc, sbeReader=None, salvage=None):
+    """
+    Convert a cast, decoding its .hex file(s) unless an SBEReader is given. Raw
+    counts decoded from .hex are saved for recalibrate.
+    """
+    from_hex = sbeReader is None
+    if from_hex:
+        hexFile = _hex_files(ssscc)
+        if isinstance(hexFile, list):
+            log.info(f"Stitching {len(hexFile)} .hex files for {ssscc}")
+        xmlconFile = cfg.dirs["raw"] + ssscc + ".XMLCON"
+        sbeReader = sbe_rd.SBEReader.from_paths(
+            hexFile, xmlconFile, cache_dir=cfg.dirs["cache"], salvage=salvage
+        )
+    converted_df = convertFromSBEReader(sbeReader, ssscc)
+    if from_hex:
+        sbeReader.to_npz(cfg.dirs["cache"] + "counts/" + ssscc + ".npz")
+
+    return converted_df
+
+
+def _convert_cast(ssscc, sbeReader=None, salvage=None):
+    """
+    Convert a cast (see _converted_data), save it, and remove time/bottle files made
+    from an earlier conversion so they are regenerated.
+    """
+    converted_df = _converted_data(ssscc, sbeReader, salvage=salvage)
+    store.save(converted_df, cfg.dirs["converted"] + ssscc)
+
+    for stale_file in [
+        cfg.dirs["time"] + ssscc + "_time",
+        cfg.dirs["bottle"] + ssscc + "_btl_mean",
+    ]:
+        store.remove(stale_file)
+
+
+def process_cast(ssscc, sbeReader=None, salvage=None):
+    """
+    Convert a cast and make its time and bottle mean files in one pass, keeping the
+    converted data in memory instead of saving it for make_time_files and
+    make_btl_mean to read back.
+
+    Only the time and bottle mean files are written, besides the cast logs and the
+    raw-count cache used by recalibrate. No converted file is saved, and the build
+    manifest is not updated, so casts can be processed in parallel (e.g. with
+    concurrent.futures.ProcessPoolExecutor); the shared cast logs are locked while
+    each row is written (see io.write_log_row). The staged functions (hex_to_ctd,
+    make_time_files, make_btl_mean) remain the way to rebuild only changed casts.
+
+    Parameters
+    ----------
+    ssscc : str
+        Station/cast to process
+    sbeReader : SBEReader, optional
+        Reader of the cast's scans, defaults to decoding its .hex file(s)
+    salvage : {None, "drop", "nan"}, optional
+        How to handle malformed scan lines when decoding .hex files (see
+        SBEReader._check_scan_lengths), default is to raise an error
+
+    Returns
+    -------
+    time_df : DataFrame
+        Continuous, filtered downcast data (as saved to the time file)
+    mean_df : DataFrame
+        Data averaged at each bottle stop (as saved to the bottle mean file)
+    """
+    converted_df = _converted_data(ssscc, sbeReader, salvage=salvage)
+
+    mean_df = _btl_mean_data(converted_df, ssscc)
+    store.save(mean_df, cfg.dirs["bottle"] + ssscc + "_btl_mean")
+
+    time_df = _time_data(converted_df, ssscc)
+    store.save(time_df, cfg.dirs["time"] + ssscc + "_time")
+
+    return time_df, mean_df
+
+
 def make_time_files(ssscc_list):
     """
-    Make continuous time.pkl files from converted files in hex_to_ctd.
+    Make continuous time files from converted files in hex_to_ctd.
 
     Data have a generic roll filter applied. Columns to filter are defined in the config.
-    
+
     The time on deck, the soak, and the upcast are removed to provide a continuous downcast.
     
+    Casts are skipped if already processed, unless their converted data or the
+    column/filter config have changed since (see ctdcal.manifest).
+
     Parameters
     ----------
     ssscc_list : list of str
@@ -158,60 +499,19 @@ def make_time_files(ssscc_list):
 
     Returns
     -------
-    .PKL file of continuous, filtered downcast data.
+    Columnar store (see ctdcal.store) of continuous, filtered downcast data.
     """
-    log.info("Generating time.pkl files")
+    log.info("Generating time files")
+    manifest = Manifest(cfg.dirs["cache"])
+    config = value_hash({"column": cfg.column, "filter_cols": cfg.filter_cols})
     for ssscc in ssscc_list:
-        if not Path(cfg.dirs["time"] + ssscc + "_time.pkl").exists():
-            converted_df = pd.read_pickle(cfg.dirs["converted"] + ssscc + ".pkl")
-
-            # Remove any pressure spikes
-            bad_rows = converted_df["CTDPRS"].abs() > 6500
-            if bad_rows.any():
-                log.debug(f"{ssscc}: {bad_rows.sum()} bad pressure points removed.")
-            converted_df.loc[bad_rows, :] = np.nan
-            converted_df.interpolate(limit=24, limit_area="inside", inplace=True)
-
-            # Trim to times when rosette is in water
-            trimmed_df = process_ctd.remove_on_deck(
-                converted_df,
-                ssscc,
-                log_file=cfg.dirs["logs"] + "ondeck_pressure.csv",
-            )
-
-            # # TODO: switch to loop instead, e.g.:
-            # align_cols = [cfg.column[x] for x in ["c1", "c2"]]  # "dopl" -> "CTDOXY1"
-
-            # if not c1_col in raw_data.dtype.names:
-            #     print('c1_col data not found, skipping')
-            # else:
-            #     raw_data = process_ctd.ctd_align(raw_data, c1_col, float(tc1_align))
-            # if not c2_col in raw_data.dtype.names:
-            #     print('c2_col data not found, skipping')
-            # else:
-            #     raw_data = process_ctd.ctd_align(raw_data, c2_col, float(tc2_align))
-            # if not dopl_col in raw_data.dtype.names:
-            #     print('do_col data not found, skipping')
-            # else:
-            #     raw_data = process_ctd.ctd_align(raw_data, dopl_col, float(do_align))
-
-            # TODO: add despike/wild edit filter (optional?)
-
-            # Filter data
-            filter_data = process_ctd.raw_ctd_filter(
-                trimmed_df,
-                window="triangle",
-                parameters=cfg.filter_cols,
-            )
-
-            # Trim to downcast
-            cast_data = process_ctd.cast_details(
-                filter_data,
-                ssscc,
-                log_file=cfg.dirs["logs"] + "cast_details.csv",
-            )
-
-            cast_data.to_pickle(cfg.dirs["time"] + ssscc + "_time.pkl")
+        time_file = cfg.dirs["time"] + ssscc + "_time"
+        inputs = {"converted": manifest.digest("convert", ssscc), "config": config}
+        if manifest.outdated("time", ssscc, inputs, store.exists(time_file)):
+            converted_df = store.load(cfg.dirs["converted"] + ssscc)
+            store.save(_time_data(converted_df, ssscc), time_file)
+            manifest.record("time", ssscc, inputs)
+    manifest.save()
 
 
 def make_btl_mean(ssscc_list):
@@ -219,6 +519,9 @@ def make_btl_mean(ssscc_list):
     """
     Create "bottle mean" files from continuous CTD data averaged at the bottle stops.
 
+    Casts are skipped if already processed, unless their converted data have changed
+    since (see ctdcal.manifest).
+
     Parameters
     ----------
     ssscc_list : list of str
@@ -229,71 +532,166 @@ def make_btl_mean(ssscc_list):
     boolean
         bottle averaging of mean has finished successfully
     """
-    log.info("Generating btl_mean.pkl files")
+    log.info("Generating btl_mean files")
+    manifest = Manifest(cfg.dirs["cache"])
     for ssscc in ssscc_list:
-        if not Path(cfg.dirs["bottle"] + ssscc + "_btl_mean.pkl").exists():
-            imported_df = pd.read_pickle(cfg.dirs["converted"] + ssscc + ".pkl")
-            bottle_df = btl.retrieveBottleData(imported_df)
-            mean_df = btl.bottle_mean(bottle_df)
-
-            # export bottom bottle time/lat/lon info
-            fname = cfg.dirs["logs"] + "bottom_bottle_details.csv"
-            datetime_col = "nmea_datetime"
-            if datetime_col not in mean_df.columns:
-                log.debug(
-                    f"'{datetime_col}' not found in DataFrame - using 'scan_datetime'"
-                )
-                datetime_col = "scan_datetime"
+        btl_file = cfg.dirs["bottle"] + ssscc + "_btl_mean"
+        inputs = {"converted": manifest.digest("convert", ssscc)}
+        if manifest.outdated("btl_mean", ssscc, inputs, store.exists(btl_file)):
+            converted_df = store.load(cfg.dirs["converted"] + ssscc)
+            store.save(_btl_mean_data(converted_df, ssscc), btl_file)
+            manifest.record("btl_mean", ssscc, inputs)
+    manifest.save()
 
-            bot_df = mean_df[[datetime_col, "GPSLAT", "GPSLON"]].head(1)
-            bot_df.columns = ["bottom_time", "latitude", "longitude"]
-            bot_df.insert(0, "SSSCC", ssscc)
-            add_header = not Path(fname).exists()  # add header iff file doesn't exist
-            with open(fname, "a") as f:
-                bot_df.to_csv(f, mode="a", header=add_header, index=False)
+    return True
 
-            mean_df.to_pickle(cfg.dirs["bottle"] + ssscc + "_btl_mean.pkl")
 
-    return True
+def _time_data(converted_df, ssscc):
+    """
+    Continuous, filtered downcast data of a converted cast, as saved to its time
+    file (see make_time_files). converted_df is not modified.
+    """
+    # Remove any pressure spikes, then interpolate over them and any short gaps
+    # (e.g. dropped scans). NaN only fits the float, not bool/int metadata columns
+    float_cols = converted_df.select_dtypes("float").columns
+    converted_df = converted_df.copy()  # e.g. still needed for bottle means
+    bad_rows = converted_df["CTDPRS"].abs() > 6500
+    if bad_rows.any():
+        log.debug(f"{ssscc}: {bad_rows.sum()} bad pressure points removed.")
+        converted_df.loc[bad_rows, float_cols] = np.nan
+    converted_df[float_cols] = converted_df[float_cols].interpolate(
+        limit=24, limit_area="inside"
+    )
 
+    # Trim to times when rosette is in water
+    trimmed_df = process_ctd.remove_on_deck(
+        converted_df,
+        ssscc,
+        log_file=cfg.dirs["logs"] + "ondeck_pressure.csv",
+    )
 
-def convertFromSBEReader(sbeReader, ssscc):
-    """Handler to convert engineering data to sci units automatically.
-    Takes SBEReader object that is already connected to the .hex and .XMLCON files.
+    # # TODO: switch to loop instead, e.g.:
+    # align_cols = [cfg.column[x] for x in ["c1", "c2"]]  # "dopl" -> "CTDOXY1"
+
+    # if not c1_col in raw_data.dtype.names:
+    #     print('c1_col data not found, skipping')
+    # else:
+    #     raw_data = process_ctd.ctd_align(raw_data, c1_col, float(tc1_align))
+    # if not c2_col in raw_data.dtype.names:
+    #     print('c2_col data not found, skipping')
+    # else:
+    #     raw_data = process_ctd.ctd_align(raw_data, c2_col, float(tc2_align))
+    # if not dopl_col in raw_data.dtype.names:
+    #     print('do_col data not found, skipping')
+    # else:
+    #     raw_data = process_ctd.ctd_align(raw_data, dopl_col, float(do_align))
+
+    # TODO: add despike/wild edit filter (optional?)
+
+    # Filter data
+    filter_data = process_ctd.raw_ctd_filter(
+        trimmed_df,
+        window="triangle",
+        parameters=cfg.filter_cols,
+    )
+
+    # Trim to downcast
+    cast_data = process_ctd.cast_details(
+        filter_data,
+        ssscc,
+        log_file=cfg.dirs["logs"] + "cast_details.csv",
+    )
+
+    # filtering upcasts float32 channels, store them compactly again
+    return store.compact(cast_data, cfg.ctd_dtypes)
+
+
+def _btl_mean_data(converted_df, ssscc):
+    """
+    Data of a converted cast averaged at each bottle stop, as saved to its bottle
+    mean file (see make_btl_mean). The bottom bottle is logged to
+    bottom_bottle_details.csv.
     """
+    # shallow copy, retrieveBottleData adds a bottle number column to its input
+    bottle_df = btl.retrieveBottleData(converted_df.copy(deep=False))
+    mean_df = btl.bottle_mean(bottle_df)
 
-    # Retrieve parsed scans and convert to dataframe
-    rawData = sbeReader.parsed_scans
-    raw_df = pd.DataFrame(rawData).apply(pd.to_numeric, errors="ignore")
-    raw_df.index.name = "index"
-
-    # Metadata needs to be processed seperately and then joined with the converted data
-    log.info(f"Building metadata dataframe for {ssscc}")
-    metaArray = [line.split(",") for line in sbeReader._parse_scans_meta().tolist()]
-    meta_cols, meta_dtypes = sbeReader._breakdown_header()
-    meta_df = pd.DataFrame(metaArray)
-    meta_df.columns = meta_cols
-    meta_df.index.name = "index"
-
-    for col, dtype in zip(meta_cols, meta_dtypes):
-        if dtype != "bool_":
-            meta_df[col] = meta_df[col].astype(dtype)
-        else:
-            # map from string "pseudo-boolean" to actual boolean values
-            meta_df[col] = meta_df[col].map({"True": True, "False": False})
+    # export bottom bottle time/lat/lon info
+    fname = cfg.dirs["logs"] + "bottom_bottle_details.csv"
+    datetime_col = "nmea_datetime"
+    if datetime_col not in mean_df.columns:
+        log.debug(f"'{datetime_col}' not found in DataFrame - using 'scan_datetime'")
+        datetime_col = "scan_datetime"
+
+    bot_df = mean_df[[datetime_col, "GPSLAT", "GPSLON"]].head(1)
+    bot_df.columns = ["bottom_time", "latitude", "longitude"]
+    bot_df.insert(0, "SSSCC", ssscc)
+    io.write_log_row(bot_df, fname)
+
+    return store.compact(mean_df, cfg.ctd_dtypes)
 
-    log.info("Success!")
 
-    t_probe = meta_df["pressure_temp_int"].tolist()  # raw int from Digitquartz T probe
+def _read_chunks(sbeReader, chunk_size):
+    """
+    Assemble full-cast scan/metadata arrays from SBEReader.iter_chunks, so that
+    only chunk_size scans are ever being decoded at once. This bounds the decoding
+    scratch arrays, not the cast: the assembled raw counts (and the converted data
+    made from them) are still the size of the whole cast.
+    """
+    rawData, metaData = None, None
+    for chunk_scans, chunk_meta in sbeReader.iter_chunks(chunk_size):
+        if rawData is None:
+            rawData = np.empty((sbeReader.n_scans, chunk_scans.shape[1]))
+            metaData = np.empty(sbeReader.n_scans, dtype=chunk_meta.dtype)
+            start = 0
+        stop = start + len(chunk_meta)
+        rawData[start:stop] = chunk_scans
+        metaData[start:stop] = chunk_meta
+        start = stop
+
+    if rawData is None:  # no scans in file
+        return sbeReader.parsed_scans, sbeReader.parsed_meta
+    return rawData, metaData
+
+
+def _fill_scan_gaps(converted_df, gaps, meta_cols, sample_rate):
+    """
+    Insert rows for scans missing from the .hex file and drop duplicated scans
+    (see SBEReader.scan_gaps), so that rows stay evenly spaced in time. Converted
+    channels are NaN in inserted rows. Of the metadata columns, scan_datetime counts
+    on at sample_rate from the last scan before the gap, other float columns (NMEA
+    position and time) are interpolated, and non-float columns (pump status, bottle
+    fire, etc.) carry forward the previous value.
+    """
+    skipped = np.zeros(len(converted_df), dtype=int)
+    skipped[gaps["scan"]] = gaps["n_missing"]
+    scan_number = np.arange(len(converted_df)) + np.cumsum(skipped)
+
+    filled_df = converted_df.set_axis(scan_number)
+    filled_df = filled_df[~filled_df.index.duplicated()]
+    filled_df = filled_df.reindex(np.arange(scan_number.max() + 1))
+    inserted = ~filled_df.index.isin(scan_number)
+    prev_scan = filled_df.index.to_series().mask(inserted).ffill()
+    for col in meta_cols:
+        dtype = converted_df[col].dtype
+        if col == "scan_datetime":
+            seconds = (filled_df.index - prev_scan) / sample_rate
+            values = filled_df[col].ffill() + seconds
+        elif dtype.kind == "f":
+            values = filled_df[col].interpolate(limit_area="inside")
+        else:
+            values = filled_df[col].ffill()
+        filled_df[col] = filled_df[col].where(~inserted, values).astype(dtype)
+    filled_df.index.name = "index"
+
+    return filled_df
 
-    # Temporary arrays to hold scientific values needed to compute cond/oxy
-    t_array, p_array, c_array = [], [], []
 
-    # needs to search sensor dictionary, and compute in order:
-    # temp, pressure, cond, salinity, oxygen, all aux.
-    # run one loop that builds a queue to determine order of processing, must track which column to pull
-    # process queue, store results in seperate arrays for reuse later
-    # once queue is empty, attach results together according to format order or xmlcon order - structure to keep track
+def _sensor_queue(rawConfig):
+    """
+    Build the list of sensors to convert (in processing order) from the parsed
+    .XMLCON config. See convertFromSBEReader.
+    """
     queue_metadata = []
     temp_counter = 0
     cond_counter = 0
@@ -311,8 +709,6 @@ def convertFromSBEReader(sbeReader, ssscc):
     # column = column in the raw_df containing the engineering units to be converted to sci units
     # sensor_info = xml sensor info to convert from eng units to sci units
 
-    rawConfig = sbeReader.parsed_config()  # Retrieve Config data
-
     for list_id, sensor_info in rawConfig["Sensors"].items():
         sensor_id = sensor_info["SensorID"]
 
@@ -383,105 +779,359 @@ def convertFromSBEReader(sbeReader, ssscc):
     # TODO: rework to use config.py file to determine which is primary
     queue_metadata = sorted(queue_metadata, key=lambda sensor: sensor["ranking"])
 
-    # Initialize converted dataframe
-    converted_df = pd.DataFrame()
+    return queue_metadata
+
+
+# scans converted at a time by equations without memory of previous scans, which
+# bounds their scratch arrays regardless of cast length
+_CONVERT_CHUNK_SCANS = 2**16
+
+
+def _scan_slices(n_scans):
+    """Slices of _CONVERT_CHUNK_SCANS scans covering a cast (at least one slice)."""
+    for start in range(0, max(n_scans, 1), _CONVERT_CHUNK_SCANS):
+        yield slice(start, start + _CONVERT_CHUNK_SCANS)
+
+
+def _sbe43(volts, p, t, c, lat, lon, coefs):
+    """SBE 43 oxygen from hysteresis-corrected voltage, and the raw voltage."""
+    # TODO: put some kind of user-enabled flag in config.py, e.g.
+    # if cfg["correct_oxy_hysteresis"]:
+    V_corrected = sbe_eq.sbe43_hysteresis_voltage(volts, p, coefs)
+    # warn about out of range voltages once, not once per chunk
+    V_corrected = sbe_eq._check_volts(V_corrected, sensor="sbe43")
+    oxy = np.empty(len(V_corrected))
+    for scans in _scan_slices(len(oxy)):
+        oxy[scans] = sbe_eq.sbe43(
+            V_corrected[scans],
+            p[scans],
+            t[scans],
+            c[scans],
+            coefs,
+            lat=lat[scans],
+            lon=lon[scans],
+        )
+    return oxy, volts
+
+
+def _user_polynomial(volts, p, coefs):
+    """Rinko O2/T voltages, the only user defined (polynomial) sensors in use."""
+    if coefs["SensorName"] in ("RinkoO2V", "RINKO", "RINKOO2", "Rinko02"):
+        log.info("Processing Rinko O2")
+        # hysteresis correct then pass through voltage (see Uchida, 2010)
+        coefs = {"H1": 0.0065, "H2": 5000, "H3": 2000, "offset": 0}
+        return sbe_eq.sbe43_hysteresis_voltage(volts, p, coefs)
+    elif coefs["SensorName"] in ("RinkoT"):
+        log.info("Processing Rinko T")
+        return volts
+    return None  # no output column
+
+
+def _salinity(c, t, p, coefs):
+    return gsw.SP_from_C(c, t, p)
+
+
+def _raw_values(raw, coefs):
+    return raw
+
+
+# Conversions to scientific units by SensorID: the equation, called as
+# equation(*inputs, coefs), and its inputs. Inputs are the sensor's own "raw" values,
+# the primary temperature/conductivity/pressure ("t", "c", "p", see
+# _primary_channels) or metadata columns (see SBEReader.parsed_meta). Extra output
+# columns (after the sensor's own) are listed in "outputs". Equations are called on
+# chunks of scans, unless they depend on previous scans ("whole_cast"). The raw
+# values of chunked equations are range checked once for the whole cast ("check"),
+# so checks inside the equations find nothing left to warn about in each chunk.
+#
+# Sensors not listed are passed through as raw values, e.g. the CStar (71) and
+# ECO-FL (20) voltages exported as 0-5VDC. Register wetlabs_cstar/wetlabs_eco_fl
+# here to convert them instead.
+_sensor_conversions = {
+    "55": {"equation": sbe_eq.sbe3, "inputs": ["raw"], "check": sbe_eq._check_freq},
+    "45": {
+        "equation": sbe_eq.sbe9,
+        "inputs": ["raw", "pressure_temp_int"],
+        "check": sbe_eq._check_freq,
+    },
+    "3": {
+        "equation": sbe_eq.sbe4,
+        "inputs": ["raw", "t", "p"],
+        "check": sbe_eq._check_freq,
+    },
+    "1000": {"equation": _salinity, "inputs": ["c", "t", "p"]},
+    "38": {
+        "equation": _sbe43,
+        "inputs": ["raw", "p", "t", "c", "GPSLAT", "GPSLON"],
+        "outputs": ["CTDOXYVOLTS"],
+        "whole_cast": True,  # hysteresis correction
+    },
+    "11": {"equation": sbe_eq.seapoint_fluor, "inputs": ["raw"]},
+    "0": {
+        "equation": sbe_eq.sbe_altimeter,
+        "inputs": ["raw"],
+        "check": sbe_eq._check_volts,
+    },
+    "61": {"equation": _user_polynomial, "inputs": ["raw", "p"], "whole_cast": True},
+}
 
-    for meta in queue_metadata:
+# sensor index, SensorID and log label of the primary temperature, conductivity and
+# pressure, assuming the first channel for each sensor is primary (see _sensor_queue)
+_primary_channels = {
+    "t": {"list_id": 0, "sensor_id": "55", "label": "Primary temperature"},
+    "c": {"list_id": 1, "sensor_id": "3", "label": "Primary cond"},
+    "p": {"list_id": 2, "sensor_id": "45", "label": "Pressure"},
+}
 
-        col = f"{short_lookup[meta['sensor_id']]['short_name']}{meta['channel_pos']}"
-        sensor_name = short_lookup[meta["sensor_id"]]["long_name"]
-        sensor_units = short_lookup[meta["sensor_id"]]["units"]
-        coefs = meta["sensor_info"]
 
-        ### Temperature block
-        if meta["sensor_id"] == "55":
-            log.info(f"Processing Sensor ID: {meta['sensor_id']}, {sensor_name}")
-            converted_df[col] = sbe_eq.sbe3(raw_df[meta["column"]], coefs)
-            if meta["list_id"] == 0:
-                t_array = converted_df[col].astype(float)
-                log.info(
-                    f"\tPrimary temperature first reading: {t_array[0]} {sensor_units}"
-                )
+class ConversionPlan:
+    """
+    Steps to convert the channels of one .XMLCON config (see
+    SBEReader.parsed_config) to scientific units. Each step is one sensor, in
+    processing order (see _sensor_queue), with its output columns, equation, input
+    names, sensor indices it needs decoded and calibration coefficients. Built once
+    per distinct config (see conversion_plan) and applied to the arrays of each cast.
+
+    Equations are looked up in _sensor_conversions, so new sensors only need to be
+    registered there.
+    """
 
-        ### Pressure block
-        elif meta["sensor_id"] == "45":
-            log.info(f"Processing Sensor ID: {meta['sensor_id']}, {sensor_name}")
-            converted_df[col] = sbe_eq.sbe9(raw_df[meta["column"]], t_probe, coefs)
-            if meta["list_id"] == 2:
-                p_array = converted_df[col].astype(float)
-                log.info(f"\tPressure first reading:  {p_array[0]} {sensor_units}")
-
-        ### Conductivity block
-        elif meta["sensor_id"] == "3":
-            log.info(f"Processing Sensor ID: {meta['sensor_id']}, {sensor_name}")
-            converted_df[col] = sbe_eq.sbe4(
-                raw_df[meta["column"]], t_array, p_array, coefs
-            )
-            if meta["list_id"] == 1:
-                c_array = converted_df[col].astype(float)
-                log.info(f"\tPrimary cond first reading: {c_array[0]} {sensor_units}")
-
-        ### Oxygen block
-        elif meta["sensor_id"] == "38":
-            log.info(f"Processing Sensor ID: {meta['sensor_id']}, {sensor_name}")
-            # TODO: put some kind of user-enabled flag in config.py, e.g.
-            # if cfg["correct_oxy_hysteresis"]:
-            V_corrected = sbe_eq.sbe43_hysteresis_voltage(
-                raw_df[meta["column"]], p_array, coefs
-            )
-            converted_df[col] = sbe_eq.sbe43(
-                V_corrected,
-                p_array,
-                t_array,
-                c_array,
-                coefs,
-                lat=meta_df["GPSLAT"],
-                lon=meta_df["GPSLON"],
+    def __init__(self, config):
+        primaries = {
+            (primary["list_id"], primary["sensor_id"]): name
+            for name, primary in _primary_channels.items()
+        }
+
+        self.steps = []
+        for meta in _sensor_queue(config):
+            sensor_id = meta["sensor_id"]
+            lookup = short_lookup[sensor_id]
+            conversion = _sensor_conversions.get(sensor_id)
+            if conversion is None:
+                message = f"Passing along Sensor ID: {sensor_id}, {lookup['long_name']}"
+                conversion = {"equation": _raw_values, "inputs": ["raw"]}
+            else:
+                message = f"Processing Sensor ID: {sensor_id}, {lookup['long_name']}"
+
+            channels = {
+                _primary_channels[name]["list_id"]
+                for name in conversion["inputs"]
+                if name in _primary_channels
+            }
+            if "raw" in conversion["inputs"]:
+                channels.add(meta["list_id"])
+
+            self.steps.append(
+                {
+                    "outputs": [f"{lookup['short_name']}{meta['channel_pos']}"]
+                    + conversion.get("outputs", []),
+                    "equation": conversion["equation"],
+                    "inputs": conversion["inputs"],
+                    "whole_cast": conversion.get("whole_cast", False),
+                    "check": conversion.get("check"),
+                    "sensor_id": sensor_id,
+                    "list_id": meta["list_id"],
+                    "channels": channels,
+                    "coefs": meta["sensor_info"],
+                    "primary": primaries.get((meta["list_id"], sensor_id)),
+                    "message": message,
+                }
             )
-            converted_df["CTDOXYVOLTS"] = raw_df[meta["column"]]
-
-        ### Fluorometer Seapoint block
-        elif meta["sensor_id"] == "11":
-            log.info(f"Processing Sensor ID: {meta['sensor_id']}, {sensor_name}")
-            converted_df[col] = sbe_eq.seapoint_fluoro(raw_df[meta["column"]], coefs)
-
-        ### Salinity block
-        elif meta["sensor_id"] == "1000":
-            log.info(f"Processing Sensor ID: {meta['sensor_id']}, {sensor_name}")
-            converted_df[col] = gsw.SP_from_C(c_array, t_array, p_array)
-
-        ### Altimeter block
-        elif meta["sensor_id"] == "0":
-            log.info(f"Processing Sensor ID: {meta['sensor_id']}, {sensor_name}")
-            converted_df[col] = sbe_eq.sbe_altimeter(raw_df[meta["column"]], coefs)
-
-        ### Rinko block
-        elif meta["sensor_id"] == "61":
-            if meta["sensor_info"]["SensorName"] in ("RinkoO2V", "RINKO", "RINKOO2", "Rinko02"):
-                log.info("Processing Rinko O2")
-                # hysteresis correct then pass through voltage (see Uchida, 2010)
-                coefs = {"H1": 0.0065, "H2": 5000, "H3": 2000, "offset": 0}
-                converted_df[col] = sbe_eq.sbe43_hysteresis_voltage(
-                    raw_df[meta["column"]],
-                    p_array,
-                    coefs,
+        self._channel_steps = {}
+
+    def select_channels(self, channels):
+        """
+        Resolve a channel selection (sensor indices and/or short names like
+        "CTDTMP1") to the sorted sensor indices to decode. The primary temperature,
+        conductivity, and pressure channels are added where other conversions depend
+        on them.
+        """
+        names = {step["outputs"][0]: step for step in self.steps}
+        list_ids = {step["list_id"]: step for step in self.steps}
+        selected = set()
+        for channel in channels:
+            if isinstance(channel, str):
+                step = names.get(channel)
+            else:
+                step = list_ids.get(channel)
+            if step is None:
+                raise ValueError(
+                    f"Unknown channel {channel!r}, expected one of {list(names)} "
+                    "or a sensor index"
+                )
+            selected |= step["channels"]
+
+        return sorted(selected)
+
+    def channel_steps(self, channels=None):
+        """
+        Steps to convert the decoded channels (all by default), skipping sensors
+        whose inputs were not decoded (e.g. salinity without primary T/C/P).
+        """
+        key = None if channels is None else tuple(channels)
+        if key not in self._channel_steps:
+            self._channel_steps[key] = [
+                step
+                for step in self.steps
+                if channels is None or step["channels"] <= set(channels)
+            ]
+        return self._channel_steps[key]
+
+    def convert(self, raw, meta, channels=None, dtypes=None):
+        """
+        Convert decoded channels to scientific units. All outputs are written into
+        one preallocated 2D array per output dtype (a row per output column), and
+        equations run on chunks of scans where they can, so converting a cast needs
+        about one set of output arrays of memory.
+
+        Parameters
+        ----------
+        raw : array-like
+            2D array of decoded channels (see SBEReader.parsed_scans)
+        meta : structured array or DataFrame
+            Decoded metadata, for inputs like pressure_temp_int and GPSLAT
+        channels : list of int, optional
+            Sensor indices of the columns of raw, defaults to all sensors
+        dtypes : dict, optional
+            Float dtypes of output columns (e.g. from store.column_dtypes), defaults
+            to float64
+
+        Returns
+        -------
+        converted : dict
+            Converted values by output column (rows of the output arrays), in
+            processing order
+        """
+        steps = self.channel_steps(channels)
+        raw = np.asarray(raw)
+        if channels is None:
+            channels = range(raw.shape[1])
+        raw_columns = dict(zip(channels, raw.T))
+
+        columns = {}
+        for step in steps:
+            for col in step["outputs"]:
+                columns.setdefault(col, np.dtype((dtypes or {}).get(col, float)))
+        rows = {}
+        for dtype in dict.fromkeys(columns.values()):
+            block_columns = [col for col in columns if columns[col] == dtype]
+            block = np.empty((len(block_columns), len(raw)), dtype=dtype)
+            rows.update(zip(block_columns, block))
+
+        primaries = {}
+        converted = {}
+        for step in steps:
+            log.info(step["message"])
+            values = {"raw": raw_columns.get(step["list_id"])}
+            values.update(primaries)
+            args = [
+                values[name] if name in values else np.asarray(meta[name])
+                for name in step["inputs"]
+            ]
+            if step["whole_cast"]:
+                chunks = [slice(None)]
+            else:
+                chunks = _scan_slices(len(raw))
+                if step["check"] is not None:
+                    # warn about bad raw values once, not once per chunk
+                    raw_idx = step["inputs"].index("raw")
+                    args[raw_idx] = step["check"](
+                        args[raw_idx], sensor=step["equation"].__name__
+                    )
+            for scans in chunks:
+                outputs = step["equation"](*[arg[scans] for arg in args], step["coefs"])
+                if outputs is None:
+                    break
+                if len(step["outputs"]) == 1:
+                    outputs = [outputs]
+                for col, output in zip(step["outputs"], outputs):
+                    rows[col][scans] = output
+            else:
+                for col in step["outputs"]:
+                    converted[col] = rows[col]
+
+            name = step["primary"]
+            if name is not None:
+                primaries[name] = converted[step["outputs"][0]]
+                log.info(
+                    f"\t{_primary_channels[name]['label']} first reading: "
+                    f"{primaries[name][0]} {short_lookup[step['sensor_id']]['units']}"
                 )
-            elif meta["sensor_info"]["SensorName"] in ("RinkoT"):
-                log.info("Processing Rinko T")
-                converted_df[col] = raw_df[meta["column"]]
 
-        ### Aux block
-        else:
-            log.info(f"Passing along Sensor ID: {meta['sensor_id']}, {sensor_name}")
-            converted_df[col] = raw_df[meta["column"]]
+        # in processing order, even if a later step overwrote an earlier column
+        return {col: converted[col] for col in columns if col in converted}
+
+
+# conversion plans by .XMLCON config, shared by all casts in this process
+_conversion_plans = {}
 
-    # Set the column name for the index
-    converted_df.index.name = "index"
 
-    log.info("Joining metadata dataframe with converted data...")
-    converted_df = converted_df.join(meta_df)
+def conversion_plan(config):
+    """ConversionPlan of a parsed .XMLCON config, built once per distinct config."""
+    key = json.dumps(config, sort_keys=True, default=str)
+    if key not in _conversion_plans:
+        _conversion_plans[key] = ConversionPlan(config)
+    return _conversion_plans[key]
+
+
+def convertFromSBEReader(
+    sbeReader, ssscc, chunk_size=None, fill_gaps=True, channels=None
+):
+    """Handler to convert engineering data to sci units automatically.
+    Takes SBEReader object that is already connected to the .hex and .XMLCON files.
+
+    If chunk_size is given, the .hex data are decoded chunk_size scans at a time
+    (see SBEReader.iter_chunks) instead of all at once, and not cached on the
+    reader. The raw counts and converted data of the whole cast are still held in
+    memory; to process casts larger than memory, use SBEReader.iter_chunks directly.
+
+    If fill_gaps, dropped scans (detected from the modulo byte) are inserted as NaN
+    rows (with scan times and positions filled in) and duplicated scans removed,
+    after sensor conversion.
+
+    channels limits decoding and conversion to a list of sensor indices and/or
+    short names (e.g. ["CTDPRS", "CTDTMP1", "CTDCOND1"]), plus the primary T/C/P
+    channels they need. This sets sbeReader.channels; by default the reader's
+    current selection (normally all channels) is used.
+    """
+    rawConfig = sbeReader.parsed_config()  # Retrieve Config data
+    plan = conversion_plan(rawConfig)
+    if channels is not None:
+        sbeReader.channels = plan.select_channels(channels)
+
+    # Retrieve parsed scans and convert to dataframe
+    if chunk_size is None:
+        rawData, metaData = sbeReader.parsed_scans, sbeReader.parsed_meta
+    else:
+        rawData, metaData = _read_chunks(sbeReader, chunk_size)
+
+    # compute in order: temp, pressure, cond, salinity, oxygen, all aux.
+    # stored as float32/int16/etc. where precision allows (see config ctd_dtypes)
+    output_names = [col for step in plan.steps for col in step["outputs"]]
+    dtypes = store.column_dtypes(
+        output_names + list(metaData.dtype.names), cfg.ctd_dtypes
+    )
+    converted = plan.convert(rawData, metaData, sbeReader.channels, dtypes=dtypes)
+
+    # Metadata are added as typed columns alongside the converted data
+    log.info(f"Building converted dataframe for {ssscc}")
+    for name in metaData.dtype.names:
+        converted[name] = metaData[name].astype(dtypes.get(name, metaData.dtype[name]))
+
+    # one block per column, so neither the output array nor metadata are copied
+    converted_df = pd.DataFrame(
+        converted, index=pd.RangeIndex(len(metaData)), copy=False
+    )
+    converted_df.index.name = "index"
     log.info("Success!")
 
+    gaps = sbeReader.scan_gaps()
+    if fill_gaps and len(gaps):
+        log.info(f"Filling {len(gaps)} gap(s) in scan sequence for {ssscc}")
+        converted_df = _fill_scan_gaps(
+            converted_df, gaps, metaData.dtype.names, sbeReader.sample_rate
+        )
+
     # return the converted data as a dataframe
     return converted_df
 
@@ -24,10 +24,11 @@ def _check_coefs(coefs_in, expected):
         raise KeyError(f"Coefficient dictionary missing keys: {missing_coefs}")
 
 
-def _check_freq(freq):
+def _check_freq(freq, sensor=None):
     """Convert to np.array, NaN out zeroes, convert to float if needed"""
     freq = np.array(freq)
-    sensor = inspect.stack()[1].function  # name of function calling _check_freq
+    if sensor is None:
+        sensor = inspect.stack()[1].function  # name of function calling _check_freq
 
     if freq.dtype != float:  # can sometimes come in as object
         log.warning(f"Attempting to convert {freq.dtype} to float for {sensor}")
@@ -43,10 +44,11 @@ def _check_freq(freq):
     return freq
 
 
-def _check_volts(volts, v_min=0, v_max=5):
+def _check_volts(volts, v_min=0, v_max=5, sensor=None):
     """Convert to np.array, NaN out values outside of 0-5V, convert to float if needed"""
     volts = np.array(volts)
-    sensor = inspect.stack()[1].function  # name of function calling _check_volts
+    if sensor is None:
+        sensor = inspect.stack()[1].function  # name of function calling _check_volts
 
     if volts.dtype != float:  # can sometimes come in as object
         log.warning(f"Attempting to convert {volts.dtype} to float for {sensor}")
@@ -3,6 +3,9 @@ A module for handling ODF input-output files related to CTDCAL.
 """
 
 import logging
+import os
+import time
+from contextlib import contextmanager
 from io import BufferedIOBase, BytesIO, StringIO
 from pathlib import Path
 from typing import Union
@@ -12,6 +15,12 @@ from zipimport import ZipImportError
 import pandas as pd
 import requests
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 log = logging.getLogger(__name__)
 
 
@@ -205,6 +214,83 @@ def load_exchange_ctd(
     )
 
 
+def write_log_row(df: pd.DataFrame, log_file: Union[str, Path]) -> None:
+    """
+    Add a cast's row(s) to a .csv log file (e.g. cast_details.csv), replacing any
+    rows previously logged for the same SSSCC so that reprocessed casts are not
+    logged twice. The file is locked while it is updated, so casts can be logged
+    from parallel processes.
+
+    Parameters
+    ----------
+    df : DataFrame
+        Log row(s), with an SSSCC column
+    log_file : str or Path
+        Log file to write to (created with a header if it doesn't exist)
+
+    Returns
+    -------
+    None
+
+    Notes
+    -----
+    All rows of every SSSCC in df are replaced, whatever their number (e.g. two
+    old rows by one new row). Replaced casts move to the end of the file, rows of
+    other casts are kept in order. An empty <log_file>.lock file is left next to
+    the log (see _file_lock).
+    """
+    with _file_lock(log_file):
+        if Path(log_file).exists():
+            log_df = pd.read_csv(log_file, dtype={"SSSCC": str})
+            logged = log_df["SSSCC"].isin(df["SSSCC"])
+            if logged.any():
+                log_df = pd.concat([log_df[~logged], df], ignore_index=True)
+                log_df.to_csv(log_file, index=False)
+                return
+        add_header = not Path(log_file).exists()  # add header iff file doesn't exist
+        with open(log_file, "a") as f:
+            df.to_csv(f, mode="a", header=add_header, index=False)
+
+
+@contextmanager
+def _file_lock(path: Union[str, Path], timeout: float = 60.0):
+    """
+    Hold an OS lock on a <path>.lock file while updating path, so that processes
+    writing to the same file (e.g. casts processed in parallel, see
+    convert.process_cast) take turns instead of overwriting each other's changes.
+
+    The lock is released by the OS when its process exits, so a .lock file left
+    behind (e.g. by a killed process) does not block later runs.
+    """
+    lock_file = f"{path}.lock"
+    deadline = time.monotonic() + timeout
+    fd = os.open(lock_file, os.O_CREAT | os.O_RDWR)
+    try:
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(
+                        f"Timed out waiting for {lock_file}, held by another "
+                        "ctdcal process"
+                    )
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
 def write_pressure_details(
     ssscc: str, log_file: Union[str, Path], p_start: float, p_end: float
 ) -> None:
@@ -229,9 +315,7 @@ def write_pressure_details(
     df = pd.DataFrame(
         {"SSSCC": ssscc, "ondeck_start_p": p_start, "ondeck_end_p": p_end}, index=[0]
     )
-    add_header = not Path(log_file).exists()  # add header iff file doesn't exist
-    with open(log_file, "a") as f:
-        df.to_csv(f, mode="a", header=add_header, index=False)
+    write_log_row(df, log_file)
 
 
 def write_cast_details(
@@ -290,6 +374,4 @@ def write_cast_details(
         },
         index=[0],
     )
-    add_header = not Path(log_file).exists()  # add header iff file doesn't exist
-    with open(log_file, "a") as f:
-        df.to_csv(f, mode="a", header=add_header, index=False)
+    write_log_row(df, log_file)
@@ -0,0 +1,137 @@
+"""
+A module for tracking what each cast's intermediate files were built from, so that
+pipeline stages only rebuild the casts whose inputs have changed.
+
+The build manifest (``data/cache/manifest.json``) records, for every stage and cast,
+the content hashes of the input files and the config values used. A stage compares
+these with the current inputs to decide whether a cast is out of date. Stages that
+build on the output of another stage take its "digest" (a hash of all its recorded
+inputs) as an input, so changes propagate down the pipeline like a makefile.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+# bump when the manifest layout changes, older manifests are discarded
+_MANIFEST_VERSION = 1
+
+
+def value_hash(value):
+    """Content hash of a JSON-serializable value (e.g. config settings)."""
+    text = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """
+    Build manifest of the inputs used for each stage/cast output.
+
+    Parameters
+    ----------
+    cache_dir : str or Path
+        Cache directory (e.g. data/cache/), the manifest is its manifest.json
+    """
+
+    def __init__(self, cache_dir):
+        self.path = Path(cache_dir) / "manifest.json"
+        self._files = {}
+        self._stages = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                manifest = json.load(f)
+            if manifest.get("version") == _MANIFEST_VERSION:
+                self._files = manifest["files"]
+                self._stages = manifest["stages"]
+            else:
+                log.warning(f"Ignoring {self.path} from another version of ctdcal")
+
+    def save(self):
+        """
+        Write the manifest to disk. It is written to a temporary file first and
+        then moved into place, so an interrupted save can't leave a truncated
+        manifest behind.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            "version": _MANIFEST_VERSION,
+            "files": self._files,
+            "stages": self._stages,
+        }
+        tmp_file = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(manifest, f, indent=1)
+        tmp_file.replace(self.path)
+
+    def file_hash(self, path):
+        """
+        Content hash of a file, or None if it does not exist. Hashes are kept with
+        the file's size and modification time, and only recomputed when those change.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = str(path)
+        cached = self._files.get(key)
+        if cached and [cached["size"], cached["mtime_ns"]] == [
+            stat.st_size,
+            stat.st_mtime_ns,
+        ]:
+            return cached["sha256"]
+
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(2**20), b""):
+                sha256.update(block)
+        self._files[key] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256.hexdigest(),
+        }
+        return sha256.hexdigest()
+
+    def files_hash(self, paths):
+        """Content hash of one file, or of an ordered list of files."""
+        if isinstance(paths, (str, Path)):
+            return self.file_hash(paths)
+        return value_hash([self.file_hash(path) for path in paths])
+
+    def inputs(self, stage, ssscc):
+        """Inputs recorded for a stage/cast output, or None if there is no record."""
+        record = self._stages.get(stage, {}).get(ssscc)
+        return None if record is None else record["inputs"]
+
+    def digest(self, stage, ssscc):
+        """Hash of all inputs recorded for a stage/cast, None if there is no record."""
+        inputs = self.inputs(stage, ssscc)
+        return None if inputs is None else value_hash(inputs)
+
+    def outdated(self, stage, ssscc, inputs, output_exists):
+        """
+        Whether a stage/cast output has to be (re)built from inputs: if it does not
+        exist, or any input differs from the recorded ones. Outputs built before they
+        were tracked are assumed to be current (and recorded as such).
+        """
+        if not output_exists:
+            return True
+        recorded = self.inputs(stage, ssscc)
+        if recorded is None:
+            self.record(stage, ssscc, inputs)
+            return False
+        changed = sorted(
+            name
+            for name in recorded.keys() | inputs.keys()
+            if recorded.get(name) != inputs.get(name)
+        )
+        if changed:
+            log.info(f"{ssscc} {stage} inputs changed ({', '.join(changed)})")
+        return bool(changed)
+
+    def record(self, stage, ssscc, inputs):
+        """Record the inputs a stage/cast output was built from."""
+        self._stages.setdefault(stage, {})[ssscc] = {"inputs": inputs}
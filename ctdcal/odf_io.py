@@ -12,6 +12,7 @@ import numpy as np
 import pandas as pd
 
 from ctdcal import get_ctdcal_config
+from ctdcal.manifest import Manifest
 
 cfg = get_ctdcal_config()
 log = logging.getLogger(__name__)
@@ -119,11 +120,16 @@ def remove_autosal_drift(saltDF, refDF):
 
 
 def _salt_exporter(
-    saltDF, outdir=cfg.dirs["salt"], stn_col="STNNBR", cast_col="CASTNO"
+    saltDF,
+    outdir=cfg.dirs["salt"],
+    stn_col="STNNBR",
+    cast_col="CASTNO",
+    overwrite=False,
 ):
     """
     Export salt DataFrame to .csv file. Extra logic is included in the event that
     multiple stations and/or casts are included in a single raw salt file.
+    Existing .csv files are skipped unless overwrite=True.
     """
     stations = saltDF[stn_col].unique()
     for station in stations:
@@ -133,7 +139,7 @@ def _salt_exporter(
             stn_cast_salts = stn_salts[stn_salts[cast_col] == cast].copy()
             stn_cast_salts.dropna(axis=1, how="all", inplace=True)  # drop empty columns
             outfile = Path(outdir) / f"{station:03.0f}{cast:02.0f}_salts.csv"  # SSSCC_*
-            if outfile.exists():
+            if outfile.exists() and not overwrite:
                 log.info(str(outfile) + " already exists...skipping")
                 continue
             stn_cast_salts.to_csv(outfile, index=False)
@@ -151,14 +157,23 @@ def process_salts(ssscc_list, salt_dir=cfg.dirs["salt"]):
     salt_dir : str, optional
         Path to folder containing raw salt files (defaults to data/salt/)
 
+    Notes
+    -----
+    Casts with an existing .csv file are skipped, unless their raw salt file has
+    changed since it was made (see ctdcal.manifest). Then every .csv file exported
+    from it is remade, including those of other casts in the same raw file.
     """
+    manifest = Manifest(cfg.dirs["cache"])
     for ssscc in ssscc_list:
-        if (Path(salt_dir) / f"{ssscc}_salts.csv").exists():
+        salt_file = Path(salt_dir) / ssscc
+        out_file = Path(salt_dir) / f"{ssscc}_salts.csv"
+        inputs = {"salt": manifest.file_hash(salt_file)}
+        if not manifest.outdated("salts", ssscc, inputs, out_file.exists()):
             log.info(f"{ssscc}_salts.csv already exists in {salt_dir}... skipping")
             continue
         else:
             try:
-                saltDF, refDF = _salt_loader(Path(salt_dir) / ssscc)
+                saltDF, refDF = _salt_loader(salt_file)
             except FileNotFoundError:
                 log.warning(f"Salt file for cast {ssscc} does not exist... skipping")
                 continue
@@ -166,7 +181,11 @@ def process_salts(ssscc_list, salt_dir=cfg.dirs["salt"]):
             saltDF["SALNTY"] = gsw.SP_salinometer(
                 (saltDF["CRavg"] / 2.0), saltDF["BathTEMP"]
             )  # .round(4)
-            _salt_exporter(saltDF, salt_dir)
+            # replace all .csv files made from this salt file, not only SSSCC's
+            _salt_exporter(saltDF, salt_dir, overwrite=True)
+            manifest.record("salts", ssscc, inputs)
+    manifest.save()
+
 
 def print_progress_bar(
     iteration,
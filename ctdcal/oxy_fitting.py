@@ -4,7 +4,6 @@ Module for processing oxygen from CTD and bottle samples.
 
 import csv
 import logging
-import xml.etree.cElementTree as ET
 from collections import OrderedDict
 from pathlib import Path
 
@@ -17,6 +16,7 @@ from . import ctd_plots as ctd_plots
 from . import flagging as flagging
 from . import get_ctdcal_config
 from . import process_ctd as process_ctd
+from . import sbe_reader as sbe_rd
 
 cfg = get_ctdcal_config()
 log = logging.getLogger(__name__)
@@ -389,12 +389,13 @@ def _get_sbe_coef(idx=0):
     station = process_ctd.get_ssscc_list()[idx]
     xmlfile = cfg.dirs["raw"] + station + ".XMLCON"
 
-    tree = ET.parse(xmlfile)
-    root_eq0 = tree.find(".//CalibrationCoefficients[@equation='0']")  # Owens-Millard
-    root_eq1 = tree.find(".//CalibrationCoefficients[@equation='1']")  # SBE equation
-
-    coefs = {c.tag: float(c.text) for c in root_eq1}
-    coefs["Tcor"] = float(root_eq0.find("Tcor").text)  # only coef needed from eq0
+    # SBE43 calibration is read from the (cruise-wide cached) parsed .XMLCON
+    # equation 1 coefs come after equation 0 in the file, so only Tcor is from eq0
+    with open(xmlfile, encoding="cp437") as f:
+        config, _ = sbe_rd.parse_xmlcon(f.read(), cache_dir=cfg.dirs["cache"])
+    coefs = next(
+        sensor for sensor in config["Sensors"].values() if sensor["SensorID"] == "38"
+    )
     keep_keys = ["Soc", "offset", "Tau20", "Tcor", "E"]
 
     return tuple(coefs[key] for key in keep_keys)
@@ -19,6 +19,8 @@ import pandas as pd
 from . import flagging as flagging
 from . import get_ctdcal_config
 from . import oxy_fitting as oxy_fitting
+from . import store
+from .manifest import Manifest
 
 cfg = get_ctdcal_config()
 log = logging.getLogger(__name__)
@@ -31,7 +33,7 @@ def retrieveBottleDataFromFile(converted_file):
     """
     Retrieve the bottle data from a converted file.
     """
-    converted_df = pd.read_pickle(converted_file)
+    converted_df = store.load(converted_file)
 
     return retrieveBottleData(converted_df)
 
@@ -65,7 +67,7 @@ def retrieveBottleData(converted_df):
 
 def bottle_mean(btl_df):
     """Compute the mean for each bottle from a dataframe."""
-    btl_max = int(btl_df[BOTTLE_FIRE_NUM_COL].tail(n=1))
+    btl_max = int(btl_df[BOTTLE_FIRE_NUM_COL].iloc[-1])
     i = 1
     output = pd.DataFrame()
     while i <= btl_max:
@@ -84,7 +86,7 @@ def bottle_mean(btl_df):
 
 def bottle_median(btl_df):
     """Compute the median for each bottle from a dataframe."""
-    btl_max = int(btl_df[BOTTLE_FIRE_NUM_COL].tail(n=1))
+    btl_max = int(btl_df[BOTTLE_FIRE_NUM_COL].iloc[-1])
     i = 1
     output = pd.DataFrame()
     while i <= btl_max:
@@ -103,13 +105,11 @@ def bottle_median(btl_df):
 
 def _load_btl_data(btl_file, cols=None):
     """
-    Loads "bottle mean" CTD data from .pkl file. Function will return all data unless
-    cols is specified (as a list of column names)
+    Loads "bottle mean" CTD data from a columnar store (see ctdcal.store). Function
+    will return all data unless cols is specified (as a list of column names)
     """
 
-    btl_data = pd.read_pickle(btl_file)
-    if cols is not None:
-        btl_data = btl_data[cols]
+    btl_data = store.load(btl_file, columns=cols)
     btl_data["SSSCC"] = Path(btl_file).stem.split("_")[0]
 
     return btl_data
@@ -186,7 +186,7 @@ def load_all_btl_files(ssscc_list, cols=None):
 
     for ssscc in ssscc_list:
         log.info("Loading BTL data for station: " + ssscc + "...")
-        btl_file = cfg.dirs["bottle"] + ssscc + "_btl_mean.pkl"
+        btl_file = cfg.dirs["bottle"] + ssscc + "_btl_mean"
         btl_data = _load_btl_data(btl_file, cols)
 
         ### load REFT data
@@ -360,17 +360,27 @@ def process_reft(ssscc_list, reft_dir=cfg.dirs["reft"]):
     reft_dir : str, optional
         Path to folder containing raw salt files (defaults to data/reft/)
 
+    Notes
+    -----
+    Casts with an existing .csv file are skipped, unless their .cap file has changed
+    since it was made (see ctdcal.manifest).
     """
+    manifest = Manifest(cfg.dirs["cache"])
     for ssscc in ssscc_list:
-        if not Path(reft_dir + ssscc + "_reft.csv").exists():
+        cap_files = sorted(Path(reft_dir).glob(f"*{ssscc}.cap"))
+        inputs = {"reft": manifest.file_hash(cap_files[0]) if cap_files else None}
+        out_file = Path(reft_dir + ssscc + "_reft.csv")
+        if manifest.outdated("reft", ssscc, inputs, out_file.exists()):
             try:
                 reftDF = _reft_loader(ssscc, reft_dir)
-                reftDF.to_csv(reft_dir + ssscc + "_reft.csv", index=False)
+                reftDF.to_csv(out_file, index=False)
+                manifest.record("reft", ssscc, inputs)
             except FileNotFoundError:
                 log.warning(
                     "refT file for cast " + ssscc + " does not exist... skipping"
                 )
                 continue
+    manifest.save()
 
 
 def add_btlnbr_cols(df, btl_num_col):
@@ -12,7 +12,7 @@ import numpy as np
 import pandas as pd
 import scipy.signal as sig
 
-from . import get_ctdcal_config, io, oxy_fitting
+from . import get_ctdcal_config, io, oxy_fitting, store
 
 cfg = get_ctdcal_config()
 log = logging.getLogger(__name__)
@@ -56,11 +56,11 @@ def cast_details(df, ssscc, log_file=None):
     df_cast = _trim_soak_period(df)
 
     # TODO: call parameters from config file instead
-    p_start = float(np.around(df_cast["CTDPRS"].head(1), 4))
+    p_start = float(np.around(df_cast["CTDPRS"].iloc[0], 4))
     p_max_ind = df_cast["CTDPRS"].argmax()
     p_max = float(np.around(df_cast["CTDPRS"].max(), 4))
-    time_start = float(df_cast["scan_datetime"].head(1))
-    time_end = float(df_cast["scan_datetime"].tail(1))
+    time_start = float(df_cast["scan_datetime"].iloc[0])
+    time_end = float(df_cast["scan_datetime"].iloc[-1])
     time_bottom = float(df_cast["scan_datetime"][p_max_ind])
     b_lat = float(np.around(df_cast["GPSLAT"][p_max_ind], 4))
     b_lon = float(np.around(df_cast["GPSLON"][p_max_ind], 4))
@@ -262,11 +262,11 @@ def raw_ctd_filter(df=None, window="triangle", win_size=24, parameters=None):
     if parameters is not None:
         for p in parameters:
             if window == "boxcar":
-                win = sig.boxcar(win_size)
+                win = sig.windows.boxcar(win_size)
             elif window == "hanning":
-                win = sig.hann(win_size)
+                win = sig.windows.hann(win_size)
             elif window == "triangle":
-                win = sig.triang(win_size)
+                win = sig.windows.triang(win_size)
             filter_df[p] = sig.convolve(filter_df[p], win, mode="same") / np.sum(win)
 
     return filter_df
@@ -649,7 +649,7 @@ def get_ssscc_list(fname="data/ssscc.csv"):
     return ssscc_list
 
 
-def load_all_ctd_files(ssscc_list):
+def load_all_ctd_files(ssscc_list, cols=None):
     """
     Load CTD files for station/cast list and merge into a dataframe.
 
@@ -657,6 +657,9 @@ def load_all_ctd_files(ssscc_list):
     ----------
     ssscc_list : list of str
         List of stations to load
+    cols : list of str, optional
+        Subset of columns to load, defaults to loading all (CTDOXYVOLTS and
+        scan_datetime are always loaded, to calculate dv_dt)
 
     Returns
     -------
@@ -664,11 +667,14 @@ def load_all_ctd_files(ssscc_list):
         Merged dataframe containing all loaded data
 
     """
+    if cols is not None:
+        cols = list(dict.fromkeys([*cols, "CTDOXYVOLTS", "scan_datetime"]))
     df_list = []
     for ssscc in ssscc_list:
         log.info("Loading TIME data for station: " + ssscc + "...")
-        time_file = cfg.dirs["time"] + ssscc + "_time.pkl"
-        time_data = pd.read_pickle(time_file)
+        time_file = cfg.dirs["time"] + ssscc + "_time"
+        # older (e.g. pickled) time files are float64, see config ctd_dtypes
+        time_data = store.compact(store.load(time_file, columns=cols), cfg.ctd_dtypes)
         time_data["SSSCC"] = str(ssscc)
         time_data["dv_dt"] = oxy_fitting.calculate_dV_dt(
             time_data["CTDOXYVOLTS"], time_data["scan_datetime"]
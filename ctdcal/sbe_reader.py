@@ -5,14 +5,505 @@ takes the xml config and extracts the useful settings used during a CTD cast,
 and uses that to check and parse the hex file.
 """
 
+import copy
 import datetime
+import functools
+import hashlib
+import json
+import logging
+import mmap
 import re
-import struct
 import xml.etree.cElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
 import numpy as np
 from pytz import timezone
 
+log = logging.getLogger(__name__)
+
+# ASCII code -> hex digit value, non-hex characters map to 0xFF
+_HEX_LUT = np.full(256, 0xFF, dtype=np.uint8)
+for _i, _c in enumerate(b"0123456789ABCDEF"):
+    _HEX_LUT[_c] = _i
+for _i, _c in enumerate(b"abcdef"):
+    _HEX_LUT[_c] = _i + 10
+
+# ASCII whitespace, as removed by bytes.strip()
+_WHITESPACE = np.zeros(256, dtype=bool)
+_WHITESPACE[list(b" \t\n\r\x0b\x0c")] = True
+
+
+def _hex_nibbles(scan_bytes):
+    """Map an array of ASCII hex characters to their 4-bit values."""
+    return _HEX_LUT[scan_bytes]
+
+
+def _strip_lines(data, line_starts, line_ends):
+    """
+    Trim leading and trailing whitespace (incl. a \r before the \n) from lines of
+    a uint8 buffer, like the str.strip() applied to text input. Returns the new
+    line starts and lengths.
+    """
+    starts, ends = line_starts.copy(), line_ends.copy()
+    active = np.flatnonzero(ends > starts)
+    while len(active):
+        active = active[_WHITESPACE[data[ends[active] - 1]]]
+        ends[active] -= 1
+        active = active[ends[active] > starts[active]]
+    active = np.flatnonzero(ends > starts)
+    while len(active):
+        active = active[_WHITESPACE[data[starts[active]]]]
+        starts[active] += 1
+        active = active[ends[active] > starts[active]]
+    return starts, ends - starts
+
+
+def _hex_words(nibbles, width):
+    """
+    Fold the last axis of a nibble array into integer words, most significant
+    nibble first. The last axis must be a multiple of `width` long.
+    """
+    nibbles = nibbles.reshape(*nibbles.shape[:-1], nibbles.shape[-1] // width, width)
+    words = np.zeros(nibbles.shape[:-1], dtype=np.int64)
+    for i in range(width):
+        words <<= 4
+        words |= nibbles[..., i]
+    return words
+
+
+def _hex_words_lsb(nibbles):
+    """
+    Convert a nibble array of little-endian (low byte first) words, e.g. the SBE
+    NMEA and scan time fields, into integers.
+    """
+    byte_words = _hex_words(nibbles, 2)
+    words = np.zeros(byte_words.shape[:-1], dtype=np.int64)
+    for i in reversed(range(byte_words.shape[-1])):
+        words <<= 8
+        words |= byte_words[..., i]
+    return words
+
+
+def _parse_xmlcon(xml_config):
+    """Parse .XMLCON contents into a config dict. Only for values in bools and numeric."""
+    bools = [
+        "SurfaceParVoltageAdded",
+        "NmeaPositionDataAdded",
+        "NmeaDepthDataAdded",
+        "NmeaTimeAdded",
+        "ScanTimeAdded",
+    ]
+    numeric = [
+        "FrequencyChannelsSuppressed",
+        "VoltageWordsSuppressed",
+    ]
+    sensors = {}
+
+    root = ET.fromstring(xml_config)
+    config = {}
+
+    for key in numeric:
+        try:
+            config[key] = int(root.find("./Instrument/{}".format(key)).text)
+        except AttributeError:
+            raise AttributeError("Could not find {} in XMLCONF".format(key))
+        except ValueError:
+            raise ValueError("{} Value is not a number".format(key))
+
+    for key in bools:
+        try:
+            config[key] = bool(int(root.find("./Instrument/{}".format(key)).text))
+        except AttributeError:
+            raise AttributeError("Could not find {} in XMLCONF".format(key))
+        except ValueError:
+            raise ValueError("{} Value is not truthy".format(key))
+
+    """Pokedex is a dict of {Sensor index numbers from the config:sensor info}
+    Assume that sensor index number is the order the sensors have been entered into the file.
+    Therefore, it will be Frequency instruments first, then Voltage instruments.
+    Call their index number (starting at 0) in order to pull out the info.
+
+    """
+    # pokedex = {}
+    for x in root.iter("Sensor"):
+        # print(ET.tostring(x))
+        """Start creating single sensor dictionary."""
+        bulbasaur = {}
+        bulbasaur["SensorID"] = x.attrib["SensorID"]
+        # load all values into dict - beware of overwriting #NEED TO FIX
+        for children in x:
+            for y in children.iter():
+                try:
+                    bulbasaur[y.tag] = float(y.text)
+                except (TypeError, ValueError):
+                    bulbasaur[y.tag] = str(y.text).replace("\n", "").replace(" ", "")
+
+            """Add sensor to big dictionary."""
+            # pokedex[x.attrib['index']] = bulbasaur
+            sensors[int(x.attrib["index"])] = bulbasaur
+    # sensors.append(pokedex)
+    config["Sensors"] = sensors
+
+    # Seasave can average scans before writing them (optional, default is no averaging)
+    scans_to_average = root.find("./Instrument/ScansToAverage")
+    config["ScansToAverage"] = (
+        1 if scans_to_average is None else int(scans_to_average.text)
+    )
+    return config
+
+
+def _scan_layout(config):
+    """
+    Character offset and width of each field in a scan line, in SBE order (see
+    SBEReader._parse_scans). Only fields present in the config are included.
+    """
+    widths = [
+        ("frequencies", 6 * (5 - config["FrequencyChannelsSuppressed"])),
+        ("voltages", 3 * (8 - config["VoltageWordsSuppressed"])),
+        ("spar", 6 * config["SurfaceParVoltageAdded"]),
+        ("nmea_pos", 14 * config["NmeaPositionDataAdded"]),
+        ("nmea_depth", 6 * config["NmeaDepthDataAdded"]),
+        ("nmea_time", 8 * config["NmeaTimeAdded"]),
+        ("pressure_temp", 3),
+        ("ctd_status", 1),
+        ("modulo", 2),
+        ("scan_time", 8 * config["ScanTimeAdded"]),
+    ]
+    layout = {"fields": {}}
+    offset = 0
+    for name, width in widths:
+        if width:
+            layout["fields"][name] = [offset, width]
+            offset += width
+    layout["scan_length"] = offset
+    return layout
+
+
+def xmlcon_hash(xml_config):
+    """Content hash used to identify distinct .XMLCON configurations."""
+    return hashlib.sha256(xml_config.encode("utf-8")).hexdigest()
+
+
+def _int_sensor_keys(config):
+    """Restore integer sensor indices of a config loaded from JSON (in place)."""
+    config["Sensors"] = {int(k): v for k, v in config["Sensors"].items()}
+    return config
+
+
+# parsed configs/layouts by xmlcon_hash, shared by all readers in this process
+_xmlcon_cache = {}
+
+# version of the parse_xmlcon cache files, bumped when parsed configs/layouts change
+_XMLCON_CACHE_VERSION = 1
+
+
+def parse_xmlcon(xml_config, cache_dir=None):
+    """
+    Parse .XMLCON contents into a config dict (including "Sensors") and scan layout.
+
+    Results are memoized by content hash, so casts sharing a configuration are only
+    parsed once. If cache_dir is given, results are also stored there as JSON
+    (cache_dir/xmlcon/<hash>.json) and reused by later processes. Cache files from
+    another version of the parser (_XMLCON_CACHE_VERSION) are parsed again.
+
+    Parameters
+    ----------
+    xml_config : str
+        Contents of the .XMLCON file
+    cache_dir : str or Path, optional
+        Directory for persistent cache files
+
+    Returns
+    -------
+    config : dict
+        Instrument flags and sensor info (keyed by sensor index)
+    layout : dict
+        Scan line field offsets/widths and total scan length (in hex chars)
+    """
+    key = xmlcon_hash(xml_config)
+    if key not in _xmlcon_cache:
+        cache_file = None
+        if cache_dir is not None:
+            cache_file = Path(cache_dir) / "xmlcon" / f"{key}.json"
+
+        cached = None
+        if cache_file is not None and cache_file.exists():
+            with open(cache_file) as f:
+                cached = json.load(f)
+            if cached.get("version") == _XMLCON_CACHE_VERSION:
+                cached["config"] = _int_sensor_keys(cached["config"])
+            else:
+                log.debug(f"Parsing {cache_file.name} again, cached by another version")
+                cached = None
+
+        if cached is None:
+            config = _parse_xmlcon(xml_config)
+            cached = {
+                "version": _XMLCON_CACHE_VERSION,
+                "config": config,
+                "layout": _scan_layout(config),
+            }
+            if cache_file is not None:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp_file = cache_file.with_suffix(".tmp")
+                with open(tmp_file, "w") as f:
+                    json.dump(cached, f, indent=1)
+                tmp_file.replace(cache_file)
+        _xmlcon_cache[key] = cached
+
+    cached = copy.deepcopy(_xmlcon_cache[key])
+    return cached["config"], cached["layout"]
+
+
+def _decode_location(fix_chars):
+    """
+    NMEA latitude, longitude (float) and new fix (bool) arrays from a 2D uint8 array
+    of NMEA position hex chars, 14 per scan (see SBEReader._location_fix).
+    """
+    # 7 bytes: 3 for latitude, 3 for longitude, 1 for sign/new fix bits
+    fix = _hex_words(_hex_nibbles(fix_chars), 2)
+    lat = (fix[:, 0] * 65536 + fix[:, 1] * 256 + fix[:, 2]) / 50000
+    lon = (fix[:, 3] * 65536 + fix[:, 4] * 256 + fix[:, 5]) / 50000
+
+    lat = np.where(fix[:, 6] & 0x80, -lat, lat)
+    lon = np.where(fix[:, 6] & 0x40, -lon, lon)
+    new_fix = (fix[:, 6] & 0x01).astype(bool)
+    return lat, lon, new_fix
+
+
+def _decode_sbe_times(time_chars, sbe_type, datetime64=False):
+    """
+    UTC epoch timestamps (or datetime64[s]) from a 2D uint8 array of raw (low byte
+    first) NMEA or scan time hex chars, 8 per scan (see SBEReader._sbe_time).
+    """
+    if time_chars.shape[1] != 8:
+        raise ValueError(
+            f"Hex strings must be 8 characters to be SBE formatted time, "
+            f"got {time_chars.shape[1]}"
+        )
+    seconds = _hex_words_lsb(_hex_nibbles(time_chars))
+    if sbe_type == "scan":
+        epoch_seconds = seconds
+    elif sbe_type == "nmea":
+        epoch_seconds = seconds + _NMEA_EPOCH
+    else:
+        raise ValueError(
+            'Please choose "nmea" or "scan" for second input to _sbe_times()'
+        )
+
+    if datetime64:
+        return epoch_seconds.astype("datetime64[s]")
+    return epoch_seconds.astype(float)
+
+
+def _decode_status(status_chars):
+    """Pump on and bottle fire flags from the CTD status hex char of each scan."""
+    status_char = status_chars[:, 0]
+    status = _hex_nibbles(status_char)
+    # non-numeric status chars are treated as pump on (see SBEReader._pump_status)
+    is_digit = (status_char >= ord("0")) & (status_char <= ord("9"))
+    return ~is_digit | (status & 0x1).astype(bool), (status & 0x4).astype(bool)
+
+
+def _decode_int(chars):
+    """Unsigned integers from a 2D uint8 array of hex chars, one word per row."""
+    return _hex_words(_hex_nibbles(chars), chars.shape[1])[:, 0]
+
+
+def _frequency(words):
+    """Frequency (Hz) of 24-bit words in units of 1/256 Hz."""
+    return words / 256
+
+
+def _voltage(words):
+    """Voltage of 12-bit words scaled across 0-5V (inverted)."""
+    return 5 * (1 - words / 4095)
+
+
+def _raw_count(words):
+    return words
+
+
+# layout fields decoded to parsed_scans columns: word width(s) in hex chars and
+# transform, e.g. surface PAR is passed along as raw counts (2 + 4 chars)
+_CHANNEL_FIELDS = {
+    "frequencies": (6, _frequency),
+    "voltages": (3, _voltage),
+    "spar": ((2, 4), _raw_count),
+}
+
+# layout fields decoded to parsed_meta: output (name, dtype) pairs and decoder.
+# NMEA depth is here for completeness but not implemented,
+# after email chain showed SBE no longer knows how they did it.
+_META_FIELDS = {
+    "nmea_pos": (
+        [("GPSLAT", "float64"), ("GPSLON", "float64"), ("new_fix", "bool")],
+        _decode_location,
+    ),
+    "nmea_time": (
+        [("nmea_datetime", "float64")],
+        functools.partial(_decode_sbe_times, sbe_type="nmea"),
+    ),
+    "pressure_temp": ([("pressure_temp_int", "int64")], _decode_int),
+    "ctd_status": ([("pump_on", "bool"), ("btl_fire", "bool")], _decode_status),
+    "scan_time": (
+        [("scan_datetime", "float64")],
+        functools.partial(_decode_sbe_times, sbe_type="scan"),
+    ),
+}
+
+
+class DecodePlan:
+    """
+    Steps to decode scan lines of one scan layout (see parse_xmlcon): the char
+    offset, word width and transform of each channel, and the decoder and output
+    dtype of each metadata field. Built once per distinct layout (see decode_plan)
+    and applied to 2D uint8 arrays of scan lines.
+
+    Fields are looked up in _CHANNEL_FIELDS and _META_FIELDS, so other instruments
+    only need their layout fields registered there.
+    """
+
+    def __init__(self, layout):
+        fields = layout["fields"]
+        self.scan_length = layout["scan_length"]
+
+        # (start char, width, transform) of each channel, in parsed_scans order
+        self.channel_words = []
+        for name, (start, width) in fields.items():
+            if name not in _CHANNEL_FIELDS:
+                continue
+            word_widths, transform = _CHANNEL_FIELDS[name]
+            if isinstance(word_widths, int):
+                word_widths = [word_widths] * (width // word_widths)
+            for word_width in word_widths:
+                self.channel_words.append((start, word_width, transform))
+                start += word_width
+        self._channel_steps = {}
+
+        # (output names, chars, decoder) of each metadata field
+        self.meta_steps = []
+        meta_dtype = []
+        for name, (start, width) in fields.items():
+            if name not in _META_FIELDS:
+                continue
+            outputs, decoder = _META_FIELDS[name]
+            names = [output for output, _ in outputs]
+            self.meta_steps.append((names, slice(start, start + width), decoder))
+            meta_dtype.extend(outputs)
+
+        # without scan times in the data, readers reconstruct them (_sbe_time_seq)
+        self.has_scan_time = "scan_time" in fields
+        if not self.has_scan_time:
+            meta_dtype.append(("scan_datetime", "float64"))
+        self.meta_dtype = np.dtype(meta_dtype)
+
+    @property
+    def n_channels(self):
+        return len(self.channel_words)
+
+    def channel_steps(self, channels=None):
+        """
+        Decoding steps for the selected channels (all by default), as a list of
+        (chars, width, transform) for each run of channels sharing a word width and
+        transform. chars is a slice when the run is contiguous, to avoid a copy.
+        """
+        key = None if channels is None else tuple(channels)
+        if key not in self._channel_steps:
+            if channels is None:
+                channels = range(self.n_channels)
+            runs = []
+            for ch in channels:
+                start, width, transform = self.channel_words[ch]
+                if runs and runs[-1][1:] == [width, transform]:
+                    runs[-1][0].append(start)
+                else:
+                    runs.append([[start], width, transform])
+
+            steps = []
+            for starts, width, transform in runs:
+                starts = np.array(starts)
+                if (np.diff(starts) == width).all():
+                    chars = slice(starts[0], starts[-1] + width)
+                else:
+                    chars = (starts[:, None] + np.arange(width)).ravel()
+                steps.append((chars, width, transform))
+            self._channel_steps[key] = steps
+        return self._channel_steps[key]
+
+    def scans(self, scan_bytes, channels=None):
+        """Decode the selected channels (all by default) as a 2D float array."""
+        columns = [
+            transform(_hex_words(_hex_nibbles(scan_bytes[:, chars]), width))
+            for chars, width, transform in self.channel_steps(channels)
+        ]
+        if not columns:
+            return np.empty((len(scan_bytes), 0))
+        return np.concatenate(columns, axis=1, dtype=float)
+
+    def meta(self, scan_bytes):
+        """
+        Decode metadata as a structured array of meta_dtype. Reconstructed scan
+        times (see has_scan_time) are left as zeros.
+        """
+        meta = np.zeros(len(scan_bytes), dtype=self.meta_dtype)
+        for names, chars, decoder in self.meta_steps:
+            values = decoder(scan_bytes[:, chars])
+            if len(names) == 1:
+                values = [values]
+            for name, value in zip(names, values):
+                meta[name] = value
+        return meta
+
+
+# decode plans by scan layout, shared by all readers in this process
+_decode_plans = {}
+
+
+def decode_plan(layout):
+    """DecodePlan of a scan layout (see parse_xmlcon), built once per distinct layout."""
+    key = json.dumps(layout, sort_keys=True)
+    if key not in _decode_plans:
+        _decode_plans[key] = DecodePlan(layout)
+    return _decode_plans[key]
+
+
+# version of the SBEReader.to_npz file format, bumped on incompatible changes
+_NPZ_VERSION = 1
+
+# seconds between 1970-01-01 (scan time epoch) and 2000-01-01 (NMEA time epoch)
+_NMEA_EPOCH = int(datetime.datetime(2000, 1, 1, tzinfo=timezone("UTC")).timestamp())
+
+
+def _decode_scan_range(hex_path, offset, stride, n_scans, state, skipped=None):
+    """
+    Decode n_scans lines of a .hex file, starting at byte offset, in a worker
+    process (see SBEReader._parse_parallel). The file is memory-mapped again here
+    so that only the decoded arrays are sent back. state holds the reader settings
+    (xml_config, channels, sample_rate, raw_comments, first_scan, scans, meta).
+    """
+    reader = SBEReader(
+        "",
+        state["xml_config"],
+        channels=state["channels"],
+        sample_rate=state["sample_rate"],
+    )
+    reader._raw_comments = state["raw_comments"]
+    with open(hex_path, "rb") as raw_hex_file:
+        buffer = mmap.mmap(raw_hex_file.fileno(), 0, access=mmap.ACCESS_READ)
+    scan_bytes = np.lib.stride_tricks.as_strided(
+        np.frombuffer(buffer, dtype=np.uint8, offset=offset),
+        shape=(n_scans, reader.scan_length),
+        strides=(stride, 1),
+        writeable=False,
+    )
+    scans = reader._decode_scans(scan_bytes) if state["scans"] else None
+    meta = None
+    if state["meta"]:
+        meta = reader._decode_meta(scan_bytes, state["first_scan"], skipped)
+    return scans, meta
+
 
 class SBEReader:
     """
@@ -21,33 +512,254 @@ class SBEReader:
     Code originally written by Andrew Barna, January-March 2016.
     """
 
-    def __init__(self, raw_hex, xml_config):
-        """expects long character string inputs"""
+    def __init__(
+        self,
+        raw_hex,
+        xml_config,
+        cache_dir=None,
+        salvage=None,
+        channels=None,
+        sample_rate=None,
+        workers=None,
+    ):
+        """
+        expects long character string inputs, parsed .XMLCON configs are cached in
+        cache_dir (see parse_xmlcon)
+
+        Malformed scan lines raise a ValueError unless salvage is "drop" or "nan"
+        (see _check_scan_lengths). channels limits decoding to a list of sensor
+        indices (see the channels property).
+
+        sample_rate (scans per second) is used to reconstruct scan times, and
+        defaults to 24 Hz divided by the .XMLCON ScansToAverage.
+
+        workers > 1 decodes memory-mapped files in that many processes (see
+        _parse_parallel).
+        """
         self.raw_hex = raw_hex
         self.xml_config = xml_config
+        self.cache_dir = cache_dir
+        self.salvage = salvage
+        self.clear_cache()
         self._parse_config()
+        self.channels = channels
+        if sample_rate is None:
+            sample_rate = 24 / self.config["ScansToAverage"]
+        self.sample_rate = sample_rate
+        self.workers = workers
         self._load_hex()
         self._check_scan_lengths()
 
     def _load_hex(self):
         split_lines = self.raw_hex.splitlines()
+        # blank lines (e.g. from a stray \r) are skipped, as in mapped files
         self.raw_bytes = [
             line.strip().encode("utf-8")
             for line in split_lines
-            if not line.startswith("*")
+            if line.strip() and not line.startswith("*")
         ]
+        self._scan_bytes = None
+        self._segments = None
+        self._hex_path = None
         # next few lines are to grab start_scan_time
-        self.raw_comments = [
+        self._raw_comments = [
             line.strip().split() for line in split_lines if line.startswith("*")
         ]
 
+    def _map_hex(self, raw_hex_path, encoding="cp437"):
+        """
+        Memory-map a .hex file and view its data lines as a (zero-copy) strided 2D
+        uint8 array. Header comments are kept as bytes and only parsed on access.
+        """
+        with open(raw_hex_path, "rb") as raw_hex_file:
+            buffer = mmap.mmap(raw_hex_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # data starts on the line after *END*
+        header_end = buffer.find(b"*END*")
+        if header_end == -1:
+            raise ValueError(f"Could not find *END* of header in {raw_hex_path}")
+        data_start = buffer.find(b"\n", header_end) + 1 or len(buffer)
+
+        # line stride (incl. \n or \r\n and any trailing whitespace) is taken from
+        # the first data line
+        first_line_end = buffer.find(b"\n", data_start)
+        if first_line_end == -1:
+            first_line_end = len(buffer)
+        stride = first_line_end - data_start + 1
+        terminator = buffer[data_start + self.scan_length : first_line_end + 1]
+        first_line_ok = (terminator.endswith(b"\n") and not terminator.strip()) or (
+            first_line_end == len(buffer)  # single (or no) line without newline
+            and first_line_end - data_start in (0, self.scan_length)
+        )
+
+        self._data = np.frombuffer(buffer, dtype=np.uint8, offset=data_start)
+        self._hex_path = raw_hex_path
+        self._data_start = data_start
+        self._header = buffer[:data_start]
+        self._encoding = encoding
+        self._raw_comments = None
+        self.raw_bytes = None
+        if not first_line_ok:
+            # no usable stride, lines have to be found the slow way
+            self._stride = None
+            self._scan_bytes = np.empty((0, self.scan_length), dtype=np.uint8)
+            return
+
+        self._stride = stride
+        self._line_terminator = terminator
+        n_scans = max(len(self._data) - self.scan_length, -1) // stride + 1
+        self._scan_bytes = np.lib.stride_tricks.as_strided(
+            self._data,
+            shape=(n_scans, self.scan_length),
+            strides=(stride, 1),
+            writeable=False,
+        )
+
     def _check_scan_lengths(self):
-        if not all([len(scan) == self.scan_length for scan in self.raw_bytes]):
-            raise ValueError(
-                "The data length does not match the expected length from the config"
+        """
+        Find data lines that are not scan_length characters long, or that contain
+        characters other than hex digits (which would otherwise decode silently to
+        bogus values).
+
+        By default these raise a ValueError. With salvage="drop" they are removed,
+        with salvage="nan" they are kept as all-NaN scans; either way the line
+        indices are logged and stored in bad_scans.
+
+        Surrounding whitespace (incl. stray \r) and blank lines are ignored, like
+        for text input. Mapped files whose lines are not evenly spaced have their
+        scan lines copied out of the map.
+        """
+        self.bad_scans = np.empty(0, dtype=int)
+        line_starts = None
+        if self._scan_bytes is not None:
+            if self._check_line_stride():
+                line_lengths = np.full(len(self._scan_bytes), self.scan_length)
+            else:
+                line_starts, line_lengths = self._find_lines()
+        else:
+            line_lengths = np.fromiter(
+                map(len, self.raw_bytes), dtype=int, count=len(self.raw_bytes)
             )
+        is_bad = line_lengths != self.scan_length
+        non_hex = self._find_non_hex(~is_bad, line_starts)
+        if self.salvage not in ("drop", "nan"):
+            if is_bad.any():
+                raise ValueError(
+                    "The data length does not match the expected length from the "
+                    f"config (bad scans: {np.flatnonzero(is_bad).tolist()})"
+                )
+            if non_hex.any():
+                raise ValueError(
+                    "Scan lines contain non-hex characters "
+                    f"(bad scans: {np.flatnonzero(non_hex).tolist()})"
+                )
+        else:
+            is_bad |= non_hex
+            if is_bad.any():
+                self.bad_scans = np.flatnonzero(is_bad)
+                log.warning(
+                    f"Salvaging {len(self.bad_scans)} malformed scan(s) "
+                    f"({self.salvage}): {self.bad_scans.tolist()}"
+                )
 
-    def _parse_scans(self):
+        if self._scan_bytes is None:
+            if not is_bad.any():
+                return
+            # placeholder lines decode cleanly and are NaN-filled afterwards
+            placeholder = b"0" * self.scan_length
+            if self.salvage == "drop":
+                self.raw_bytes = [
+                    line for line, bad in zip(self.raw_bytes, is_bad) if not bad
+                ]
+            else:
+                self.raw_bytes = [
+                    placeholder if bad else line
+                    for line, bad in zip(self.raw_bytes, is_bad)
+                ]
+            return
+
+        if line_starts is None:  # constant stride
+            if not is_bad.any():
+                return
+            line_starts = np.arange(len(self._scan_bytes)) * self._stride
+        # copy good lines out of the map in blocks to bound the gather index size;
+        # the copy can't be decoded by strided workers (_parse_parallel)
+        self._stride = None
+        good_starts = line_starts[~is_bad]
+        good_bytes = np.empty((len(good_starts), self.scan_length), dtype=np.uint8)
+        columns = np.arange(self.scan_length)
+        for i in range(0, len(good_starts), 2**14):
+            index = good_starts[i : i + 2**14, None] + columns
+            good_bytes[i : i + 2**14] = self._data[index]
+        if self.salvage == "nan":
+            self._scan_bytes = np.full(
+                (len(line_starts), self.scan_length), ord("0"), dtype=np.uint8
+            )
+            self._scan_bytes[~is_bad] = good_bytes
+        else:
+            self._scan_bytes = good_bytes
+
+    def _find_non_hex(self, is_full, line_starts=None):
+        """
+        Flag data lines (of those full scan_length lines marked in is_full) that
+        contain non-hex characters. Lines are checked in blocks, so memory use does
+        not grow with the file. line_starts are the line offsets in a mapped file
+        without a constant stride (see _find_lines).
+        """
+        rows = np.flatnonzero(is_full)
+        non_hex = np.zeros(len(is_full), dtype=bool)
+        columns = np.arange(self.scan_length)
+        for i in range(0, len(rows), 2**14):
+            block = rows[i : i + 2**14]
+            if line_starts is not None:
+                scan_bytes = self._data[line_starts[block, None] + columns]
+            elif self._scan_bytes is not None:
+                scan_bytes = self._scan_bytes[block]
+            else:
+                scan_bytes = np.frombuffer(
+                    b"".join([self.raw_bytes[row] for row in block]), dtype=np.uint8
+                ).reshape(-1, self.scan_length)
+            non_hex[block] = (_hex_nibbles(scan_bytes) == 0xFF).any(axis=1)
+        return non_hex
+
+    def _check_line_stride(self):
+        """Check that every line of a mapped file ends where the stride says it does."""
+        n_scans, stride = len(self._scan_bytes), self._stride
+        if stride is None:
+            return False
+        if n_scans > 1:
+            terminators = np.lib.stride_tricks.as_strided(
+                self._data[self.scan_length :],
+                shape=(n_scans - 1, stride - self.scan_length),
+                strides=(stride, 1),
+                writeable=False,
+            )
+            expected = np.frombuffer(self._line_terminator, dtype=np.uint8)
+            if not (terminators == expected).all():
+                return False
+
+        # anything left after the last full scan can only be whitespace
+        data_end = (n_scans - 1) * stride + self.scan_length if n_scans else 0
+        return not self._data[data_end:].tobytes().strip()
+
+    def _find_lines(self):
+        """
+        Locate the data lines of a mapped file by searching for newlines. Returns
+        arrays of the start offset and length (without terminator and surrounding
+        whitespace, as for text input) of each line.
+        """
+        newlines = np.flatnonzero(self._data == ord("\n"))
+        line_starts, line_lengths = _strip_lines(
+            self._data,
+            np.concatenate(([0], newlines + 1)),
+            np.concatenate((newlines, [len(self._data)])),
+        )
+
+        # ignore blank lines (as for text input)
+        is_blank = line_lengths == 0
+        return line_starts[~is_blank], line_lengths[~is_blank]
+
+    def _parse_scans(self, start=0, stop=None):
         """The order according to the SBE docs are:
         1) Data from the instrument
           a) Frequency (3 bytes each)
@@ -62,52 +774,94 @@ class SBEReader:
           c) modulo byte (1 byte)
         7) System time (4 bytes) (low byte first)
         If any of the above are omitted, the length of the hex will be smaller.
+
+        Only scans[start:stop] are decoded (default all).
         """
+        return self._mask_bad_scans(self._decode_scans(self._scan_matrix(start, stop)))
 
-        # parse the frequencies
-        # scan_list = list(scan)
-        num_frequencies = 5 - self.config["FrequencyChannelsSuppressed"]
-        num_voltages = 8 - self.config["VoltageWordsSuppressed"]
-        flag_spar = 0
-
-        if self.config["SurfaceParVoltageAdded"]:
-            flag_spar = 1
-
-        the_bytes = b"".join(self.raw_bytes)
-
-        # specify how each line of raw data should be broken down
-        unpack_str = (
-            "6s" * num_frequencies
-            + "3s" * num_voltages
-            + "2s" * flag_spar
-            + "4s" * flag_spar
-            + "{}s".format(
-                self.scan_length
-                - num_voltages * 3
-                - num_frequencies * 6
-                - flag_spar * 6
-            )
-        )
-        measurements = np.array(
-            [
-                [int(x, 16) for x in line]
-                for line in struct.iter_unpack(unpack_str, the_bytes)
-            ]
-        )
+    def _decode_scans(self, scan_bytes):
+        """
+        Decode frequencies/voltages from a 2D uint8 array of scan lines. Only the
+        words of the selected channels (all by default) are decoded.
+        """
+        return self.plan.scans(scan_bytes, self.channels)
 
-        # this uses numpy magic to just "apply" the needed operations to the correct part of the array all in one go
-        measurements[:, :num_frequencies] = measurements[:, :num_frequencies] / 256
-        measurements[:, num_frequencies : num_frequencies + num_voltages] = 5 * (
-            1
-            - (measurements[:, num_frequencies : num_frequencies + num_voltages] / 4095)
-        )
-        measurements = measurements[
-            :, 0:-1
-        ]  # remove after applying _parse_scans_meta in here
-        # print(measurements.shape)
-        return measurements
+    @property
+    def plan(self):
+        """DecodePlan of this reader's scan layout (see decode_plan)."""
+        return decode_plan(self.layout)
 
-    def _parse_scans_meta(self):
+    @property
+    def channels(self):
+        """
+        Sorted sensor indices (frequency channels, then voltage channels, then raw
+        surface PAR) included in parsed_scans, or None for all of them.
+        """
+        return self._channels
+
+    @channels.setter
+    def channels(self, channels):
+        if channels is not None:
+            channels = sorted(set(int(ch) for ch in channels))
+            n_channels = self.plan.n_channels
+            if channels and not 0 <= channels[0] <= channels[-1] < n_channels:
+                raise ValueError(
+                    f"Channels must be between 0 and {n_channels - 1}, got {channels}"
+                )
+        if channels != getattr(self, "_channels", None):
+            self._parsed_scans = None
+        self._channels = channels
+
+    def _decode_modulo(self, scan_bytes):
+        """Decode the modulo byte from a 2D uint8 array of scan lines."""
+        start, width = self.layout["fields"]["modulo"]
+        return _hex_words(_hex_nibbles(scan_bytes[:, start : start + width]), 2)[:, 0]
+
+    def _mask_bad_scans(self, values, start=0):
+        """NaN-fill rows of values (decoded from scans[start:]) salvaged as "nan"."""
+        if self.salvage != "nan" or not len(self.bad_scans):
+            return values
+        bad_scans = self.bad_scans - start
+        rows = bad_scans[(bad_scans >= 0) & (bad_scans < len(values))]
+        if values.dtype.names is None:
+            values[rows] = np.nan
+            return values
+
+        # only float fields can hold NaN, reconstructed scan times are still valid
+        for name in values.dtype.names:
+            if values.dtype[name].kind != "f":
+                continue
+            if name == "scan_datetime" and "scan_time" not in self.layout["fields"]:
+                continue
+            values[name][rows] = np.nan
+        return values
+
+    def _scan_matrix(self, start=0, stop=None):
+        """
+        View the data lines (scans[start:stop]) as a 2D uint8 array with one row per
+        scan and one column per hex character.
+        """
+        if self._scan_bytes is not None:
+            return self._scan_bytes[start:stop]
+        if self._segments is not None:
+            return self._segment_matrix(start, stop)
+        the_bytes = b"".join(self.raw_bytes[start:stop])
+        return np.frombuffer(the_bytes, dtype=np.uint8).reshape(-1, self.scan_length)
+
+    def _segment_matrix(self, start=0, stop=None):
+        """_scan_matrix of stitched files, copying only the requested scans."""
+        start, stop, _ = slice(start, stop).indices(self.n_scans)
+        blocks = []
+        for segment in self._segments:
+            if start < segment.n_scans and stop > 0:
+                blocks.append(segment._scan_matrix(max(start, 0), stop))
+            start -= segment.n_scans
+            stop -= segment.n_scans
+        if not blocks:
+            return np.empty((0, self.scan_length), dtype=np.uint8)
+        return np.concatenate(blocks)
+
+    def _parse_scans_meta(self, start=0, stop=None):
         """The order according to the SBE docs are:
         1) Data from the instrument
           a) Frequency (3 bytes each)
@@ -122,164 +876,39 @@ class SBEReader:
           c) modulo byte (1 byte)
         7) System time (4 bytes) (low byte first)
         If any of the above are omitted, the length of the hex will be smaller.
-        """
 
-        # parse the frequencies
-        # scan_list = list(scan)
-        num_frequencies = 5 - self.config["FrequencyChannelsSuppressed"]
-        num_voltages = 8 - self.config["VoltageWordsSuppressed"]
-
-        string_order = ["scan"]
-        # flags to determine how many bytes to break by
-        flag_nmea_pos = 0
-        flag_nmea_depth = 0
-        flag_nmea_time = 0
-        flag_scan_time = 0
-        flag_spar = 0
-        # put in to make code readable later on
-        flag_pressure_temp = 1
-        flag_ctd_status = 1
-        flag_modulo = 1
-        if self.config["SurfaceParVoltageAdded"]:
-            flag_spar = 1
-            # string_order.append('spar') #already added into mass line, does not need additional flag
-        if self.config["NmeaPositionDataAdded"]:
-            flag_nmea_pos = 1
-            string_order.append("nmea_pos")
-            # Depth is here for completeness but not implemented,
-            # after email chain showed SBE no longer knows how they did it.
-        if self.config["NmeaDepthDataAdded"]:
-            flag_nmea_depth = 1
-            string_order.append("nmea_depth")
-        if self.config["NmeaTimeAdded"]:
-            flag_nmea_time = 1
-            string_order.append("nmea_time")
-        string_order.append("pressure_temp")
-        string_order.append("flag_ctd_status")
-        string_order.append("modulo")
-        if self.config["ScanTimeAdded"]:
-            flag_scan_time = 1
-            string_order.append("scan_time")
-
-        the_bytes = b"".join(self.raw_bytes)
-
-        # specify how each line of raw data should be broken down
-        # this format is fed directly into _breakdown, so it needs to be tracked there
-        unpack_str = (
-            str(num_frequencies * 6 + num_voltages * 3 + flag_spar * 6)
-            + "s"
-            + "14s" * flag_nmea_pos
-            + "6s" * flag_nmea_depth
-            + "8s" * flag_nmea_time
-            + "3s" * flag_pressure_temp
-            + "1s" * flag_ctd_status
-            + "2s" * flag_modulo
-            + "8s" * flag_scan_time
+        Only scans[start:stop] are decoded (default all).
+        """
+        skipped = None
+        if "scan_time" not in self.layout["fields"]:
+            skipped = self._skipped_scans(start, stop)
+        meta = self._decode_meta(
+            self._scan_matrix(start, stop), first_scan=start, skipped=skipped
         )
-        # breaks down line according to columns specified by unpack_str and converts from hex to decimal MSB first
-        # needs to be adjusted for LSB fields (NMEA time, scan time), break into two lines? move int(x,16) outside
-        measurements = [line for line in struct.iter_unpack(unpack_str, the_bytes)]
-        # print(unpack_str)
-        # measurements_2 = np.array([self._breakdown(line, string_order) for line in measurements])
-        measurements_2 = [self._breakdown(line, string_order) for line in measurements]
-        # if no time is enabled, fake the scan timestamp from info in the .hex file
-        if flag_scan_time == 0:
-            measurements_3 = self._sbe_time_seq(measurements_2)
-            #            print(True)
-            measurements_3 = np.array(measurements_3)
-            return measurements_3
-        # print(measurements_3)
-        return np.array(measurements_2)
-
-    def _breakdown(self, line, ordering):
-        """
-        Convert hex metadata to science useable data.
-
-        Steps:
-        1. Throw away away first part of the line
-        2. Start processing the rest of the line
-        3. Return a sequence (tuple? list?)
-
-        Input:
-        line - a sequence specified by format in _parse_scans_meta
-        ordering - the order the string comes in
-
-        Output:
-        output - a string of converted data according to format
+        return self._mask_bad_scans(meta, start)
 
-        Format:
-        Lat, Lon, pressure temp, bottle fire status, NMEA time, Scan time
+    def _decode_meta(self, scan_bytes, first_scan=0, skipped=None):
         """
-        output = ""
-        # print(ordering, line)
-        for x, y in zip(ordering, line):
-            if x == "nmea_pos":
-                tokens = []
-                # print(y)
-                for t in struct.iter_unpack("2s2s2s2s2s2s2s", y):
-                    for tt in t:
-                        tokens.append(tt)
-                output = (
-                    output
-                    + str(
-                        self._location_fix(
-                            tokens[0],
-                            tokens[1],
-                            tokens[2],
-                            tokens[3],
-                            tokens[4],
-                            tokens[5],
-                            tokens[6],
-                        )
-                    )
-                    + ","
-                )
-            elif x == "nmea_time":
-                output = (
-                    output + str(self._sbe_time(self._reverse_bytes(y), "nmea")) + ","
-                )
-            elif x == "scan_time":
-                output = output + str(self._sbe_time(self._reverse_bytes(y), "scan"))
-            elif x == "flag_ctd_status":
-                output = (
-                    output
-                    + str(self._pump_status(y))
-                    + ","
-                    + str(self._bottle_fire(y))
-                    + ","
-                )  # need to make final comma dynamic later so less errors down the line
-            elif x == "pressure_temp":
-                output = output + str(int(y, 16)) + ","
-
-        return output
+        Decode metadata from a 2D uint8 array of scan lines, where the first row is
+        scan number first_scan of the cast. skipped is passed on to _sbe_time_seq.
+        """
+        meta = self.plan.meta(scan_bytes)
+        if not self.plan.has_scan_time:
+            # if no time is enabled, fake the scan timestamp from info in the .hex file
+            meta["scan_datetime"] = self._sbe_time_seq(len(meta), first_scan, skipped)
+        return meta
 
     def _breakdown_header(self):
         """Creates header for metadata. Arrays below are what is expected.
+        Used as the field names and dtypes of the _parse_scans_meta structured array
+        (see DecodePlan.meta_dtype).
 
-        ['GPSLAT', 'GPSLON', 'new_fix', 'nmea_datetime', 'pressure_temp_int', 'btl_fire', 'scan_datetime'],
-        ['float64', 'float64', 'bool_', 'datetime64', 'int_', 'bool_', 'datetime64']
-        """
-        # temp fix, need to adjust to take in file to adjust as wanted?
-        output = [[], []]
-        if self.config["NmeaPositionDataAdded"]:
-            output[0] = ["GPSLAT", "GPSLON", "new_fix"]
-            output[1] = ["float64", "float64", "bool_"]
-        if self.config["NmeaTimeAdded"]:
-            output[0].append("nmea_datetime")
-            output[1].append("float64")
-        output[0].append("pressure_temp_int")
-        output[1].append("int_")
-        output[0].append("pump_on")
-        output[1].append("bool_")
-        output[0].append("btl_fire")
-        output[1].append("bool_")
-        # if self.config["ScanTimeAdded"]: #need to fix flagging part
-        # output[0].append('scan_datetime')
-        # output[1].append('float64')
-        output[0].append("scan_datetime")
-        output[1].append("float64")
-
-        return output
+        ['GPSLAT', 'GPSLON', 'new_fix', 'nmea_datetime', 'pressure_temp_int', 'pump_on', 'btl_fire', 'scan_datetime'],
+        ['float64', 'float64', 'bool', 'float64', 'int64', 'bool', 'bool', 'float64']
+        """
+        meta_dtype = self.plan.meta_dtype
+        names = list(meta_dtype.names)
+        return [names, [meta_dtype[name].name for name in names]]
 
     def _location_fix(self, b1, b2, b3, b4, b5, b6, b7):
         """Determine location from SBE format.
@@ -320,6 +949,17 @@ class SBEReader:
         output = "{0},{1},{2}".format(lat, lon, flag_new_fix)
         return output
 
+    def _location_fixes(self, fix_chars):
+        """Vectorized _location_fix.
+
+        Input:
+        fix_chars: 2D uint8 array of NMEA position hex chars, 14 per scan
+
+        Output:
+        Tuple of arrays: latitude (float), longitude (float), new fix (bool)
+        """
+        return _decode_location(fix_chars)
+
     def _reverse_bytes(self, hex_time):
         """Reverse hex time according to SBE docs.
         Split number by every two chars, then recombine them in reverse order.
@@ -392,6 +1032,19 @@ class SBEReader:
                 'Please choose "nmea" or "scan" for second input to _sbe_time()'
             )
 
+    def _sbe_times(self, time_chars, sbe_type, datetime64=False):
+        """Vectorized _sbe_time(_reverse_bytes(...)).
+
+        Input:
+        time_chars: 2D uint8 array of raw (low byte first) hex chars, 8 per scan
+        sbe_type: either "nmea" or "scan"
+        datetime64: return datetime64[s] instead of epoch floats
+
+        Output:
+        Array of UTC epoch timestamps (or datetime64[s])
+        """
+        return _decode_sbe_times(time_chars, sbe_type, datetime64)
+
     def _sbe_time_create(self, utc_time, sbe_type="scan"):
         """Reverse of _sbe_time, create a sbe timestamp in hex to append to file.
         Useful when SBE acquisition software does not have NMEA time or scan time activated.
@@ -417,12 +1070,8 @@ class SBEReader:
         output = self._reverse_bytes(bytearray(hex_time, "utf-8"))
         return output
 
-    def _sbe_time_seq(self, data_list):
-        """Recreates the scan timestamp if the option was not enabled in SBE acq.
-        Accurate to 1 second/24hz, as it uses the start time in the second to last line of the .hex file.
-
-        Sequencer will run over a processed file/list? and append the scan time at the end.
-        """
+    def _start_time(self):
+        """Epoch timestamp of the "System UTC" (second to last) .hex header line."""
         # Pull out the second to last line of the comments in .hex,
         # then pull out the datetime info at the end of the line, then format
         start_month = self.raw_comments[-2][-4]
@@ -433,19 +1082,28 @@ class SBEReader:
         start_scan_time = datetime.datetime.strptime(
             start_month + start_day + start_year + start_time, "%b%d%Y%H:%M:%S"
         )
-        current_scan_time = start_scan_time
-        hz_counter = 0
-        output = []
-        for line in data_list:
-            if hz_counter >= 24:
-                hz_counter = 0
-                current_scan_time = current_scan_time + datetime.timedelta(seconds=1)
-            line = line + str(
-                current_scan_time.replace(tzinfo=timezone("UTC")).timestamp()
-            )
-            output.append(line)
-            hz_counter += 1
-        return output
+        return start_scan_time.replace(tzinfo=timezone("UTC")).timestamp()
+
+    def _sbe_time_seq(self, n_scans, first_scan=0, skipped=None, datetime64=False):
+        """Recreates the scan timestamp if the option was not enabled in SBE acq.
+        Accurate to 1 second, as it uses the start time in the second to last line of the .hex file.
+
+        Returns an array of n_scans epoch timestamps (or datetime64[s]), starting
+        from scan first_scan, at sample_rate scans per second. skipped is the number
+        of scans dropped (see scan_gaps) before each one, so that timestamps after a
+        gap do not fall behind.
+        """
+        if n_scans == 0:
+            return np.empty(0, dtype="datetime64[s]" if datetime64 else float)
+        scan_numbers = np.arange(first_scan, first_scan + n_scans)
+        if skipped is not None:
+            scan_numbers = scan_numbers + skipped
+        seconds = np.floor(scan_numbers / self.sample_rate).astype(np.int64)
+
+        start_scan_time = int(self._start_time())
+        if datetime64:
+            return (start_scan_time + seconds).astype("datetime64[s]")
+        return (start_scan_time + seconds).astype(float)
 
     def _flag_status(self, flag_char, scan_number):
         """Decode SBE flag bit, as referenced on SBE 11pV2, pg 66.
@@ -537,81 +1195,127 @@ class SBEReader:
     #     T_d = (AD590M * charm) + AD590B
     #     return T_d
 
-    """Only for values in bools and numeric. """
-
     def _parse_config(self):
-        bools = [
-            "SurfaceParVoltageAdded",
-            "NmeaPositionDataAdded",
-            "NmeaDepthDataAdded",
-            "NmeaTimeAdded",
-            "ScanTimeAdded",
-        ]
-        numeric = [
-            "FrequencyChannelsSuppressed",
-            "VoltageWordsSuppressed",
-        ]
-        sensors = {}
-
-        config = ET.fromstring(self.xml_config)
-        self.config = {}
-
-        for key in numeric:
-            try:
-                self.config[key] = int(config.find("./Instrument/{}".format(key)).text)
-            except AttributeError:
-                raise AttributeError("Could not find {} in XMLCONF".format(key))
-            except ValueError:
-                raise ValueError("{} Value is not a number".format(key))
-
-        for key in bools:
-            try:
-                self.config[key] = bool(
-                    int(config.find("./Instrument/{}".format(key)).text)
-                )
-            except AttributeError:
-                raise AttributeError("Could not find {} in XMLCONF".format(key))
-            except ValueError:
-                raise ValueError("{} Value is not truthy".format(key))
-
-        """Pokedex is a dict of {Sensor index numbers from the config:sensor info}
-        Assume that sensor index number is the order the sensors have been entered into the file.
-        Therefore, it will be Frequency instruments first, then Voltage instruments.
-        Call their index number (starting at 0) in order to pull out the info.
-
-        """
-        # pokedex = {}
-        for x in config.iter("Sensor"):
-            # print(ET.tostring(x))
-            """Start creating single sensor dictionary."""
-            bulbasaur = {}
-            bulbasaur["SensorID"] = x.attrib["SensorID"]
-            # load all values into dict - beware of overwriting #NEED TO FIX
-            for children in x:
-                for y in children.iter():
-                    try:
-                        bulbasaur[y.tag] = float(y.text)
-                    except (TypeError, ValueError):
-                        bulbasaur[y.tag] = (
-                            str(y.text).replace("\n", "").replace(" ", "")
-                        )
-
-                """Add sensor to big dictionary."""
-                # pokedex[x.attrib['index']] = bulbasaur
-                sensors[int(x.attrib["index"])] = bulbasaur
-        # sensors.append(pokedex)
-        self.config["Sensors"] = sensors
+        """Parse (or fetch from cache) the .XMLCON config and its scan layout."""
+        self.config, self.layout = parse_xmlcon(self.xml_config, self.cache_dir)
 
     @classmethod
-    def from_paths(cls, raw_hex_path, xml_config_path, encoding="cp437"):
+    def from_paths(
+        cls,
+        raw_hex_path,
+        xml_config_path,
+        encoding="cp437",
+        mmap=False,
+        **kwargs,
+    ):
+        """
+        Create an SBEReader from .hex and .XMLCON file paths.
+
+        With mmap=True the .hex file is memory-mapped in binary instead of read as
+        text, and scans are decoded straight from the mapped bytes. raw_hex is not
+        available (None) for mapped readers.
+
+        Other keyword arguments (cache_dir, salvage, channels, sample_rate, workers)
+        are passed to SBEReader().
+
+        raw_hex_path can also be an ordered list of .hex files from one cast (e.g.
+        after an acquisition restart), which are read separately and decoded as one
+        stream (see _stitch). The header of the first file is used.
+        """
+        if isinstance(raw_hex_path, (list, tuple)):
+            segments = [
+                cls.from_paths(path, xml_config_path, encoding, mmap, **kwargs)
+                for path in raw_hex_path
+            ]
+            return cls._stitch(segments)
+
+        if mmap:
+            with open(xml_config_path, encoding=encoding) as xml_config_file:
+                instance = cls("", xml_config_file.read(), **kwargs)
+            instance.raw_hex = None
+            instance._map_hex(raw_hex_path, encoding=encoding)
+            instance._check_scan_lengths()
+            return instance
+
         with open(raw_hex_path, encoding=encoding) as raw_hex_file, open(
             xml_config_path, encoding=encoding
         ) as xml_config_file:
-            return cls(raw_hex_file.read(), xml_config_file.read())
+            return cls(raw_hex_file.read(), xml_config_file.read(), **kwargs)
+
+    @classmethod
+    def _stitch(cls, segments):
+        """
+        Combine readers of consecutive .hex files (same .XMLCON) into one reader.
+        Scans are read from the segments on demand, so the files are never joined
+        in memory; dropped scans at each boundary are counted in scan_gaps().
+        """
+        first = segments[0]
+        if any(segment.xml_config != first.xml_config for segment in segments):
+            raise ValueError("Stitched .hex files must share the same .XMLCON")
+        instance = cls(
+            "",
+            first.xml_config,
+            cache_dir=first.cache_dir,
+            salvage=first.salvage,
+            channels=first.channels,
+            sample_rate=first.sample_rate,
+        )
+        instance.raw_hex = None
+        instance.raw_bytes = None
+        instance._segments = segments
+        instance._raw_comments = first.raw_comments
+
+        offsets = np.cumsum([0] + [segment.n_scans for segment in segments[:-1]])
+        instance.bad_scans = np.concatenate(
+            [segment.bad_scans + offset for segment, offset in zip(segments, offsets)]
+        )
+        return instance
+
+    @property
+    def raw_comments(self):
+        """Header lines (split on whitespace), parsed on first access for mapped files."""
+        if self._raw_comments is None:
+            header = self._header.decode(self._encoding).splitlines()
+            self._raw_comments = [
+                line.strip().split() for line in header if line.startswith("*")
+            ]
+        return self._raw_comments
+
+    def iter_chunks(self, n_scans):
+        """
+        Decode the cast in blocks of (at most) n_scans, yielding tuples of
+        (scans, meta) arrays in the same format as parsed_scans and parsed_meta.
+
+        Blocks are decoded on demand and not cached, so memory use is bounded by
+        n_scans rather than the length of the cast (when combined with
+        from_paths(..., mmap=True), the raw file is not held in memory either).
+        """
+        if n_scans < 1:
+            raise ValueError("n_scans must be a positive integer")
+        cached = self._parsed_scans is not None and self._parsed_meta is not None
+        for start in range(0, self.n_scans, n_scans):
+            stop = start + n_scans
+            if cached:
+                yield self._parsed_scans[start:stop], self._parsed_meta[start:stop]
+            else:
+                yield self._parse_scans(start, stop), self._parse_scans_meta(
+                    start, stop
+                )
+
+    @property
+    def n_scans(self):
+        """Number of scans (data lines) in the .hex file."""
+        if self._parsed_meta is not None:
+            return len(self._parsed_meta)
+        if self._scan_bytes is not None:
+            return len(self._scan_bytes)
+        if self._segments is not None:
+            return sum(segment.n_scans for segment in self._segments)
+        return len(self.raw_bytes)
 
     @property
     def scan_length(self):
-        return self.calculate_scan_byte_length()
+        return self.layout["scan_length"]
 
     @property
     def frequency_channels(self):
@@ -634,37 +1338,360 @@ class SBEReader:
     @property
     def parsed_scans(self):
         """
-        Wrapper for _parse_scans and _parse_scans_meta. Returns np.ndarray
-        """
-        # try:
-        #     return self._parse_scans
-        # except AttributeError:
-        #     self._parse_scans = np.concatenate((self._parse_scans(), self._parse_scans_meta().reshape(self._parse_scans_meta().size,1)), axis = 1)
-        #     return self._parse_scans
-        return np.concatenate(
-            (
-                self._parse_scans(),
-                self._parse_scans_meta().reshape(self._parse_scans_meta().size, 1),
-            ),
-            axis=1,
-        )
-        # return self._parse_scans
+        Frequencies/voltages from _parse_scans as np.ndarray. Decoded on first access
+        and cached until clear_cache() is called.
+        """
+        if self._parsed_scans is None:
+            if self._can_parallelize():
+                self._parse_parallel()
+            else:
+                self._parsed_scans = self._parse_scans()
+        return self._parsed_scans
+
+    @property
+    def parsed_meta(self):
+        """
+        Scan metadata from _parse_scans_meta as a structured np.ndarray. Decoded on
+        first access and cached until clear_cache() is called.
+        """
+        if self._parsed_meta is None:
+            if self._can_parallelize():
+                self._parse_parallel()
+            else:
+                self._parsed_meta = self._parse_scans_meta()
+        return self._parsed_meta
+
+    def _can_parallelize(self):
+        """
+        Whether parsed_scans/parsed_meta can be decoded in worker processes: only
+        for memory-mapped files with a constant line stride and no salvaged lines.
+        """
+        if self.workers is None or self.workers < 2:
+            return False
+        if self._hex_path is None or self._stride is None or len(self.bad_scans):
+            log.debug("Parallel decoding needs a clean memory-mapped .hex file")
+            return False
+        return self.n_scans >= self.workers
+
+    def _parse_parallel(self):
+        """
+        Decode parsed_scans and/or parsed_meta (whichever are not cached) in a pool
+        of self.workers processes. The data lines are split at line boundaries into
+        one byte range per worker, and the decoded blocks concatenated in order, so
+        the result is identical to decoding in a single process.
+        """
+        bounds = np.linspace(0, self.n_scans, self.workers + 1).astype(int)
+        state = {
+            "xml_config": self.xml_config,
+            "channels": self.channels,
+            "sample_rate": self.sample_rate,
+            "raw_comments": self.raw_comments,
+            "scans": self._parsed_scans is None,
+            "meta": self._parsed_meta is None,
+        }
+        no_scan_time = "scan_time" not in self.layout["fields"]
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(
+                    _decode_scan_range,
+                    self._hex_path,
+                    self._data_start + start * self._stride,
+                    self._stride,
+                    stop - start,
+                    dict(state, first_scan=start),
+                    self._skipped_scans(start, stop) if no_scan_time else None,
+                )
+                for start, stop in zip(bounds[:-1], bounds[1:])
+            ]
+            blocks = [future.result() for future in futures]
+
+        if state["scans"]:
+            self._parsed_scans = np.concatenate([scans for scans, _ in blocks])
+        if state["meta"]:
+            self._parsed_meta = np.concatenate([meta for _, meta in blocks])
+
+    def clear_cache(self):
+        """Drop decoded scans/metadata to free memory, they are re-decoded on access."""
+        self._parsed_scans = None
+        self._parsed_meta = None
+        self._scan_gaps = None
+
+    def scan_gaps(self):
+        """
+        Find dropped or duplicated scans from the modulo byte, which the deck unit
+        increments (mod 256) with every scan it receives.
+
+        Returns a structured array with one row per gap: "scan" is the index of the
+        first scan after the gap, and "n_missing" the number of scans lost before it
+        (-1 for a duplicated scan). Gaps of 255 scans look the same as duplicates,
+        and longer gaps are only counted mod 256. Cached until clear_cache().
+        """
+        if self._scan_gaps is None:
+            modulo = np.concatenate(
+                [
+                    self._decode_modulo(self._scan_matrix(start, start + 2**16))
+                    for start in range(0, max(self.n_scans, 1), 2**16)
+                ]
+            )
+            scans = np.arange(len(modulo))
+            if self.salvage == "nan" and len(self.bad_scans):
+                # placeholder modulo values of NaN-filled scans are not real
+                scans = np.delete(scans, self.bad_scans)
+            n_missing = (np.diff(modulo[scans]) - np.diff(scans)) % 256
+            n_missing[n_missing == 255] = -1
+            if self._segments is not None:
+                self._stitch_gaps(scans, n_missing)
+            is_gap = n_missing != 0
+
+            gaps = np.zeros(is_gap.sum(), dtype=[("scan", int), ("n_missing", int)])
+            gaps["scan"] = scans[1:][is_gap]
+            gaps["n_missing"] = n_missing[is_gap]
+            if len(gaps):
+                log.warning(
+                    f"Found {len(gaps)} gap(s) in scan sequence, "
+                    f"{gaps['n_missing'].sum()} scan(s) missing in total"
+                )
+            self._scan_gaps = gaps
+        return self._scan_gaps
+
+    def _stitch_gaps(self, scans, n_missing):
+        """
+        Resolve the number of scans lost between stitched .hex files (in place), as
+        the modulo byte alone can't count past 255. The "System UTC" header times of
+        the files give a rough count, which the modulo difference then pins down.
+        """
+        first_scan = 0
+        for prev, segment in zip(self._segments, self._segments[1:]):
+            first_scan += prev.n_scans
+            i = np.searchsorted(scans, first_scan) - 1
+            if i < 0 or i + 1 >= len(scans) or scans[i + 1] != first_scan:
+                continue  # no valid scans on one side of the boundary
+            elapsed = segment._start_time() - prev._start_time()
+            estimate = round(elapsed * self.sample_rate) - prev.n_scans
+            modulo_gap = n_missing[i] % 256
+            n_missing[i] = modulo_gap + 256 * round((estimate - modulo_gap) / 256)
+
+    def _skipped_scans(self, start, stop):
+        """Total number of missing scans (see scan_gaps) before each of scans[start:stop]."""
+        gaps = self.scan_gaps()
+        skipped = np.concatenate(([0], np.cumsum(gaps["n_missing"])))
+        scans = np.arange(start, min(stop, self.n_scans) if stop else self.n_scans)
+        return skipped[np.searchsorted(gaps["scan"], scans, side="right")]
 
     def parsed_config(self):
         return self.config
 
     def to_dict(self, parse_cache=True):
+        """
+        Export reader state. With parse_cache, the decoded arrays are exported in
+        place of the raw hex string (decoding them first if needed).
+        """
+        if not parse_cache:
+            return {
+                "raw_hex": self.raw_hex,
+                "xml_config": self.xml_config,
+                "salvage": self.salvage,
+                "channels": self.channels,
+                "sample_rate": self.sample_rate,
+            }
+
         return {
-            "raw_hex": self.raw_hex,
             "xml_config": self.xml_config,
+            "config": self.config,
+            "layout": self.layout,
+            "channels": self.channels,
+            "sample_rate": self.sample_rate,
+            "raw_comments": self.raw_comments,
+            "bad_scans": self.bad_scans,
             "_parsed_scans": self.parsed_scans,
+            "_parsed_meta": self.parsed_meta,
+            "_scan_gaps": self.scan_gaps(),
         }
 
     @classmethod
     def from_dict(cls, data):
-        instance = cls(data["raw_hex"], data["xml_config"])
-        try:
-            instance._parsed_scans = data["_parsed_scans"]
-        except KeyError:
-            pass
+        if "raw_hex" in data:
+            instance = cls(
+                data["raw_hex"],
+                data["xml_config"],
+                salvage=data.get("salvage"),
+                channels=data.get("channels"),
+                sample_rate=data.get("sample_rate"),
+            )
+        else:
+            instance = cls._from_decoded(data)
+        instance._parsed_scans = data.get("_parsed_scans", instance._parsed_scans)
+        instance._parsed_meta = data.get("_parsed_meta", instance._parsed_meta)
+        instance._scan_gaps = data.get("_scan_gaps", instance._scan_gaps)
         return instance
+
+    @classmethod
+    def _from_decoded(cls, data):
+        """
+        Reader for decoded arrays only (see to_dict), with no raw hex to (re)decode
+        from. The parsed config and layout are used as given when included, so
+        nothing is parsed or checked again.
+        """
+        instance = cls.__new__(cls)
+        instance.raw_hex = None
+        instance.xml_config = data["xml_config"]
+        instance.cache_dir = None
+        instance.salvage = None
+        instance.workers = None
+        instance.clear_cache()
+        if "config" in data:
+            instance.config, instance.layout = data["config"], data["layout"]
+        else:
+            instance._parse_config()
+        instance.channels = data.get("channels")
+        instance.sample_rate = data.get("sample_rate") or (
+            24 / instance.config["ScansToAverage"]
+        )
+        instance.raw_bytes = []
+        instance._scan_bytes = None
+        instance._segments = None
+        instance._hex_path = None
+        instance._raw_comments = data["raw_comments"]
+        instance.bad_scans = np.asarray(data.get("bad_scans", []), dtype=int)
+        return instance
+
+    def to_npz(self, path):
+        """
+        Save decoded raw counts (frequencies/voltages), metadata, and scan gaps to an
+        .npz file, so the cast can be re-converted without the .hex (see from_npz).
+
+        The file also holds the parsed config/layout (as JSON) and header lines, and
+        is tagged with a format version (_NPZ_VERSION).
+        """
+        data = self.to_dict()
+        arrays = {
+            "format_version": np.array(_NPZ_VERSION),
+            "xml_config": np.array(data["xml_config"]),
+            "config": np.array(json.dumps(data["config"])),
+            "layout": np.array(json.dumps(data["layout"])),
+            "sample_rate": np.array(data["sample_rate"], dtype=float),
+            "raw_comments": np.array([" ".join(line) for line in data["raw_comments"]]),
+            "bad_scans": data["bad_scans"],
+            "_parsed_scans": data["_parsed_scans"],
+            "_parsed_meta": data["_parsed_meta"],
+            "_scan_gaps": data["_scan_gaps"],
+        }
+        if data["channels"] is not None:
+            arrays["channels"] = np.array(data["channels"], dtype=int)
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def from_npz(cls, path, xml_config=None):
+        """
+        Load raw counts saved by to_npz. A different (e.g. corrected) xml_config can
+        be given, as long as it describes the same scan layout.
+
+        Files written before the format was versioned are still read, but their
+        .XMLCON has to be parsed again.
+        """
+        with np.load(path, allow_pickle=False) as npz:
+            data = {key: npz[key] for key in npz.files}
+        version = int(data.pop("format_version", 0))
+        if version > _NPZ_VERSION:
+            raise ValueError(
+                f"{path} has format version {version}, this version of ctdcal "
+                f"reads up to {_NPZ_VERSION}"
+            )
+        data["xml_config"] = str(data["xml_config"])
+        data["raw_comments"] = [line.split() for line in data["raw_comments"]]
+        if "channels" in data:
+            data["channels"] = data["channels"].tolist()
+        if version >= 1:
+            data["config"] = _int_sensor_keys(json.loads(str(data["config"])))
+            data["layout"] = json.loads(str(data["layout"]))
+            data["sample_rate"] = float(data["sample_rate"])
+
+        if xml_config is not None:
+            if "layout" in data:
+                saved_layout = data["layout"]
+            else:
+                _, saved_layout = parse_xmlcon(data["xml_config"])
+            config, layout = parse_xmlcon(xml_config)
+            if layout != saved_layout:
+                raise ValueError(
+                    f"Scan layout of .XMLCON does not match raw counts in {path}"
+                )
+            data.update(xml_config=xml_config, config=config, layout=layout)
+        return cls.from_dict(data)
+
+
+class HexFollower:
+    """
+    Follow a .hex file that is still being written (e.g. during acquisition) and
+    decode scans as they become available.
+
+    Each call to poll() reads only the bytes appended since the previous call and
+    decodes the complete scan lines among them; a partially written line is left
+    for the next poll. Nothing is returned until the header (*END*) is complete.
+    """
+
+    def __init__(self, raw_hex_path, xml_config_path, encoding="cp437"):
+        with open(xml_config_path, encoding=encoding) as xml_config_file:
+            self.reader = SBEReader("", xml_config_file.read())
+        self.reader.raw_hex = None
+        self.raw_hex_path = raw_hex_path
+        self.encoding = encoding
+        self.offset = 0  # bytes of the file consumed so far
+        self.n_scans = 0  # scans decoded so far
+        self.header_complete = False
+
+    def poll(self):
+        """
+        Decode newly completed scans. Returns (scans, meta) arrays in the same format
+        as SBEReader.parsed_scans/parsed_meta, which are empty if nothing new is
+        available.
+        """
+        with open(self.raw_hex_path, "rb") as raw_hex_file:
+            raw_hex_file.seek(self.offset)
+            new_bytes = raw_hex_file.read()
+
+        # only consume up to the last complete line
+        new_bytes = new_bytes[: new_bytes.rfind(b"\n") + 1]
+        if not self.header_complete:
+            header_end = new_bytes.find(b"*END*")
+            if header_end == -1 or new_bytes.find(b"\n", header_end) == -1:
+                return self._decode(np.empty((0, self.reader.scan_length), np.uint8))
+            data_start = new_bytes.find(b"\n", header_end) + 1
+            self.reader._header = new_bytes[:data_start]
+            self.reader._encoding = self.encoding
+            self.reader._raw_comments = None
+            self.header_complete = True
+            self.offset += data_start
+            new_bytes = new_bytes[data_start:]
+        self.offset += len(new_bytes)
+
+        return self._decode(self._split_lines(new_bytes))
+
+    def _split_lines(self, new_bytes):
+        """Gather \n (or \r\n) terminated scan lines into a 2D uint8 array."""
+        data = np.frombuffer(new_bytes, dtype=np.uint8)
+        line_ends = np.flatnonzero(data == ord("\n"))
+        line_starts, line_lengths = _strip_lines(
+            data, np.concatenate(([0], line_ends[:-1] + 1)), line_ends
+        )
+
+        # skip blank lines, all others must be complete scans
+        line_starts = line_starts[line_lengths > 0]
+        if (line_lengths[line_lengths > 0] != self.reader.scan_length).any():
+            raise ValueError(
+                "The data length does not match the expected length from the config"
+            )
+        scan_bytes = data[
+            line_starts[:, np.newaxis] + np.arange(self.reader.scan_length)
+        ]
+        if (_hex_nibbles(scan_bytes) == 0xFF).any():
+            raise ValueError("Scan lines contain non-hex characters")
+        return scan_bytes
+
+    def _decode(self, scan_bytes):
+        scans = self.reader._decode_scans(scan_bytes)
+        meta = self.reader._decode_meta(scan_bytes, first_scan=self.n_scans)
+        self.n_scans += len(scan_bytes)
+        return scans, meta
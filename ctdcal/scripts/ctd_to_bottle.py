@@ -3,6 +3,8 @@ import sys
 import numpy as np
 import pandas as pd
 
+from ctdcal import store
+
 
 def main(argv):
     """Creates a bottle file with CTD downcast information.
@@ -23,9 +25,9 @@ def main(argv):
         cast = int(ssscc[3:5])
         # bottle handling section
         dir_bottle = "data/bottle/"
-        bottle_postfix = "_btl_mean.pkl"
+        bottle_postfix = "_btl_mean"
 
-        df_bottle = pd.read_pickle(f"{dir_bottle}{ssscc}{bottle_postfix}")
+        df_bottle = store.load(f"{dir_bottle}{ssscc}{bottle_postfix}")
         # next line not strictly necessaryas we don't move every column, but left just in case
         df_bottle.rename(
             index=str,
@@ -4,8 +4,9 @@ import argparse
 import os
 import sys
 
-from . import convert as cnv
-from . import sbe_reader as sbe_reader
+from .. import convert as cnv
+from .. import sbe_reader as sbe_reader
+from .. import store
 
 DEBUG = False
 
@@ -18,8 +19,6 @@ RAW_SUFFIX = "_raw"
 # File extension to use for converted output
 CONVERTED_SUFFIX = "_cnv"
 
-PKL_EXT = "pkl"
-
 
 def debugPrint(*args, **kwargs):
     if DEBUG:
@@ -133,10 +132,8 @@ def main(argv):
     # convertedfileName  = filename_base + CONVERTED_SUFFIX + '.' + FILE_EXT
     # convertedfilePath = os.path.join(outputDir, convertedfileName)
 
-    ### Test pickle file conversion
-    pickle_file_name = filename_base + "." + PKL_EXT
-    pickle_file_path = os.path.join(outputDir, pickle_file_name)
-    converted_df.to_pickle(pickle_file_path)
+    # Save as a columnar store (see ctdcal.store)
+    store.save(converted_df, os.path.join(outputDir, filename_base))
 
     # debugPrint('Saving converted data to:', convertedfilePath + '... ', end='')
     # if cnv.saveConvertedDataToFile(converted_df, convertedfilePath, False):
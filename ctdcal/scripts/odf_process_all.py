@@ -19,7 +19,7 @@ import logging
 log = logging.getLogger(__name__)
 
 
-def odf_process_all():
+def odf_process_all(jobs=None):
 
     #####
     # Step 0: Load and define necessary variables
@@ -28,7 +28,7 @@ def odf_process_all():
     # cfg = get_ctdcal_config()
 
     #####
-    # Step 1: Generate intermediate file formats (.pkl, _salts.csv, _reft.csv)
+    # Step 1: Generate intermediate file formats (store directories, _salts.csv, _reft.csv)
     #####
 
     # load station/cast list from file
@@ -38,8 +38,8 @@ def odf_process_all():
         log.info("No ssscc.csv file found, generating from .hex file list")
         ssscc_list = process_ctd.make_ssscc_list()
 
-    # convert raw .hex files
-    convert.hex_to_ctd(ssscc_list)
+    # convert raw .hex files (jobs casts at a time)
+    convert.hex_to_ctd(ssscc_list, jobs=jobs)
 
     # process time files
     convert.make_time_files(ssscc_list)
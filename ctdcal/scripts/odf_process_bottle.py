@@ -3,13 +3,11 @@ import argparse
 import os
 import sys
 
-import pandas as pd
-
-from . import process_bottle as btl
+from .. import process_bottle as btl
+from .. import store
 
 # File extension to use for output files (csv-formatted)
 FILE_EXT = "csv"
-EXT_PKL = "pkl"
 
 # File extension to use for converted output
 CONVERTED_SUFFIX = "_cnv"
@@ -64,7 +62,7 @@ def main(argv):
         debugPrint("Running in debug mode")
 
     # Verify converted exists
-    if not os.path.isfile(args.cnv_file):
+    if not store.exists(args.cnv_file):
         errPrint("ERROR: Input converted file:", args.cnv_file, "not found\n")
         sys.exit(1)
 
@@ -84,7 +82,7 @@ def main(argv):
             sys.exit(1)
 
     debugPrint("Import converted data to dataframe... ", end="")
-    imported_df = pd.read_pickle(args.cnv_file)
+    imported_df = store.load(args.cnv_file)
     debugPrint("Success!")
 
     debugPrint(imported_df.head())
@@ -125,17 +123,15 @@ def main(argv):
     # Build the filename for the bottle fire mean data
     # meanfileName  = filename_base.replace(CONVERTED_SUFFIX,'') + BOTTLE_SUFFIX + MEAN_SUFFIX + '.' + FILE_EXT
     meanfileName = (
-        filename_base.replace(CONVERTED_SUFFIX, "")
-        + BOTTLE_SUFFIX
-        + MEAN_SUFFIX
-        + "."
-        + EXT_PKL
+        filename_base.replace(CONVERTED_SUFFIX, "") + BOTTLE_SUFFIX + MEAN_SUFFIX
     )
     meanfilePath = os.path.join(outputDir, meanfileName)
 
-    # Save the bottle fire mean dataframe to file.
+    # Save the bottle fire mean dataframe to file (see ctdcal.store)
     debugPrint("Saving mean data to:", meanfilePath + "... ", end="")
-    if not mean_df.to_pickle(meanfilePath):
+    try:
+        store.save(mean_df, meanfilePath)
+    except OSError:
         errPrint("ERROR: Could not save mean fire data to file")
     else:
         debugPrint("Success!")
@@ -0,0 +1,253 @@
+"""
+A module for storing intermediate CTD data (converted, time and bottle mean files) in
+a columnar format: one .npy file per column, in a directory per cast.
+
+Unlike pickled DataFrames, single columns can be read without loading the whole
+file, columns are memory-mapped (so only pages actually used are read from disk),
+and files do not depend on the pandas version that wrote them.
+
+Intermediate files written by older versions of ctdcal as pickles (e.g.
+``data/converted/00101.pkl``) are still read if no columnar store exists.
+"""
+
+import fnmatch
+import json
+import logging
+import re
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+# bump when the directory layout changes, older stores are still read
+_STORE_VERSION = 1
+_META_FILE = "columns.json"
+
+
+def _store_dir(path):
+    """Directory of a store, accepting a legacy path with a .pkl extension."""
+    path = Path(path)
+    return path.with_suffix("") if path.suffix == ".pkl" else path
+
+
+def _pickle_file(path):
+    """Legacy pickle file alongside (or instead of) a store."""
+    return _store_dir(path).with_name(_store_dir(path).name + ".pkl")
+
+
+def _column_file(name, idx):
+    """File name for a column, the column name itself if it is a safe file name."""
+    if isinstance(name, str) and re.fullmatch(r"[A-Za-z0-9_\-]+", name):
+        return name + ".npy"
+    return f"_col{idx}.npy"
+
+
+def _column_values(name, series):
+    """Column values as an array np.save can write without pickling."""
+    values = series.to_numpy()
+    if values.dtype.kind == "O":
+        inferred = pd.api.types.infer_dtype(values, skipna=False)
+        if inferred not in ("string", "boolean", "integer", "floating"):
+            raise TypeError(f"Column {name!r} has mixed types and cannot be stored")
+        values = np.asarray(values.tolist())
+        log.debug(f"Storing object column {name!r} as {values.dtype}")
+    return values
+
+
+def column_dtypes(columns, patterns):
+    """
+    Storage dtypes of columns from a {pattern: dtype} mapping of fnmatch-style
+    column name patterns (e.g. ctdcal.config ctd_dtypes), the first matching pattern
+    wins. Columns matching no pattern are left out.
+    """
+    dtypes = {}
+    for col in columns:
+        for pattern, dtype in patterns.items():
+            if isinstance(col, str) and fnmatch.fnmatchcase(col, pattern):
+                dtypes[col] = np.dtype(dtype)
+                break
+    return dtypes
+
+
+def compact(df, patterns):
+    """
+    Cast DataFrame columns to their storage dtypes (see column_dtypes). Columns are
+    only cast to integer/bool dtypes if all values fit exactly (e.g. no NaN, or
+    averaged flags that are no longer 0/1).
+
+    Parameters
+    ----------
+    df : DataFrame
+        Data to cast
+    patterns : dict
+        Storage dtypes by column name pattern, e.g. {"CTDXMISS*": "float32"}
+
+    Returns
+    -------
+    df : DataFrame
+        Data with cast columns (df itself if no column needs casting)
+    """
+    dtypes = {}
+    for col, dtype in column_dtypes(df.columns, patterns).items():
+        values = df[col].to_numpy()
+        if values.dtype == dtype:
+            continue
+        if dtype.kind in "biu":
+            with np.errstate(invalid="ignore"):
+                exact = (values.astype(dtype) == values).all()
+            if not exact:
+                log.debug(f"Values of {col!r} do not fit {dtype}, not casting")
+                continue
+        dtypes[col] = dtype
+    return df.astype(dtypes) if dtypes else df
+
+
+def save(df, path):
+    """
+    Save a DataFrame as a columnar store: a directory with one .npy file per
+    column (plus the index, unless it is a RangeIndex) and a columns.json listing
+    them. Any previous store or legacy pickle at path is replaced.
+
+    Parameters
+    ----------
+    df : DataFrame
+        Data to save
+    path : str or Path
+        Store directory, e.g. "data/converted/00101"
+    """
+    store_dir = _store_dir(path)
+    if store_dir.exists():
+        shutil.rmtree(store_dir)
+    store_dir.mkdir(parents=True)
+    _pickle_file(path).unlink(missing_ok=True)
+
+    columns = []
+    for idx, name in enumerate(df.columns):
+        file_name = _column_file(name, idx)
+        np.save(store_dir / file_name, _column_values(name, df[name]))
+        columns.append({"name": name, "file": file_name})
+
+    if isinstance(df.index, pd.RangeIndex):
+        index = {
+            "start": df.index.start,
+            "stop": df.index.stop,
+            "step": df.index.step,
+        }
+    else:
+        np.save(store_dir / "_index.npy", _column_values("index", df.index))
+        index = {"file": "_index.npy"}
+    index["name"] = df.index.name
+
+    # written last, so an interrupted save is not mistaken for a complete store
+    meta = {"version": _STORE_VERSION, "columns": columns, "index": index}
+    with open(store_dir / _META_FILE, "w") as f:
+        json.dump(meta, f, indent=1)
+
+
+def _read_meta(path):
+    meta_file = _store_dir(path) / _META_FILE
+    if not meta_file.exists():
+        return None
+    with open(meta_file) as f:
+        meta = json.load(f)
+    if meta["version"] > _STORE_VERSION:
+        raise ValueError(
+            f"{_store_dir(path)} was written by a newer version of ctdcal "
+            f"(store version {meta['version']} > {_STORE_VERSION})"
+        )
+    return meta
+
+
+def _load_array(file, mmap):
+    # copy-on-write maps, so in-place edits of the DataFrame never touch the file
+    values = np.load(file, mmap_mode="c" if mmap else None, allow_pickle=False)
+    return values.view(np.ndarray)  # (still mapped) plain array, not np.memmap
+
+
+def exists(path):
+    """Whether a complete store (or legacy pickle) exists at path."""
+    return (_store_dir(path) / _META_FILE).exists() or _pickle_file(path).exists()
+
+
+def glob(directory, pattern="*"):
+    """
+    Sorted paths of the stores (and legacy pickles) in directory whose names match
+    a glob pattern, e.g. glob("data/bottle", "*_btl_mean"). Pickles are listed
+    without their .pkl extension, as for a store (see load).
+    """
+    directory = Path(directory)
+    matches = list(directory.glob(pattern)) + list(directory.glob(pattern + ".pkl"))
+    return sorted({_store_dir(path) for path in matches if exists(path)})
+
+
+def remove(path):
+    """Remove the store (and any legacy pickle) at path, if there is one."""
+    store_dir = _store_dir(path)
+    if store_dir.exists():
+        shutil.rmtree(store_dir)
+    _pickle_file(path).unlink(missing_ok=True)
+
+
+def columns(path):
+    """Column names in the store at path, without loading any data."""
+    meta = _read_meta(path)
+    if meta is None:
+        return pd.read_pickle(_pickle_file(path)).columns.tolist()
+    return [col["name"] for col in meta["columns"]]
+
+
+def load(path, columns=None, mmap=True):
+    """
+    Load a DataFrame saved with save, optionally only some of its columns.
+
+    Parameters
+    ----------
+    path : str or Path
+        Store directory, e.g. "data/converted/00101"
+    columns : list, optional
+        Columns to load (in this order), defaults to all
+    mmap : bool, optional
+        Memory-map the column files (copy-on-write), so data are only read from
+        disk when used. Otherwise columns are read into memory right away.
+
+    Returns
+    -------
+    df : DataFrame
+        Stored data
+    """
+    meta = _read_meta(path)
+    if meta is None:
+        pickle_file = _pickle_file(path)
+        if not pickle_file.exists():
+            raise FileNotFoundError(f"No columnar store or pickle at {path}")
+        log.debug(f"Reading legacy pickle {pickle_file}")
+        df = pd.read_pickle(pickle_file)
+        return df if columns is None else df[columns]
+
+    store_dir = _store_dir(path)
+    files = {col["name"]: col["file"] for col in meta["columns"]}
+    if columns is None:
+        columns = list(files)
+    missing = [name for name in columns if name not in files]
+    if missing:
+        raise KeyError(f"{missing} not in {store_dir}")
+
+    index_meta = meta["index"]
+    if "file" in index_meta:
+        index = pd.Index(
+            _load_array(store_dir / index_meta["file"], mmap), name=index_meta["name"]
+        )
+    else:
+        index = pd.RangeIndex(
+            index_meta["start"],
+            index_meta["stop"],
+            index_meta["step"],
+            name=index_meta["name"],
+        )
+    data = {name: _load_array(store_dir / files[name], mmap) for name in columns}
+
+    # one block per column, so mapped columns are not copied into a 2D block
+    return pd.DataFrame(data, index=index, columns=columns, copy=False)
@@ -0,0 +1,430 @@
+"""
+Generate synthetic SBE 911plus .hex files, e.g. as input for tests and benchmarks.
+
+Profiles of pressure, temperature and salinity are converted back to raw sensor
+frequencies/voltages with the inverse of the equations_sbe conversions, then
+encoded into scan lines following the scan layout of an .XMLCON (see
+sbe_reader.parse_xmlcon). Encoding is vectorized, the reverse of SBEReader
+decoding, so large casts and whole cruises can be generated in seconds.
+"""
+
+import datetime
+import logging
+from pathlib import Path
+
+import gsw
+import numpy as np
+import pandas as pd
+from pytz import timezone
+
+from . import sbe_reader as sbe_rd
+
+log = logging.getLogger(__name__)
+
+_HEX_DIGITS = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+
+# default cast start time, written to the .hex "System UTC" header line
+_START_TIME = datetime.datetime(2019, 5, 4, 18, 22, 44)
+
+
+def _hex_chars(words, width):
+    """
+    Encode integer words as uppercase ASCII hex, most significant nibble first.
+    Returns a 2D uint8 array with width chars per word (the reverse of _hex_words).
+    """
+    words = np.asarray(words, dtype=np.int64)
+    shifts = 4 * np.arange(width - 1, -1, -1)
+    nibbles = (words[..., None] >> shifts) & 0xF
+    return _HEX_DIGITS[nibbles].reshape(len(words), -1)
+
+
+def _hex_chars_lsb(words, n_bytes):
+    """Encode integer words as little-endian (low byte first) hex, e.g. SBE times."""
+    words = np.asarray(words, dtype=np.int64)
+    byte_words = (words[..., None] >> (8 * np.arange(n_bytes))) & 0xFF
+    return _hex_chars(byte_words, 2)
+
+
+def _sbe3_freq(t, coefs, n_iter=5):
+    """Inverse of equations_sbe.sbe3, temperature (ITS-90) to frequency (Hz)."""
+    y = 1 / (np.asarray(t, dtype=float) + 273.15)
+    # solve G + H*x + I*x^2 + J*x^3 = 1/T for x = ln(F0/f)
+    x = (y - coefs["G"]) / coefs["H"]
+    for _ in range(n_iter):
+        poly = coefs["G"] + x * (coefs["H"] + x * (coefs["I"] + x * coefs["J"]))
+        slope = coefs["H"] + x * (2 * coefs["I"] + x * 3 * coefs["J"])
+        x -= (poly - y) / slope
+    return coefs["F0"] * np.exp(-x)
+
+
+def _sbe4_freq(c, t, p, coefs, n_iter=5):
+    """Inverse of equations_sbe.sbe4, conductivity (mS/cm) to frequency (Hz)."""
+    y = np.asarray(c, dtype=float) * (1 + coefs["CTcor"] * t + coefs["CPcor"] * p)
+    # solve G + H*f^2 + I*f^3 + J*f^4 = C for f in kHz
+    f = np.sqrt(np.maximum((y - coefs["G"]) / coefs["H"], 0))
+    for _ in range(n_iter):
+        poly = coefs["G"] + f**2 * (coefs["H"] + f * (coefs["I"] + f * coefs["J"]))
+        slope = f * (2 * coefs["H"] + f * (3 * coefs["I"] + f * 4 * coefs["J"]))
+        f -= (poly - y) / slope
+    return f * 1e3
+
+
+def _sbe9_freq(p, t_probe, coefs):
+    """
+    Inverse of equations_sbe.sbe9, pressure (dbar) to frequency (Hz) given the raw
+    Digiquartz temperature probe integer.
+    """
+    t_probe = coefs["AD590M"] * np.asarray(t_probe).astype(int) + coefs["AD590B"]
+    T0 = (
+        coefs["T1"]
+        + coefs["T2"] * t_probe
+        + coefs["T3"] * np.power(t_probe, 2)
+        + coefs["T4"] * np.power(t_probe, 3)
+    )
+    C = coefs["C1"] + coefs["C2"] * t_probe + coefs["C3"] * t_probe * t_probe
+    D = coefs["D1"] + coefs["D2"] * t_probe
+
+    # solve C*D*w^2 - C*w + P_psia = 0, taking the (stable) root nearest P_psia/C
+    p_psia = np.asarray(p, dtype=float) / 0.6894759 + 14.7
+    q = (C + np.sign(C) * np.sqrt(C * C - 4 * C * D * p_psia)) / 2
+    w = p_psia / q
+    return np.sqrt(1 - w) / T0 * 1e6
+
+
+def cast_profile(
+    max_pressure=1000.0,
+    sample_rate=24,
+    descent_rate=1.0,
+    ascent_rate=1.0,
+    soak_pressure=10.0,
+    soak_time=120.0,
+    pump_delay=60.0,
+    n_bottles=12,
+    bottle_stop=30.0,
+    deck_time=0.0,
+    seed=None,
+):
+    """
+    Synthetic CTD cast: soak near the surface, descend to max_pressure, then come
+    back up stopping to fire bottles at evenly spaced pressures.
+
+    Parameters
+    ----------
+    max_pressure : float
+        Bottom of the cast (dbar)
+    sample_rate : float
+        Scans per second
+    descent_rate, ascent_rate : float
+        Winch speeds (dbar/s)
+    soak_pressure, soak_time : float
+        Soak depth (dbar) and duration (s), before returning to the surface
+    pump_delay : float
+        Seconds after entering the water before the pump turns on
+    n_bottles : int
+        Number of bottle stops on the upcast
+    bottle_stop : float
+        Seconds spent at each bottle stop, with the bottle fired halfway through
+    deck_time : float
+        Seconds on deck (out of the water, pump off) before and after the cast
+    seed : int, optional
+        Seed for sensor noise
+
+    Returns
+    -------
+    profile : DataFrame
+        Per-scan CTDPRS, CTDTMP, CTDSAL, CTDOXYVOLTS, pump_on and btl_fire
+    """
+    rng = np.random.default_rng(seed)
+
+    def ramp(p_from, p_to, rate):
+        n_scans = int(abs(p_to - p_from) / rate * sample_rate)
+        return np.linspace(p_from, p_to, n_scans, endpoint=False)
+
+    def hold(p_at, seconds):
+        return np.full(int(seconds * sample_rate), float(p_at))
+
+    bottle_pressures = np.linspace(max_pressure, soak_pressure / 2, n_bottles)
+    segments = [
+        hold(0, deck_time),
+        ramp(0, soak_pressure, descent_rate),
+        hold(soak_pressure, soak_time),
+        ramp(soak_pressure, 2, ascent_rate),
+        ramp(2, max_pressure, descent_rate),
+    ]
+    fire_scans = []
+    p_from = max_pressure
+    for p_bottle in bottle_pressures:
+        segments.append(ramp(p_from, p_bottle, ascent_rate))
+        fire_scans.append(sum(map(len, segments)) + int(bottle_stop * sample_rate / 2))
+        segments.append(hold(p_bottle, bottle_stop))
+        p_from = p_bottle
+    segments.append(ramp(p_from, 0, ascent_rate))
+    segments.append(hold(0, deck_time))
+    pressure = np.concatenate(segments)
+    n_deck = len(segments[0])
+    on_deck = np.zeros(len(pressure), dtype=bool)
+    on_deck[:n_deck] = on_deck[len(pressure) - n_deck :] = True
+
+    # bottle fire confirm bit stays on for ~1.5 seconds
+    btl_fire = np.zeros(len(pressure), dtype=bool)
+    for scan in fire_scans:
+        btl_fire[scan : scan + int(1.5 * sample_rate)] = True
+    pump_on = np.arange(len(pressure)) >= n_deck + pump_delay * sample_rate
+    pump_on &= ~on_deck
+
+    # warm/salty mixed layer over a cold, fresher deep ocean
+    temperature = 2 + 18 * np.exp(-pressure / 300)
+    salinity = 34.7 + 0.3 * np.exp(-pressure / 500)
+    oxy_volts = 1.2 + 1.5 * np.exp(-pressure / 800)
+    noise = rng.normal(scale=[0.001, 0.0005, 0.002, 0.001], size=(len(pressure), 4))
+
+    return pd.DataFrame(
+        {
+            "CTDPRS": pressure + noise[:, 0],
+            "CTDTMP": temperature + noise[:, 1],
+            "CTDSAL": np.where(on_deck, 0, salinity + noise[:, 2]),  # no C in air
+            "CTDOXYVOLTS": oxy_volts + noise[:, 3],
+            "pump_on": pump_on,
+            "btl_fire": btl_fire,
+        }
+    )
+
+
+def raw_counts(
+    xml_config,
+    profile,
+    start_time=None,
+    lat=32.7,
+    lon=-117.2,
+    pressure_temp_int=2280,
+):
+    """
+    Convert a cast profile (see cast_profile) to the raw values stored in a .hex
+    file, using the sensors and coefficients in xml_config.
+
+    Temperature, conductivity and pressure sensors (SensorID 55, 3 and 45) are
+    inverted from CTDTMP, CTDSAL and CTDPRS; SBE43 oxygen sensors (38) read
+    CTDOXYVOLTS. Other frequency channels read a constant 5 kHz and other voltage
+    channels 0 V.
+
+    Parameters
+    ----------
+    xml_config : str
+        Contents of the .XMLCON file
+    profile : DataFrame
+        Per-scan profile, one row per scan
+    start_time : datetime, optional
+        UTC time of the first scan (defaults to 2019-05-04 18:22:44)
+    lat, lon : float
+        Ship position (decimal degrees)
+    pressure_temp_int : int
+        Raw Digiquartz temperature probe reading (12 bits)
+
+    Returns
+    -------
+    raw : dict
+        Arrays of "frequencies" (Hz), "voltages" (V) and metadata, named as in
+        SBEReader.parsed_meta
+    """
+    config, layout = sbe_rd.parse_xmlcon(xml_config)
+    fields = layout["fields"]
+    n_freq = fields.get("frequencies", (0, 0))[1] // 6
+    n_volt = fields.get("voltages", (0, 0))[1] // 3
+    n_scans = len(profile)
+    if start_time is None:
+        start_time = _START_TIME
+    start = start_time.replace(tzinfo=timezone("UTC")).timestamp()
+    sample_rate = 24 / config["ScansToAverage"]
+
+    p = profile["CTDPRS"].to_numpy()
+    t = profile["CTDTMP"].to_numpy()
+    # GSW is undefined above the surface (e.g. noisy deck pressures)
+    c = gsw.C_from_SP(profile["CTDSAL"].to_numpy(), t, np.maximum(p, 0))
+    t_probe = np.full(n_scans, pressure_temp_int)
+
+    frequencies = np.full((n_scans, n_freq), 5000.0)
+    voltages = np.zeros((n_scans, n_volt))
+    for idx, sensor in config["Sensors"].items():
+        if idx < n_freq:
+            if sensor["SensorID"] == "55":
+                frequencies[:, idx] = _sbe3_freq(t, sensor)
+            elif sensor["SensorID"] == "3":
+                frequencies[:, idx] = _sbe4_freq(c, t, p, sensor)
+            elif sensor["SensorID"] == "45":
+                frequencies[:, idx] = _sbe9_freq(p, t_probe, sensor)
+        elif idx < n_freq + n_volt and sensor["SensorID"] == "38":
+            voltages[:, idx - n_freq] = profile["CTDOXYVOLTS"].to_numpy()
+
+    # times count up once a second, GPS gets a new fix every second too
+    seconds = np.floor(np.arange(n_scans) / sample_rate)
+    return {
+        "frequencies": frequencies,
+        "voltages": voltages,
+        "GPSLAT": np.full(n_scans, lat),
+        "GPSLON": np.full(n_scans, lon),
+        "new_fix": np.diff(seconds, prepend=-1) > 0,
+        "nmea_datetime": start + seconds,
+        "pressure_temp_int": t_probe,
+        "pump_on": profile["pump_on"].to_numpy(),
+        "btl_fire": profile["btl_fire"].to_numpy(),
+        "scan_datetime": start + seconds,
+    }
+
+
+def encode_scans(xml_config, raw, first_modulo=0):
+    """
+    Encode raw values (see raw_counts) into .hex scan lines.
+
+    Parameters
+    ----------
+    xml_config : str
+        Contents of the .XMLCON file, which sets the fields in each scan
+    raw : dict
+        Arrays of "frequencies" (Hz), "voltages" (V) and metadata, one row per
+        scan. Metadata fields not in raw are written as zeros.
+    first_modulo : int
+        Modulo byte of the first scan, incremented (mod 256) every scan
+
+    Returns
+    -------
+    scan_bytes : ndarray
+        2D uint8 array of CRLF terminated ASCII scan lines
+    """
+    _, layout = sbe_rd.parse_xmlcon(xml_config)
+    fields, scan_length = layout["fields"], layout["scan_length"]
+    n_scans = len(raw["pressure_temp_int"])
+    zeros = np.zeros(n_scans, dtype=np.int64)
+
+    scan_bytes = np.empty((n_scans, scan_length + 2), dtype=np.uint8)
+    scan_bytes[:, scan_length:] = np.frombuffer(b"\r\n", dtype=np.uint8)
+
+    def put(field, chars):
+        start, width = fields[field]
+        scan_bytes[:, start : start + width] = chars
+
+    # frequencies are 24-bit words in units of 1/256 Hz,
+    # voltages are 12-bit words scaled across 0-5V (inverted)
+    if "frequencies" in fields:
+        counts = np.rint(np.asarray(raw["frequencies"]) * 256)
+        put("frequencies", _hex_chars(np.clip(counts, 0, 2**24 - 1), 6))
+    if "voltages" in fields:
+        counts = np.rint((1 - np.asarray(raw["voltages"]) / 5) * 4095)
+        put("voltages", _hex_chars(np.clip(counts, 0, 4095), 3))
+    if "spar" in fields:
+        put("spar", _hex_chars(raw.get("spar", zeros), 6))
+    if "nmea_pos" in fields:
+        lat = np.asarray(raw.get("GPSLAT", zeros))
+        lon = np.asarray(raw.get("GPSLON", zeros))
+        flags = (
+            0x80 * (lat < 0)
+            + 0x40 * (lon < 0)
+            + np.asarray(raw.get("new_fix", zeros), dtype=bool)
+        )
+        put(
+            "nmea_pos",
+            np.hstack(
+                [
+                    _hex_chars(np.rint(np.abs(lat) * 50000), 6),
+                    _hex_chars(np.rint(np.abs(lon) * 50000), 6),
+                    _hex_chars(flags, 2),
+                ]
+            ),
+        )
+    if "nmea_depth" in fields:
+        put("nmea_depth", _hex_chars(zeros, 6))
+    if "nmea_time" in fields:
+        nmea_time = np.asarray(raw.get("nmea_datetime", zeros + sbe_rd._NMEA_EPOCH))
+        put("nmea_time", _hex_chars_lsb(nmea_time - sbe_rd._NMEA_EPOCH, 4))
+    put("pressure_temp", _hex_chars(raw["pressure_temp_int"], 3))
+
+    # status bits: pump on, no bottom contact, bottle fire confirm
+    status = (
+        np.asarray(raw.get("pump_on", zeros), dtype=bool)
+        + 0x2
+        + 0x4 * np.asarray(raw.get("btl_fire", zeros), dtype=bool)
+    )
+    put("ctd_status", _hex_chars(status, 1))
+    put("modulo", _hex_chars((first_modulo + np.arange(n_scans)) % 256, 2))
+    if "scan_time" in fields:
+        put("scan_time", _hex_chars_lsb(raw.get("scan_datetime", zeros), 4))
+
+    return scan_bytes
+
+
+def write_hex(path, xml_config, raw, start_time=None, first_modulo=0):
+    """
+    Write raw values (see raw_counts) to a .hex file, with a minimal Seasave header.
+    start_time (UTC datetime) is written to the "System UTC" header line.
+    """
+    if start_time is None:
+        start_time = _START_TIME
+    header = [
+        "* Sea-Bird SBE 9 Data File:",
+        f"* FileName = {Path(path).name}",
+        "* Software version 7.26.7.129",
+        f"* System UTC = {start_time.strftime('%b %d %Y %H:%M:%S')}",
+        "*END*",
+    ]
+    scan_bytes = encode_scans(xml_config, raw, first_modulo=first_modulo)
+    with open(path, "wb") as f:
+        f.write(("\r\n".join(header) + "\r\n").encode("cp437"))
+        f.write(scan_bytes.tobytes())
+
+
+def make_cruise(out_dir, xml_config, n_casts, start_time=None, seed=0, **kwargs):
+    """
+    Write a synthetic cruise of n_casts (stations 001, 002, ...) to out_dir, as
+    <SSSCC>.hex and <SSSCC>.XMLCON files ready for convert.hex_to_ctd.
+
+    Casts get random bottom pressures (between 500 and 6000 dbar) and start two
+    hours apart. Extra keyword arguments are passed to cast_profile.
+
+    Parameters
+    ----------
+    out_dir : str or Path
+        Directory for raw files, e.g. cfg.dirs["raw"]
+    xml_config : str
+        Contents of the .XMLCON file used for every cast
+    n_casts : int
+        Number of casts
+    start_time : datetime, optional
+        UTC start time of the first cast
+    seed : int
+        Seed for cast depths and sensor noise
+
+    Returns
+    -------
+    ssscc_list : list of str
+        Cast names written
+    """
+    rng = np.random.default_rng(seed)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if start_time is None:
+        start_time = _START_TIME
+
+    max_pressure = kwargs.pop("max_pressure", None)
+    ssscc_list = []
+    for stn in range(1, n_casts + 1):
+        ssscc = f"{stn:03d}01"
+        profile = cast_profile(
+            max_pressure=max_pressure or float(rng.integers(500, 6000)),
+            seed=rng.integers(2**32),
+            **kwargs,
+        )
+        cast_start = start_time + datetime.timedelta(hours=2 * (stn - 1))
+
+        raw = raw_counts(xml_config, profile, start_time=cast_start)
+        log.info(f"Writing synthetic cast {ssscc} ({len(profile)} scans)")
+        write_hex(
+            out_dir / f"{ssscc}.hex",
+            xml_config,
+            raw,
+            start_time=cast_start,
+            first_modulo=rng.integers(256),
+        )
+        with open(out_dir / f"{ssscc}.XMLCON", "w", encoding="cp437") as f:
+            f.write(xml_config)
+        ssscc_list.append(ssscc)
+
+    return ssscc_list
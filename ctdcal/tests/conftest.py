@@ -0,0 +1,207 @@
+"""
+Fixtures and helpers shared by the test modules: synthetic SBE 911plus .XMLCON and
+.hex files, and temporary data directories.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from ctdcal import convert
+from ctdcal import sbe_reader as sbe_rd
+
+XMLCON_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<SBE_InstrumentConfiguration SB_ConfigCTD_FileVersion="7.26.7.0" >
+  <Instrument Type="8" >
+    <Name>SBE 911plus/917plus CTD</Name>
+    <FrequencyChannelsSuppressed>{freq_suppressed}</FrequencyChannelsSuppressed>
+    <VoltageWordsSuppressed>{volt_suppressed}</VoltageWordsSuppressed>
+    <ComputerInterface>0</ComputerInterface>
+    <DeckUnitVersion>0</DeckUnitVersion>
+    <ScansToAverage>1</ScansToAverage>
+    <SurfaceParVoltageAdded>{spar}</SurfaceParVoltageAdded>
+    <ScanTimeAdded>{scan_time}</ScanTimeAdded>
+    <NmeaPositionDataAdded>{nmea_pos}</NmeaPositionDataAdded>
+    <NmeaDepthDataAdded>{nmea_depth}</NmeaDepthDataAdded>
+    <NmeaTimeAdded>{nmea_time}</NmeaTimeAdded>
+    <NmeaDeviceConnectedToPC>0</NmeaDeviceConnectedToPC>
+    <SensorArray Size="{n_sensors}" >
+{sensors}
+    </SensorArray>
+  </Instrument>
+</SBE_InstrumentConfiguration>
+"""
+
+SENSOR_TEMPLATES = {
+    "55": """<TemperatureSensor SensorID="55" >
+  <SerialNumber>1234</SerialNumber>
+  <G>4.30e-003</G>
+  <H>6.30e-004</H>
+  <I>2.10e-005</I>
+  <J>1.80e-006</J>
+  <F0>1000.000</F0>
+  <Slope>1.00000000</Slope>
+  <Offset>0.0000</Offset>
+</TemperatureSensor>""",
+    "3": """<ConductivitySensor SensorID="3" >
+  <SerialNumber>2345</SerialNumber>
+  <G>-1.02e+001</G>
+  <H>1.50e+000</H>
+  <I>-2.50e-003</I>
+  <J>2.60e-004</J>
+  <CPcor>-9.5700e-008</CPcor>
+  <CTcor>3.2500e-006</CTcor>
+  <Slope>1.00000000</Slope>
+  <Offset>0.00000</Offset>
+</ConductivitySensor>""",
+    "45": """<PressureSensor SensorID="45" >
+  <SerialNumber>0345</SerialNumber>
+  <C1>-4.155e+004</C1>
+  <C2>-9.340e-002</C2>
+  <C3>1.270e-002</C3>
+  <D1>3.590e-002</D1>
+  <D2>0.000e+000</D2>
+  <T1>3.000e+001</T1>
+  <T2>-4.100e-004</T2>
+  <T3>3.800e-006</T3>
+  <T4>3.300e-009</T4>
+  <T5>0.000e+000</T5>
+  <Slope>1.00000000</Slope>
+  <Offset>0.00000</Offset>
+  <AD590M>1.28e-002</AD590M>
+  <AD590B>-9.20e+000</AD590B>
+</PressureSensor>""",
+    "38": """<OxygenSensor SensorID="38" >
+  <SerialNumber>0456</SerialNumber>
+  <Use2007Equation>1</Use2007Equation>
+  <CalibrationCoefficients equation="0" >
+    <Boc>0.0000</Boc>
+    <Soc>0.0000e+000</Soc>
+    <offset>0.0000</offset>
+    <Pcor>1.350e-004</Pcor>
+    <Tcor>1.700e-003</Tcor>
+    <Tau>0.0</Tau>
+  </CalibrationCoefficients>
+  <CalibrationCoefficients equation="1" >
+    <Soc>4.6500e-001</Soc>
+    <offset>-0.4950</offset>
+    <A>-4.1000e-003</A>
+    <B>1.8000e-004</B>
+    <C>-2.8000e-006</C>
+    <D0>2.5826e+000</D0>
+    <D1>1.92634e-004</D1>
+    <D2>-4.64803e-002</D2>
+    <E>3.6000e-002</E>
+    <Tau20>1.3800</Tau20>
+    <H1>-3.3000e-002</H1>
+    <H2>5.0000e+003</H2>
+    <H3>1.4500e+003</H3>
+  </CalibrationCoefficients>
+</OxygenSensor>""",
+    "27": """<NotInUse SensorID="27" >
+  <SerialNumber></SerialNumber>
+</NotInUse>""",
+    "0": """<AltimeterSensor SensorID="0" >
+  <SerialNumber>0567</SerialNumber>
+  <ScaleFactor>15.000</ScaleFactor>
+  <Offset>0.000</Offset>
+</AltimeterSensor>""",
+    "61": """<UserPolynomialSensor SensorID="61" >
+  <SerialNumber>0678</SerialNumber>
+  <SensorName>RinkoO2V</SensorName>
+  <A0>0.00000000</A0>
+  <A1>1.00000000</A1>
+  <A2>0.00000000</A2>
+  <A3>0.00000000</A3>
+</UserPolynomialSensor>""",
+}
+
+
+def make_xmlcon(sensors=("55", "3", "45", "55", "3"), **flags):
+    """Build a minimal SBE 911plus .XMLCON string"""
+    config = dict(
+        freq_suppressed=0,
+        volt_suppressed=0,
+        spar=0,
+        scan_time=1,
+        nmea_pos=1,
+        nmea_depth=0,
+        nmea_time=1,
+    )
+    config.update(flags)
+    sensor_xml = "\n".join(
+        f'<Sensor index="{idx}" SensorID="{sensor_id}" >\n'
+        f"{SENSOR_TEMPLATES[sensor_id]}\n</Sensor>"
+        for idx, sensor_id in enumerate(sensors)
+    )
+    return XMLCON_TEMPLATE.format(n_sensors=len(sensors), sensors=sensor_xml, **config)
+
+
+def make_hex(n_scans, xml_config, seed=0):
+    """Build a random (but correctly formatted) .hex string matching xml_config"""
+    rng = np.random.default_rng(seed)
+    reader = sbe_rd.SBEReader("", xml_config)  # only used for config flags
+    lines = [
+        "* Sea-Bird SBE 9 Data File:",
+        "* FileName = C:\\data\\00101.hex",
+        "* Software version 7.26.7.129",
+        "* System UTC = May 04 2019 18:22:44",
+        "*END*",
+    ]
+    first_modulo = rng.integers(0, 256)
+    for i in range(n_scans):
+        scan = "".join(f"{x:06X}" for x in rng.integers(0, 2**24, reader_freqs(reader)))
+        scan += "".join(
+            f"{x:03X}" for x in rng.integers(0, 2**12, reader_volts(reader))
+        )
+        if reader.config["SurfaceParVoltageAdded"]:
+            scan += f"{rng.integers(0, 2**24):06X}"
+        if reader.config["NmeaPositionDataAdded"]:
+            scan += f"{rng.integers(0, 2**48):012X}"
+            scan += f"{rng.choice([0x00, 0x01, 0x40, 0x80, 0xC1]):02X}"
+        if reader.config["NmeaDepthDataAdded"]:
+            scan += f"{rng.integers(0, 2**24):06X}"
+        if reader.config["NmeaTimeAdded"]:
+            scan += f"{rng.integers(0, 2**32):08X}"
+        scan += f"{rng.integers(0, 2**12):03X}"
+        scan += f"{rng.integers(0, 16):01X}"
+        scan += f"{(first_modulo + i) % 256:02X}"  # modulo counter
+        if reader.config["ScanTimeAdded"]:
+            scan += f"{rng.integers(0, 2**32):08X}"
+        lines.append(scan)
+    return "\r\n".join(lines) + "\r\n"
+
+
+def reader_freqs(reader):
+    return 5 - reader.config["FrequencyChannelsSuppressed"]
+
+
+def reader_volts(reader):
+    return 8 - reader.config["VoltageWordsSuppressed"]
+
+
+def split_hex(raw_hex, cuts):
+    """Split a .hex string like an acquisition restart, losing scans [start:stop]"""
+    lines = raw_hex.splitlines()
+    header, scans = lines[:5], lines[5:]
+    files, first = [], 0
+    for start, stop in cuts + [(len(scans), None)]:
+        files.append(header + scans[first:start])
+        first = stop
+        # restarted file header has the (truncated) time of its first scan
+        if stop is not None:
+            restart = f"18:{22 + (44 + stop // 24) // 60}:{(44 + stop // 24) % 60:02d}"
+            header = header[:3] + [f"* System UTC = May 04 2019 {restart}", "*END*"]
+    return ["\r\n".join(f) + "\r\n" for f in files]
+
+
+@pytest.fixture
+def data_dirs(tmp_path, monkeypatch):
+    """Empty data directories in tmp_path, patched into convert.cfg"""
+    dirs = ["raw", "converted", "time", "bottle", "cache", "logs"]
+    dirs = {key: f"{tmp_path / key}/" for key in dirs}
+    for sub_dir in dirs.values():
+        Path(sub_dir).mkdir()
+    monkeypatch.setattr(convert.cfg, "dirs", dirs)
+    return dirs
@@ -0,0 +1,446 @@
+import logging
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ctdcal import convert, store, synthetic
+from ctdcal.manifest import Manifest
+from ctdcal import sbe_reader as sbe_rd
+from ctdcal.tests.conftest import make_hex, make_xmlcon, split_hex
+
+
+def test_convertFromSBEReader():
+    xml_config = make_xmlcon()
+    reader = sbe_rd.SBEReader(make_hex(100, xml_config), xml_config)
+    converted_df = convert.convertFromSBEReader(reader, "00101")
+
+    assert len(converted_df) == 100
+    for col in ["CTDTMP1", "CTDCOND1", "CTDPRS", "CTDTMP2", "CTDCOND2", "CTDSAL"]:
+        assert col in converted_df.columns
+
+    # metadata columns are typed, not parsed from strings
+    assert converted_df["pump_on"].dtype == bool
+    assert converted_df["btl_fire"].dtype == bool
+    assert np.issubdtype(converted_df["pressure_temp_int"].dtype, np.integer)
+    for col in ["GPSLAT", "GPSLON", "nmea_datetime", "scan_datetime"]:
+        assert converted_df[col].dtype == float
+
+
+def test_convertFromSBEReader_chunks():
+    xml_config = make_xmlcon(scan_time=0)
+    reader = sbe_rd.SBEReader(make_hex(100, xml_config), xml_config)
+    chunked_df = convert.convertFromSBEReader(reader, "00101", chunk_size=30)
+    assert reader._parsed_scans is None  # decoded in chunks, nothing cached
+
+    converted_df = convert.convertFromSBEReader(reader, "00101")
+    pd.testing.assert_frame_equal(chunked_df, converted_df)
+
+
+def test_convertFromSBEReader_channels():
+    xml_config = make_xmlcon()
+    raw_hex = make_hex(100, xml_config)
+    full_df = convert.convertFromSBEReader(
+        sbe_rd.SBEReader(raw_hex, xml_config), "00101"
+    )
+
+    # conductivity needs primary temperature/pressure, which adds salinity
+    reader = sbe_rd.SBEReader(raw_hex, xml_config)
+    converted_df = convert.convertFromSBEReader(reader, "00101", channels=["CTDCOND1"])
+    assert reader.channels == [0, 1, 2]
+    assert "CTDTMP2" not in converted_df and "CTDCOND2" not in converted_df
+    pd.testing.assert_frame_equal(converted_df, full_df[converted_df.columns])
+    assert "CTDSAL" in converted_df
+
+    # pressure only
+    converted_df = convert.convertFromSBEReader(reader, "00101", channels=[2])
+    assert reader.channels == [2]
+    pd.testing.assert_frame_equal(converted_df, full_df[converted_df.columns])
+    assert "CTDSAL" not in converted_df
+
+    with pytest.raises(ValueError, match="Unknown channel 'CTDOXY1'"):
+        convert.convertFromSBEReader(reader, "00101", channels=["CTDOXY1"])
+
+
+def test_conversion_plan():
+    xml_config = make_xmlcon(("55", "3", "45", "55", "3", "38", "27"))
+    reader = sbe_rd.SBEReader(make_hex(100, xml_config), xml_config)
+    plan = convert.conversion_plan(reader.parsed_config())
+    assert [step["outputs"] for step in plan.steps] == [
+        ["CTDTMP1"],
+        ["CTDTMP2"],
+        ["CTDPRS"],
+        ["CTDCOND1"],
+        ["CTDCOND2"],
+        ["CTDSAL"],
+        ["CTDOXY1", "CTDOXYVOLTS"],
+        ["FREE1"],
+    ]
+    assert plan.select_channels(["CTDOXY1"]) == [0, 1, 2, 5]
+
+    # built once per distinct config, e.g. reused for every cast of a cruise
+    other_reader = sbe_rd.SBEReader(make_hex(50, xml_config, seed=1), xml_config)
+    assert convert.conversion_plan(other_reader.parsed_config()) is plan
+    default_config = sbe_rd.SBEReader("", make_xmlcon()).parsed_config()
+    assert convert.conversion_plan(default_config) is not plan
+
+    # oxygen also keeps its voltage, unregistered sensors are passed through
+    converted_df = convert.convertFromSBEReader(reader, "00101")
+    raw_volts = reader.parsed_scans[:, 5:].astype(np.float32)  # see test below
+    np.testing.assert_array_equal(converted_df["CTDOXYVOLTS"], raw_volts[:, 0])
+    np.testing.assert_array_equal(converted_df["FREE1"], raw_volts[:, 1])
+
+
+def test_conversion_plan_checks(monkeypatch, caplog):
+    xml_config = make_xmlcon(("55", "3", "45", "55", "3", "0"))
+    reader = sbe_rd.SBEReader(make_hex(100, xml_config), xml_config)
+    plan = convert.conversion_plan(reader.parsed_config())
+    raw = reader.parsed_scans.copy()
+    raw[::10, 0] = 0  # zero temperature frequencies
+    raw[::10, 5] = 6  # altimeter voltages out of range
+    monkeypatch.setattr(convert, "_CONVERT_CHUNK_SCANS", 30)
+
+    # bad raw values are warned about once per cast, not once per chunk of scans
+    with caplog.at_level(logging.WARNING):
+        converted = plan.convert(raw, reader.parsed_meta)
+    assert caplog.messages == [
+        "Found 10 zero frequency readings in sbe3, replacing with NaN",
+        "sbe_altimeter has values outside of 0-5V, replacing with NaN",
+    ]
+    assert np.isnan(converted["CTDTMP1"][::10]).all()
+    assert np.isnan(converted["ALT"][::10]).all()
+    assert reader.parsed_scans[0, 0] != 0  # decoded scans not modified
+
+
+def test_convertFromSBEReader_dtypes(monkeypatch):
+    xml_config = make_xmlcon(("55", "3", "45", "55", "3", "38", "27"))
+    reader = sbe_rd.SBEReader(make_hex(100, xml_config), xml_config)
+    converted_df = convert.convertFromSBEReader(reader, "00101")
+
+    # float64 where precision matters, compact dtypes for voltages and metadata
+    for col in ["CTDPRS", "CTDTMP1", "CTDCOND1", "CTDSAL", "CTDOXY1", "GPSLAT"]:
+        assert converted_df[col].dtype == np.float64
+    assert converted_df["CTDOXYVOLTS"].dtype == np.float32
+    assert converted_df["FREE1"].dtype == np.float32
+    assert converted_df["pressure_temp_int"].dtype == np.int16
+    assert converted_df["pump_on"].dtype == bool
+
+    # same values as converting to float64 and casting afterwards
+    ctd_dtypes = convert.cfg.ctd_dtypes
+    monkeypatch.setattr(convert.cfg, "ctd_dtypes", {})
+    full_df = convert.convertFromSBEReader(reader, "00101")
+    assert full_df["CTDOXYVOLTS"].dtype == np.float64
+    pd.testing.assert_frame_equal(converted_df, store.compact(full_df, ctd_dtypes))
+
+
+def test_convertFromSBEReader_memory(monkeypatch):
+    xml_config = make_xmlcon()
+    reader = sbe_rd.SBEReader(make_hex(5000, xml_config), xml_config)
+    reader.parsed_scans, reader.parsed_meta  # decode first, only measure conversion
+    monkeypatch.setattr(convert, "_CONVERT_CHUNK_SCANS", 500)
+    convert.convertFromSBEReader(reader, "00101")  # build (and cache) the plan
+
+    tracemalloc.start()
+    try:
+        converted_df = convert.convertFromSBEReader(reader, "00101")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # outputs are written into one array and metadata arrays, which the DataFrame
+    # wraps without copying; equation scratch is bounded by the chunk size
+    assert peak < 1.1 * converted_df.memory_usage(index=False).sum()
+
+
+def test_convertFromSBEReader_fill_gaps():
+    xml_config = make_xmlcon()
+    lines = make_hex(100, xml_config).splitlines()
+    clean_df = convert.convertFromSBEReader(
+        sbe_rd.SBEReader("\n".join(lines), xml_config), "00101"
+    )
+
+    # drop scans 10-12 and duplicate scan 50
+    lines = lines[:15] + lines[18:55] + [lines[55]] + lines[55:]
+    reader = sbe_rd.SBEReader("\n".join(lines), xml_config)
+    converted_df = convert.convertFromSBEReader(reader, "00101")
+
+    assert len(converted_df) == 100
+    assert converted_df.loc[10:12, "CTDTMP1"].isna().all()
+    assert not converted_df["CTDTMP1"].drop(range(10, 13)).isna().any()
+    pd.testing.assert_frame_equal(
+        converted_df.drop(range(10, 13)), clean_df.drop(range(10, 13))
+    )
+    assert converted_df["pump_on"].dtype == bool
+
+    # metadata are filled in: times at the sample rate, positions interpolated
+    meta_cols = list(reader.parsed_meta.dtype.names)
+    assert not converted_df[meta_cols].isna().any().any()
+    np.testing.assert_allclose(
+        converted_df.loc[10:12, "scan_datetime"],
+        converted_df.loc[9, "scan_datetime"] + np.arange(1, 4) / reader.sample_rate,
+    )
+    np.testing.assert_allclose(
+        converted_df.loc[10:12, "GPSLAT"],
+        np.interp([10, 11, 12], [9, 13], converted_df.loc[[9, 13], "GPSLAT"]),
+    )
+    assert (converted_df.loc[10:12, "pump_on"] == converted_df.loc[9, "pump_on"]).all()
+
+    unfilled_df = convert.convertFromSBEReader(reader, "00101", fill_gaps=False)
+    assert len(unfilled_df) == 98
+
+
+def test_hex_to_ctd_xmlcon_change(data_dirs, monkeypatch, caplog):
+    dirs = data_dirs
+
+    xml_config = make_xmlcon()
+    ssscc_list = ["00101", "00201", "00301"]
+    for ssscc in ssscc_list:
+        Path(dirs["raw"] + ssscc + ".XMLCON").write_text(xml_config)
+        Path(dirs["raw"] + ssscc + ".hex").write_text(make_hex(10, xml_config))
+
+    converted = []
+    convertFromSBEReader = convert.convertFromSBEReader
+
+    def counter(sbeReader, ssscc, **kwargs):
+        converted.append(ssscc)
+        return convertFromSBEReader(sbeReader, ssscc, **kwargs)
+
+    monkeypatch.setattr(convert, "convertFromSBEReader", counter)
+    with caplog.at_level(logging.INFO):
+        convert.hex_to_ctd(ssscc_list)
+    assert converted == ssscc_list
+    assert "3 casts use 1 distinct .XMLCON configuration(s)" in caplog.messages
+
+    # re-running with no changes is a no-op
+    converted.clear()
+    convert.hex_to_ctd(ssscc_list)
+    assert converted == []
+
+    # only the cast with a changed config is reconverted
+    Path(dirs["raw"] + "00201.XMLCON").write_text(make_xmlcon(nmea_pos=0))
+    Path(dirs["raw"] + "00201.hex").write_text(make_hex(10, make_xmlcon(nmea_pos=0)))
+    summary = convert.xmlcon_summary(ssscc_list)
+    assert summary["xmlcon_hash"].nunique() == 2
+    convert.hex_to_ctd(ssscc_list)
+    assert converted == ["00201"]
+
+    # or whose .hex has changed
+    converted.clear()
+    Path(dirs["raw"] + "00301.hex").write_text(make_hex(10, xml_config, seed=1))
+    convert.hex_to_ctd(ssscc_list)
+    assert converted == ["00301"]
+
+
+def test_hex_to_ctd_legacy_hashes(data_dirs, monkeypatch):
+    dirs = data_dirs
+    xml_config = make_xmlcon()
+    ssscc_list = ["00101", "00201"]
+    for ssscc in ssscc_list:
+        Path(dirs["raw"] + ssscc + ".XMLCON").write_text(xml_config)
+        Path(dirs["raw"] + ssscc + ".hex").write_text(make_hex(10, xml_config))
+    convert.hex_to_ctd(ssscc_list)
+
+    # .XMLCON hashes recorded before the build manifest are still checked
+    Path(dirs["cache"] + "manifest.json").unlink()
+    xml_hash = sbe_rd.xmlcon_hash(xml_config)
+    pd.DataFrame({"SSSCC": ssscc_list, "xmlcon_hash": [xml_hash, "old"]}).to_csv(
+        dirs["cache"] + "xmlcon_hashes.csv", index=False
+    )
+    monkeypatch.setattr(sbe_rd.SBEReader, "from_paths", None)  # from cached counts
+    converted = []
+    monkeypatch.setattr(
+        convert, "_convert_cast", lambda ssscc, *a, **k: converted.append(ssscc)
+    )
+    convert.hex_to_ctd(ssscc_list)
+    assert converted == ["00201"]
+    assert not Path(dirs["cache"] + "xmlcon_hashes.csv").exists()
+    assert Manifest(dirs["cache"]).inputs("convert", "00201")["xmlcon"] == xml_hash
+
+
+def test_hex_to_ctd_stitched(data_dirs):
+    dirs = data_dirs
+
+    xml_config = make_xmlcon()
+    Path(dirs["raw"] + "00101.XMLCON").write_text(xml_config)
+    raw_hex = make_hex(100, xml_config)
+    for suffix, text in zip(["", "a"], split_hex(raw_hex, [(40, 50)])):
+        Path(dirs["raw"] + f"00101{suffix}.hex").write_text(text)
+    Path(dirs["raw"] + "001011.hex").write_text(raw_hex)  # not part of the cast
+
+    convert.hex_to_ctd(["00101"])
+    converted_df = store.load(dirs["converted"] + "00101")
+    assert len(converted_df) == 100  # lost scans filled in
+    assert converted_df.loc[40:49, "CTDTMP1"].isna().all()
+
+
+def test_hex_to_ctd_jobs(data_dirs, caplog):
+    dirs = data_dirs
+    xml_config = make_xmlcon()
+    ssscc_list = ["00101", "00201", "00301", "00401"]
+    for ssscc in ssscc_list:
+        Path(dirs["raw"] + ssscc + ".XMLCON").write_text(xml_config)
+        Path(dirs["raw"] + ssscc + ".hex").write_text(make_hex(50, xml_config, seed=1))
+    # a malformed scan line in one cast
+    lines = make_hex(50, xml_config).splitlines()
+    lines[20] = lines[20][:-2]
+    Path(dirs["raw"] + "00301.hex").write_text("\n".join(lines))
+
+    def run(jobs):
+        for ssscc in ssscc_list:
+            store.remove(dirs["converted"] + ssscc)
+        Path(dirs["cache"] + "manifest.json").unlink(missing_ok=True)
+        caplog.clear()
+        with caplog.at_level(logging.INFO, logger="ctdcal"):
+            # the bad cast is reported after the others are converted
+            with pytest.raises(RuntimeError, match=r"1 cast\(s\): \['00301'\]"):
+                convert.hex_to_ctd(ssscc_list, jobs=jobs)
+        outputs = {
+            f"{f.parent.name}/{f.name}": f.read_bytes()
+            for f in Path(dirs["converted"]).glob("*/*")
+        }
+        messages = [
+            (record.name, record.levelname, record.getMessage().split("\n")[0])
+            for record in caplog.records
+            if "processes" not in record.getMessage()
+        ]
+        return outputs, messages
+
+    serial_outputs, serial_messages = run(jobs=None)
+    assert sorted({name.split("/")[0] for name in serial_outputs}) == [
+        "00101",
+        "00201",
+        "00401",
+    ]
+    errors = [message for _, level, message in serial_messages if level == "ERROR"]
+    assert errors == [
+        "Failed to convert 00301: ValueError('The data length does not match the "
+        "expected length from the config (bad scans: [15])')"
+    ]
+    manifest = Manifest(dirs["cache"])
+    recorded = [ssscc for ssscc in ssscc_list if manifest.inputs("convert", ssscc)]
+    assert recorded == ["00101", "00201", "00401"]
+
+    # same files and (ordered) log messages from worker processes
+    parallel_outputs, parallel_messages = run(jobs=3)
+    assert parallel_outputs == serial_outputs
+    assert parallel_messages == serial_messages
+
+
+def test_recalibrate(data_dirs, monkeypatch):
+    dirs = data_dirs
+    ssscc_list = ["00101", "00201"]
+    xml_config = make_xmlcon()
+    for ssscc in ssscc_list:
+        Path(dirs["raw"] + ssscc + ".XMLCON").write_text(xml_config)
+        Path(dirs["raw"] + ssscc + ".hex").write_text(make_hex(50, xml_config))
+    convert.hex_to_ctd(ssscc_list)
+    assert Path(dirs["cache"] + "counts/00101.npz").exists()
+    store.save(pd.DataFrame({"CTDPRS": [0.0]}), dirs["time"] + "00101_time")
+
+    # new primary temperature coefficient for 00101, .hex files are not read again
+    new_config = xml_config.replace("<G>4.30e-003</G>", "<G>4.40e-003</G>", 1)
+    Path(dirs["raw"] + "00101.XMLCON").write_text(new_config)
+    from_paths = vars(sbe_rd.SBEReader)["from_paths"]
+    monkeypatch.setattr(sbe_rd.SBEReader, "from_paths", None)
+    convert.recalibrate(ssscc_list)
+
+    reader = sbe_rd.SBEReader(Path(dirs["raw"] + "00101.hex").read_text(), new_config)
+    expected_df = convert.convertFromSBEReader(reader, "00101")
+    converted_df = store.load(dirs["converted"] + "00101")
+    pd.testing.assert_frame_equal(converted_df, expected_df)
+    assert not store.exists(dirs["time"] + "00101_time")
+
+    # hex_to_ctd uses the cache too, for casts with a changed .XMLCON
+    Path(dirs["raw"] + "00201.XMLCON").write_text(new_config)
+    convert.hex_to_ctd(ssscc_list)
+    converted_df = store.load(dirs["converted"] + "00201")
+    pd.testing.assert_frame_equal(converted_df, expected_df)  # same .hex as 00101
+
+    # counts cached from an older .hex are not used (or recorded as up to date)
+    monkeypatch.setattr(sbe_rd.SBEReader, "from_paths", from_paths)
+    new_hex = make_hex(50, xml_config, seed=1)
+    Path(dirs["raw"] + "00201.hex").write_text(new_hex)
+    convert.recalibrate(["00201"])
+    reader = sbe_rd.SBEReader(new_hex, new_config)
+    expected_df = convert.convertFromSBEReader(reader, "00201")
+    converted_df = store.load(dirs["converted"] + "00201")
+    pd.testing.assert_frame_equal(converted_df, expected_df)
+    manifest = Manifest(dirs["cache"])
+    assert manifest.inputs("convert", "00201")["hex"] == manifest.file_hash(
+        dirs["raw"] + "00201.hex"
+    )
+
+    # without a cache, .hex files are decoded with the salvage mode used before
+    lines = make_hex(50, xml_config).splitlines()
+    lines[10] = lines[10][:-4]  # truncated scan line
+    Path(dirs["raw"] + "00301.XMLCON").write_text(xml_config)
+    Path(dirs["raw"] + "00301.hex").write_text("\n".join(lines))
+    convert.hex_to_ctd(["00301"], salvage="drop")
+    salvaged_df = store.load(dirs["converted"] + "00301")
+    Path(dirs["cache"] + "counts/00301.npz").unlink()
+    convert.recalibrate(["00301"])
+    pd.testing.assert_frame_equal(store.load(dirs["converted"] + "00301"), salvaged_df)
+
+
+def test_process_cast(data_dirs):
+    xml_config = make_xmlcon(sensors=("55", "3", "45", "55", "3", "38", "0", "61"))
+    synthetic.make_cruise(
+        data_dirs["raw"], xml_config, 1, max_pressure=100, n_bottles=2, deck_time=60
+    )
+    time_df, mean_df = convert.process_cast("00101")
+    np.testing.assert_allclose(mean_df["CTDPRS"], [100, 5], atol=0.01)
+    # on-deck scans removed, downcast only
+    assert time_df["CTDPRS"].min() > 0
+    assert time_df["CTDPRS"].max() == pytest.approx(100, abs=0.1)
+
+    # only the final files are written, with the same data as the staged pipeline
+    assert not store.exists(data_dirs["converted"] + "00101")
+    time_file = data_dirs["time"] + "00101_time"
+    btl_file = data_dirs["bottle"] + "00101_btl_mean"
+    pd.testing.assert_frame_equal(store.load(time_file), time_df)
+    pd.testing.assert_frame_equal(store.load(btl_file), mean_df)
+
+    convert.hex_to_ctd(["00101"])
+    assert not store.exists(time_file)  # stale after (re)converting
+    convert.make_time_files(["00101"])
+    convert.make_btl_mean(["00101"])
+    pd.testing.assert_frame_equal(store.load(time_file), time_df)
+    pd.testing.assert_frame_equal(store.load(btl_file), mean_df)
+
+
+def test_time_data(data_dirs):
+    xml_config = make_xmlcon(sensors=("55", "3", "45", "55", "3", "38", "0", "61"))
+    synthetic.make_cruise(
+        data_dirs["raw"], xml_config, 1, max_pressure=100, n_bottles=2, deck_time=60
+    )
+    convert.hex_to_ctd(["00101"])
+    converted_df = store.load(data_dirs["converted"] + "00101")
+    clean_converted_df = converted_df.copy()
+    clean_df = convert._time_data(converted_df, "00101")
+
+    # pressure spikes and short gaps are interpolated over, metadata keep dtypes
+    mid_down = converted_df["CTDPRS"].gt(50).idxmax()
+    converted_df.loc[mid_down : mid_down + 1, "CTDPRS"] = 9999
+    converted_df.loc[mid_down + 100 : mid_down + 110, ["CTDPRS", "CTDTMP1"]] = np.nan
+    time_df = convert._time_data(converted_df, "00101")
+    assert not time_df.isna().any().any()
+    assert time_df["pump_on"].dtype == bool
+    assert time_df.shape == clean_df.shape
+    np.testing.assert_allclose(time_df["CTDPRS"], clean_df["CTDPRS"], atol=0.1)
+    assert converted_df.loc[mid_down, "CTDPRS"] == 9999  # input not modified
+
+    # dropped scans in the .hex file do not leave NaN times, or NaN data if they
+    # are within the interpolation limit (24 scans)
+    hex_file = Path(data_dirs["raw"] + "00101.hex")
+    lines = hex_file.read_text().splitlines()
+    header = sum(line.startswith("*") for line in lines)
+    del lines[header + mid_down : header + mid_down + 20]
+    hex_file.write_text("\n".join(lines) + "\n")
+    convert.hex_to_ctd(["00101"])
+    converted_df = store.load(data_dirs["converted"] + "00101")
+    assert len(converted_df) == len(clean_converted_df)
+    time_df = convert._time_data(converted_df, "00101")
+    assert not time_df.isna().any().any()
+    assert time_df["scan_datetime"].is_monotonic_increasing
@@ -1,8 +1,12 @@
 import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
 from zipimport import ZipImportError
 
 import numpy as np
+import pandas as pd
 import pytest
 import requests
 
@@ -224,6 +228,59 @@ def test_write_pressure_details(tmp_path):
         assert b"00101" in contents[1]
         assert b"00201" in contents[2]
 
+    # reprocessed casts replace their earlier row
+    io.write_pressure_details("00101", f_path, "00:00:02", "00:04:02")
+    df = pd.read_csv(f_path, dtype={"SSSCC": str})
+    assert df["SSSCC"].tolist() == ["00201", "00101"]
+    assert df["ondeck_start_p"].iloc[-1] == "00:00:02"
+
+
+def _log_casts(f_path, ssscc_list):
+    for ssscc in ssscc_list:
+        io.write_pressure_details(ssscc, f_path, 0.1, 0.2)
+
+
+def _hold_lock(f_path):
+    with io._file_lock(f_path):
+        os._exit(1)  # killed while holding the lock
+
+
+def test_write_log_row_parallel(tmp_path):
+    f_path = tmp_path / "prs_log.csv"
+    ssscc_list = [f"{stn:03d}01" for stn in range(1, 41)]
+
+    # casts logged (and relogged) from several processes at once are all kept
+    with ProcessPoolExecutor(4) as executor:
+        jobs = [ssscc_list[i::4] * 2 for i in range(4)]
+        list(executor.map(_log_casts, [f_path] * 4, jobs))
+    df = pd.read_csv(f_path, dtype={"SSSCC": str})
+    assert sorted(df["SSSCC"]) == ssscc_list
+
+    # a lock held by a killed process is released with it, leaving only the file
+    proc = multiprocessing.Process(target=_hold_lock, args=(f_path,))
+    proc.start()
+    proc.join()
+    assert (tmp_path / "prs_log.csv.lock").exists()
+    io.write_pressure_details("00101", f_path, 0.1, 0.2)
+
+    # a lock that is held is waited on, for up to timeout
+    with io._file_lock(f_path):
+        with pytest.raises(TimeoutError, match="prs_log.csv.lock"):
+            with io._file_lock(f_path, timeout=0.1):
+                pass
+
+
+def test_write_log_row(tmp_path):
+    f_path = tmp_path / "log.csv"
+    io.write_log_row(pd.DataFrame({"SSSCC": ["00101", "00101"], "x": [1, 2]}), f_path)
+    io.write_log_row(pd.DataFrame({"SSSCC": ["00201"], "x": [3]}), f_path)
+
+    # all earlier rows of a relogged cast are replaced, other casts are untouched
+    io.write_log_row(pd.DataFrame({"SSSCC": ["00101"], "x": [4]}), f_path)
+    df = pd.read_csv(f_path, dtype={"SSSCC": str})
+    assert df["SSSCC"].tolist() == ["00201", "00101"]
+    assert df["x"].tolist() == [3, 4]
+
 
 def test_write_cast_details(tmp_path):
     f_path = tmp_path / "cast.csv"
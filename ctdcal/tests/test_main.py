@@ -14,6 +14,7 @@ def test_cli():
     assert "init" in result.output
     assert "process" in result.output
     assert "qc" in result.output
+    assert "recalibrate" in result.output
 
 
 def test_debug(tmp_path):
@@ -79,6 +80,19 @@ def test_process(tmp_path, caplog):
         assert result_PMEL.exit_code == 1
         assert isinstance(result_PMEL.exception, NotImplementedError)
 
+        # number of conversion processes
+        assert "--jobs" in runner.invoke(main.process, ["--help"]).output
+        result_jobs = runner.invoke(main.process, ["--jobs", "0"])
+        assert result_jobs.exit_code == 2  # usage error
+
+
+def test_recalibrate(tmp_path):
+    runner = CliRunner()
+    with runner.isolated_filesystem(temp_dir=tmp_path):
+        result = runner.invoke(main.recalibrate)
+        assert isinstance(result.exception, FileNotFoundError)
+        assert "ssscc.csv" in result.exception.filename
+
 
 def test_cruise_report(tmp_path, caplog):
     runner = CliRunner()
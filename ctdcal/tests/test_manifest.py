@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+
+import pytest
+
+from ctdcal.manifest import Manifest, value_hash
+
+
+def test_value_hash():
+    assert value_hash({"a": 1, "b": [2, 3]}) == value_hash({"b": [2, 3], "a": 1})
+    assert value_hash({"a": 1}) != value_hash({"a": 2})
+
+
+def test_file_hash(tmp_path):
+    manifest = Manifest(tmp_path)
+    f_path = tmp_path / "00101.hex"
+    assert manifest.file_hash(f_path) is None
+
+    f_path.write_text("abc")
+    first = manifest.file_hash(f_path)
+    assert first == manifest.files_hash(str(f_path))
+
+    # hashes are reused until the file's size/modification time change
+    stat = os.stat(f_path)
+    f_path.write_text("abd")
+    os.utime(f_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert manifest.file_hash(f_path) == first
+    os.utime(f_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert manifest.file_hash(f_path) != first
+
+    # lists of files (e.g. stitched casts) depend on order
+    (tmp_path / "00101a.hex").write_text("def")
+    files = [f_path, tmp_path / "00101a.hex"]
+    assert manifest.files_hash(files) != manifest.files_hash(files[::-1])
+
+
+def test_outdated(tmp_path, caplog):
+    manifest = Manifest(tmp_path)
+    inputs = {"hex": "abc", "xmlcon": "def"}
+    assert manifest.outdated("convert", "00101", inputs, output_exists=False)
+    assert manifest.inputs("convert", "00101") is None
+
+    # untracked outputs are assumed to be current
+    assert not manifest.outdated("convert", "00101", inputs, output_exists=True)
+    assert manifest.inputs("convert", "00101") == inputs
+    digest = manifest.digest("convert", "00101")
+
+    with caplog.at_level(logging.INFO):
+        new_inputs = {"hex": "abc", "xmlcon": "xyz"}
+        assert manifest.outdated("convert", "00101", new_inputs, output_exists=True)
+        assert "00101 convert inputs changed (xmlcon)" in caplog.messages
+    manifest.record("convert", "00101", new_inputs)
+    assert manifest.digest("convert", "00101") != digest
+
+    # saved and loaded again, ignored if from another manifest version
+    manifest.save()
+    assert Manifest(tmp_path).inputs("convert", "00101") == new_inputs
+    contents = json.loads((tmp_path / "manifest.json").read_text())
+    contents["version"] += 1
+    (tmp_path / "manifest.json").write_text(json.dumps(contents))
+    assert Manifest(tmp_path).inputs("convert", "00101") is None
+
+
+def test_save_interrupted(tmp_path, monkeypatch):
+    manifest = Manifest(tmp_path)
+    manifest.record("convert", "00101", {"hex": "abc"})
+    manifest.save()
+
+    # a save that fails part way leaves the previous manifest in place
+    def dump(obj, f, **kwargs):
+        f.write('{"version": ')
+        raise KeyboardInterrupt
+
+    manifest.record("convert", "00102", {"hex": "def"})
+    monkeypatch.setattr(json, "dump", dump)
+    with pytest.raises(KeyboardInterrupt):
+        manifest.save()
+    monkeypatch.undo()
+    assert Manifest(tmp_path).inputs("convert", "00101") == {"hex": "abc"}
+    assert Manifest(tmp_path).inputs("convert", "00102") is None
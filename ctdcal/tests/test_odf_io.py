@@ -210,7 +210,9 @@ def test_salt_exporter(tmp_path, caplog):
         assert "Reading2" not in empty.columns
 
 
-def test_process_salts(tmp_path, caplog):
+def test_process_salts(tmp_path, caplog, monkeypatch):
+    monkeypatch.setitem(odf_io.cfg.dirs, "cache", str(tmp_path / "cache"))
+
     # check missing salt files are logged and skipped
     odf_io.process_salts(["90909"], salt_dir=str(tmp_path))
     assert "90909 does not exist" in caplog.messages[0]
@@ -230,6 +232,23 @@ def test_process_salts(tmp_path, caplog):
         odf_io.process_salts(["90909"], salt_dir=str(tmp_path))
         assert "90909_salts.csv already exists" in caplog.messages[1]
 
+    # check .csv is remade if the salt file changes
+    old_salts = pd.read_csv(tmp_path / "90909_salts.csv")
+    f_path.write_text(f_path.read_text().replace("1.97", "1.96"))
+    with caplog.at_level(logging.INFO):
+        odf_io.process_salts(["90909"], salt_dir=str(tmp_path))
+        assert "90909 salts inputs changed (salt)" in caplog.messages[2]
+    assert not pd.read_csv(tmp_path / "90909_salts.csv").equals(old_salts)
+
+    # check .csv files of all casts in a changed salt file are remade
+    other_cast = make_salt_file(stn=909, cast=10).split("\n", 1)[1]
+    f_path.write_text(f_path.read_text() + "\n" + other_cast)
+    odf_io.process_salts(["90909"], salt_dir=str(tmp_path))
+    old_salts = pd.read_csv(tmp_path / "90910_salts.csv")
+    f_path.write_text(f_path.read_text().replace("1.97", "1.96"))
+    odf_io.process_salts(["90909"], salt_dir=str(tmp_path))
+    assert not pd.read_csv(tmp_path / "90910_salts.csv").equals(old_salts)
+
     def test_print_progress_bar():
         # Test parameters
         iteration = 3
@@ -5,6 +5,7 @@ import numpy as np
 import scipy
 
 from ctdcal import oxy_fitting
+from ctdcal.tests.conftest import make_xmlcon
 
 
 def test_gather_oxy_params(caplog, tmp_path):
@@ -17,6 +18,16 @@ def test_gather_oxy_params(caplog, tmp_path):
         assert "Failed to load" in caplog.messages[0]
         assert oxy_params.isnull().values.all()
 
+def test_get_sbe_coef(tmp_path, monkeypatch):
+    dirs = {"raw": f"{tmp_path}/", "cache": f"{tmp_path}/cache/"}
+    monkeypatch.setattr(oxy_fitting.cfg, "dirs", dirs)
+    monkeypatch.setattr(oxy_fitting.process_ctd, "get_ssscc_list", lambda: ["00101"])
+    xml_config = make_xmlcon(sensors=("55", "3", "45", "55", "3", "38"))
+    Path(tmp_path / "00101.XMLCON").write_text(xml_config)
+
+    # Soc/offset are from equation 1, not the (zeroed) equation 0 values
+    assert oxy_fitting._get_sbe_coef() == (0.465, -0.495, 1.38, 0.0017, 0.036)
+
 def test_calculate_weights():
     #   Set some quick db values
     pressure = np.array([50, 150, 250, 400, 800, 1500, 2500, 5000])
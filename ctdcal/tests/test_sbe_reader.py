@@ -0,0 +1,775 @@
+import json
+import struct
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from ctdcal import convert
+from ctdcal import sbe_reader as sbe_rd
+from ctdcal.tests.conftest import (
+    make_hex,
+    make_xmlcon,
+    reader_freqs,
+    reader_volts,
+    split_hex,
+)
+
+
+def legacy_parse_scans(reader):
+    """Per-field int(x, 16) decoder that _parse_scans originally used"""
+    num_frequencies = reader_freqs(reader)
+    num_voltages = reader_volts(reader)
+    flag_spar = int(reader.config["SurfaceParVoltageAdded"])
+    unpack_str = (
+        "6s" * num_frequencies
+        + "3s" * num_voltages
+        + "2s" * flag_spar
+        + "4s" * flag_spar
+        + f"{reader.scan_length - num_voltages * 3 - num_frequencies * 6 - flag_spar * 6}s"
+    )
+    measurements = np.array(
+        [
+            [int(x, 16) for x in line][:-1]
+            for line in struct.iter_unpack(unpack_str, b"".join(reader.raw_bytes))
+        ],
+        dtype=object,
+    )
+    measurements[:, :num_frequencies] = measurements[:, :num_frequencies] / 256
+    measurements[:, num_frequencies : num_frequencies + num_voltages] = 5 * (
+        1 - (measurements[:, num_frequencies : num_frequencies + num_voltages] / 4095)
+    )
+    return measurements.astype(float)
+
+
+@pytest.mark.parametrize(
+    "flags",
+    [
+        {},
+        {"spar": 1},
+        {"freq_suppressed": 2, "volt_suppressed": 5},
+        {"nmea_pos": 0, "nmea_time": 0, "scan_time": 0},
+    ],
+)
+def test_parse_scans(flags):
+    xml_config = make_xmlcon(**flags)
+    reader = sbe_rd.SBEReader(make_hex(200, xml_config), xml_config)
+    scans = reader._parse_scans()
+
+    # vectorized decoder should match the per-field decoder exactly
+    assert scans.dtype == float
+    assert scans.shape == (
+        200,
+        reader_freqs(reader) + reader_volts(reader) + 2 * flags.get("spar", 0),
+    )
+    np.testing.assert_array_equal(scans, legacy_parse_scans(reader))
+
+
+def test_parse_scans_lowercase_hex():
+    xml_config = make_xmlcon()
+    raw_hex = make_hex(10, xml_config)
+    upper = sbe_rd.SBEReader(raw_hex, xml_config)._parse_scans()
+    lines = [
+        line if line.startswith("*") else line.lower() for line in raw_hex.splitlines()
+    ]
+    lower = sbe_rd.SBEReader("\n".join(lines), xml_config)._parse_scans()
+    np.testing.assert_array_equal(upper, lower)
+
+
+def test_parse_scans_empty():
+    xml_config = make_xmlcon()
+    reader = sbe_rd.SBEReader(make_hex(0, xml_config), xml_config)
+    assert reader._parse_scans().shape == (0, 13)
+
+
+def legacy_parse_scans_meta(reader):
+    """Decode metadata one scan at a time with the scalar SBEReader helpers"""
+    start = reader_freqs(reader) * 6 + reader_volts(reader) * 3
+    start += 6 * reader.config["SurfaceParVoltageAdded"]
+    output = []
+    for line in reader.raw_bytes:
+        pos, row = start, {}
+        if reader.config["NmeaPositionDataAdded"]:
+            tokens = [line[pos + i : pos + i + 2] for i in range(0, 14, 2)]
+            lat, lon, new_fix = reader._location_fix(*tokens).split(",")
+            row.update(GPSLAT=float(lat), GPSLON=float(lon), new_fix=new_fix == "True")
+            pos += 14
+        pos += 6 * reader.config["NmeaDepthDataAdded"]
+        if reader.config["NmeaTimeAdded"]:
+            nmea_time = reader._reverse_bytes(line[pos : pos + 8])
+            row["nmea_datetime"] = reader._sbe_time(nmea_time, "nmea")
+            pos += 8
+        row["pressure_temp_int"] = int(line[pos : pos + 3], 16)
+        row["pump_on"] = reader._pump_status(line[pos + 3 : pos + 4])
+        row["btl_fire"] = reader._bottle_fire(line[pos + 3 : pos + 4])
+        if reader.config["ScanTimeAdded"]:
+            scan_time = reader._reverse_bytes(line[pos + 6 : pos + 14])
+            row["scan_datetime"] = reader._sbe_time(scan_time, "scan")
+        output.append(row)
+    return output
+
+
+@pytest.mark.parametrize(
+    "flags",
+    [
+        {},
+        {"spar": 1, "nmea_depth": 1},
+        {"nmea_pos": 0, "nmea_time": 0},
+    ],
+)
+def test_parse_scans_meta(flags):
+    xml_config = make_xmlcon(**flags)
+    reader = sbe_rd.SBEReader(make_hex(200, xml_config), xml_config)
+    meta = reader._parse_scans_meta()
+
+    # field names/dtypes come from _breakdown_header
+    names, dtypes = reader._breakdown_header()
+    assert list(meta.dtype.names) == names
+    assert [meta.dtype[name] for name in names] == [np.dtype(x) for x in dtypes]
+
+    # vectorized decoder should match the scalar helpers exactly
+    for row, legacy_row in zip(meta, legacy_parse_scans_meta(reader)):
+        for name, value in legacy_row.items():
+            assert row[name] == value
+
+
+def test_parse_scans_meta_status():
+    xml_config = make_xmlcon(nmea_pos=0, nmea_time=0)
+    lines = make_hex(16, xml_config).splitlines()
+    header, scans = lines[:5], lines[5:]
+    status_chars = "0123456789ABCDEF"
+    scans = [s[:-11] + c + s[-10:] for s, c in zip(scans, status_chars)]
+    reader = sbe_rd.SBEReader("\n".join(header + scans), xml_config)
+    meta = reader._parse_scans_meta()
+
+    # non-numeric status chars are always treated as "pump on"
+    assert (
+        meta["pump_on"].tolist()
+        == [bool(int(c, 16) & 1) for c in "0123456789"] + [True] * 6
+    )
+    assert meta["btl_fire"].tolist() == [bool(int(c, 16) & 4) for c in status_chars]
+
+
+def test_location_fixes():
+    reader = sbe_rd.SBEReader("", make_xmlcon())
+    rng = np.random.default_rng(1)
+    fixes = [f"{x:012X}" for x in rng.integers(0, 2**48, 200)]
+    fixes = [f + f"{flag:02X}" for f, flag in zip(fixes, rng.integers(0, 256, 200))]
+    fixes[0] = "FFFFFFFFFFFFC1"  # max values, both negative
+
+    fix_chars = np.frombuffer("".join(fixes).encode(), dtype=np.uint8).reshape(-1, 14)
+    lat, lon, new_fix = reader._location_fixes(fix_chars)
+    for i, fix in enumerate(fixes):
+        pairs = [fix[j : j + 2] for j in range(0, 14, 2)]
+        expected = reader._location_fix(*pairs).split(",")
+        assert lat[i] == float(expected[0])
+        assert lon[i] == float(expected[1])
+        assert new_fix[i] == (expected[2] == "True")
+
+
+@pytest.mark.parametrize("sbe_type", ["scan", "nmea"])
+def test_sbe_times(sbe_type):
+    reader = sbe_rd.SBEReader("", make_xmlcon())
+    rng = np.random.default_rng(2)
+    times = [f"{x:08X}" for x in rng.integers(0, 2**31, 200)]
+    times[:2] = ["00000000", "FFFFFF7F"]  # epoch, largest positive int32
+
+    time_chars = np.frombuffer("".join(times).encode(), dtype=np.uint8).reshape(-1, 8)
+    epoch = reader._sbe_times(time_chars, sbe_type)
+    expected = [
+        reader._sbe_time(reader._reverse_bytes(t.encode()), sbe_type) for t in times
+    ]
+    np.testing.assert_array_equal(epoch, expected)
+
+    datetimes = reader._sbe_times(time_chars, sbe_type, datetime64=True)
+    assert datetimes.dtype == np.dtype("datetime64[s]")
+    np.testing.assert_array_equal(datetimes.astype(float), expected)
+
+    with pytest.raises(ValueError, match="8 characters"):
+        reader._sbe_times(time_chars[:, :6], sbe_type)
+    with pytest.raises(ValueError, match="nmea"):
+        reader._sbe_times(time_chars, "gps")
+
+
+def test_sbe_time_seq():
+    xml_config = make_xmlcon(scan_time=0)
+    reader = sbe_rd.SBEReader(make_hex(50, xml_config), xml_config)
+    scan_time = reader._parse_scans_meta()["scan_datetime"]
+
+    # start time is taken from the "System UTC" header line, incremented every 24 scans
+    start = 1556994164.0  # May 04 2019 18:22:44
+    np.testing.assert_array_equal(scan_time, start + np.arange(50) // 24)
+
+    # same times as datetime64, from any starting scan
+    datetimes = reader._sbe_time_seq(30, first_scan=20, datetime64=True)
+    assert datetimes.dtype == np.dtype("datetime64[s]")
+    np.testing.assert_array_equal(datetimes.astype(float), scan_time[20:])
+
+    # averaged scans are written at a lower rate, or it can be set explicitly
+    xml_averaged = xml_config.replace(
+        "<ScansToAverage>1</ScansToAverage>", "<ScansToAverage>4</ScansToAverage>"
+    )
+    reader = sbe_rd.SBEReader(make_hex(50, xml_averaged), xml_averaged)
+    assert reader.sample_rate == 6
+    np.testing.assert_array_equal(
+        reader.parsed_meta["scan_datetime"], start + np.arange(50) // 6
+    )
+    reader = sbe_rd.SBEReader(make_hex(50, xml_config), xml_config, sample_rate=8)
+    np.testing.assert_array_equal(
+        reader.parsed_meta["scan_datetime"], start + np.arange(50) // 8
+    )
+
+
+def test_scan_gaps():
+    xml_config = make_xmlcon(scan_time=0)
+    lines = make_hex(600, xml_config).splitlines()
+    header, scans = lines[:5], lines[5:]
+
+    # clean cast (incl. modulo wraparound)
+    reader = sbe_rd.SBEReader("\n".join(lines), xml_config)
+    assert len(reader.scan_gaps()) == 0
+
+    # drop 2 scans after 20, 30 after 100 and duplicate scan 400
+    scans = scans[:20] + scans[22:100] + scans[130:401] + scans[400:]
+    reader = sbe_rd.SBEReader("\n".join(header + scans), xml_config)
+    gaps = reader.scan_gaps()
+    np.testing.assert_array_equal(gaps["scan"], [20, 98, 369])
+    np.testing.assert_array_equal(gaps["n_missing"], [2, 30, -1])
+
+    # reconstructed scan times account for missing scans
+    start = 1556994164.0  # May 04 2019 18:22:44
+    scan_number = np.r_[0:20, 22:100, 130:401, 400:600]
+    scan_time = reader.parsed_meta["scan_datetime"]
+    np.testing.assert_array_equal(scan_time, start + scan_number // 24)
+    for chunk_start, (_, meta) in zip(range(0, 600, 64), reader.iter_chunks(64)):
+        np.testing.assert_array_equal(
+            meta["scan_datetime"], scan_time[chunk_start : chunk_start + 64]
+        )
+
+
+def test_decode_plan():
+    xml_config = make_xmlcon(spar=1)
+    reader = sbe_rd.SBEReader(make_hex(20, xml_config), xml_config)
+
+    # one plan per distinct layout, whatever the sensor coefficients
+    new_config = xml_config.replace("<G>4.30e-003</G>", "<G>4.40e-003</G>")
+    assert sbe_rd.SBEReader("", new_config).plan is reader.plan
+    assert sbe_rd.SBEReader("", make_xmlcon()).plan is not reader.plan
+
+    plan = reader.plan
+    assert plan.n_channels == 15
+    assert plan.meta_dtype == reader.parsed_meta.dtype
+    # contiguous channel runs are sliced, others gathered
+    assert [type(chars) for chars, _, _ in plan.channel_steps([0, 1, 2])] == [slice]
+    assert [type(chars) for chars, _, _ in plan.channel_steps([0, 2])] == [np.ndarray]
+    assert len(plan.channel_steps([4, 5, 13, 14])) == 4  # freq, volt, 2x spar
+
+    # layouts of other instruments only need registered field names
+    layout = {
+        "fields": {"voltages": [0, 6], "pressure_temp": [6, 3], "ctd_status": [9, 1]},
+        "scan_length": 10,
+    }
+    scan_bytes = np.frombuffer(b"000FFF8005", dtype=np.uint8).reshape(1, -1)
+    plan = sbe_rd.decode_plan(layout)
+    np.testing.assert_array_equal(plan.scans(scan_bytes), [[5, 0]])
+    meta = plan.meta(scan_bytes)
+    assert not plan.has_scan_time  # left for the reader to fill in
+    assert meta.dtype.names == (
+        "pressure_temp_int",
+        "pump_on",
+        "btl_fire",
+        "scan_datetime",
+    )
+    assert meta[0].tolist() == (2048, True, True, 0.0)
+
+
+@pytest.mark.parametrize("channels", [[0], [2, 4, 6], [7, 1], [1, 13, 14], []])
+def test_parse_scans_channels(channels):
+    xml_config = make_xmlcon(spar=1)
+    raw_hex = make_hex(30, xml_config)
+    full = sbe_rd.SBEReader(raw_hex, xml_config).parsed_scans
+
+    reader = sbe_rd.SBEReader(raw_hex, xml_config, channels=channels)
+    assert reader.channels == sorted(channels)
+    np.testing.assert_array_equal(reader.parsed_scans, full[:, sorted(channels)])
+
+    # changing the selection clears the cache
+    reader.channels = None
+    np.testing.assert_array_equal(reader.parsed_scans, full)
+
+    with pytest.raises(ValueError, match="between 0 and 14"):
+        reader.channels = [15]
+
+
+def test_parsed_cache(monkeypatch):
+    xml_config = make_xmlcon()
+    reader = sbe_rd.SBEReader(make_hex(20, xml_config), xml_config)
+
+    # count decode passes
+    calls = {"_parse_scans": 0, "_parse_scans_meta": 0}
+    for name in calls:
+
+        def counter(func=getattr(reader, name), name=name):
+            calls[name] += 1
+            return func()
+
+        monkeypatch.setattr(reader, name, counter)
+
+    # repeated access (including a full conversion) decodes each block once
+    reader.parsed_scans, reader.parsed_meta
+    convert.convertFromSBEReader(reader, "00101")
+    assert reader.parsed_scans is reader.parsed_scans
+    assert calls == {"_parse_scans": 1, "_parse_scans_meta": 1}
+
+    # clearing the cache forces a new decode
+    reader.clear_cache()
+    assert reader._parsed_scans is None and reader._parsed_meta is None
+    reader.parsed_scans, reader.parsed_meta
+    assert calls == {"_parse_scans": 2, "_parse_scans_meta": 2}
+
+
+def test_parse_xmlcon_cache(tmp_path, monkeypatch):
+    xml_config = make_xmlcon(spar=1, nmea_depth=1)
+    monkeypatch.setattr(sbe_rd, "_xmlcon_cache", {})
+    config, layout = sbe_rd.parse_xmlcon(xml_config, cache_dir=tmp_path)
+    reader = sbe_rd.SBEReader("", xml_config)
+    assert config == reader.config
+    assert layout["scan_length"] == reader.calculate_scan_byte_length()
+    assert list(layout["fields"]) == [
+        "frequencies",
+        "voltages",
+        "spar",
+        "nmea_pos",
+        "nmea_depth",
+        "nmea_time",
+        "pressure_temp",
+        "ctd_status",
+        "modulo",
+        "scan_time",
+    ]
+
+    # returned dicts are copies, edits don't leak into the cache
+    config["Sensors"][0]["G"] = 0
+    assert sbe_rd.parse_xmlcon(xml_config)[0]["Sensors"][0]["G"] == 4.30e-3
+
+    # a new process reads the stored parse instead of the .XMLCON
+    cache_file = tmp_path / "xmlcon" / f"{sbe_rd.xmlcon_hash(xml_config)}.json"
+    assert cache_file.exists()
+    monkeypatch.setattr(sbe_rd, "_xmlcon_cache", {})
+    monkeypatch.setattr(sbe_rd, "_parse_xmlcon", None)
+    assert sbe_rd.parse_xmlcon(xml_config, cache_dir=tmp_path) == (
+        reader.config,
+        layout,
+    )
+
+    # files cached by another version of the parser are parsed again
+    monkeypatch.undo()
+    cached = json.loads(cache_file.read_text())
+    del cached["version"], cached["config"]["ScansToAverage"]
+    cache_file.write_text(json.dumps(cached))
+    monkeypatch.setattr(sbe_rd, "_xmlcon_cache", {})
+    assert sbe_rd.parse_xmlcon(xml_config, cache_dir=tmp_path)[0] == reader.config
+    cached = json.loads(cache_file.read_text())
+    assert cached["version"] == sbe_rd._XMLCON_CACHE_VERSION
+    assert "ScansToAverage" in cached["config"]
+
+
+def test_to_from_dict():
+    xml_config = make_xmlcon(scan_time=0)
+    reader = sbe_rd.SBEReader(make_hex(20, xml_config), xml_config)
+
+    # decoded arrays are carried instead of the raw hex
+    data = reader.to_dict()
+    assert "raw_hex" not in data
+    restored = sbe_rd.SBEReader.from_dict(data)
+    assert restored.config == reader.config
+    np.testing.assert_array_equal(restored.parsed_scans, reader.parsed_scans)
+    np.testing.assert_array_equal(restored.parsed_meta, reader.parsed_meta)
+
+    # raw hex can still be exported/imported without decoding
+    data = reader.to_dict(parse_cache=False)
+    assert data["raw_hex"] == reader.raw_hex
+    restored = sbe_rd.SBEReader.from_dict(data)
+    assert restored._parsed_scans is None
+    np.testing.assert_array_equal(restored.parsed_meta, reader.parsed_meta)
+
+
+def test_to_from_npz(tmp_path):
+    xml_config = make_xmlcon(scan_time=0)
+    lines = make_hex(50, xml_config).splitlines()
+    del lines[20:23]  # scan gaps are saved too
+    reader = sbe_rd.SBEReader("\n".join(lines), xml_config, channels=[0, 2])
+    reader.to_npz(tmp_path / "00101.npz")
+
+    restored = sbe_rd.SBEReader.from_npz(tmp_path / "00101.npz")
+    assert restored.raw_comments == reader.raw_comments
+    assert restored.channels == [0, 2]
+    np.testing.assert_array_equal(restored.parsed_scans, reader.parsed_scans)
+    np.testing.assert_array_equal(restored.parsed_meta, reader.parsed_meta)
+    np.testing.assert_array_equal(restored.scan_gaps(), reader.scan_gaps())
+
+    # new coefficients are fine, a different scan layout is not
+    new_config = xml_config.replace("<G>4.30e-003</G>", "<G>4.40e-003</G>")
+    restored = sbe_rd.SBEReader.from_npz(tmp_path / "00101.npz", new_config)
+    assert restored.config["Sensors"][0]["G"] == 4.40e-3
+    with pytest.raises(ValueError, match="Scan layout"):
+        sbe_rd.SBEReader.from_npz(tmp_path / "00101.npz", make_xmlcon(scan_time=1))
+
+
+def test_from_npz_no_parsing(tmp_path, monkeypatch):
+    xml_config = make_xmlcon(spar=1)
+    reader = sbe_rd.SBEReader(make_hex(50, xml_config), xml_config, sample_rate=12)
+    reader.to_npz(tmp_path / "00101.npz")
+
+    # config, layout and header come from the file, nothing is parsed or checked
+    def fail(*args, **kwargs):
+        raise AssertionError("should not be called")
+
+    monkeypatch.setattr(sbe_rd, "parse_xmlcon", fail)
+    monkeypatch.setattr(sbe_rd.SBEReader, "_load_hex", fail)
+    monkeypatch.setattr(sbe_rd.SBEReader, "_check_scan_lengths", fail)
+    restored = sbe_rd.SBEReader.from_npz(tmp_path / "00101.npz")
+    assert restored.config == reader.config
+    assert restored.layout == reader.layout
+    assert restored.sample_rate == 12
+    np.testing.assert_array_equal(restored.parsed_scans, reader.parsed_scans)
+    monkeypatch.undo()
+
+    # files from newer versions are rejected, unversioned files are re-parsed
+    with np.load(tmp_path / "00101.npz") as npz:
+        arrays = dict(npz)
+    arrays["format_version"] = np.array(sbe_rd._NPZ_VERSION + 1)
+    np.savez(tmp_path / "00102.npz", **arrays)
+    with pytest.raises(ValueError, match="format version"):
+        sbe_rd.SBEReader.from_npz(tmp_path / "00102.npz")
+
+    for key in ["format_version", "config", "layout", "sample_rate", "bad_scans"]:
+        del arrays[key]
+    np.savez(tmp_path / "00103.npz", **arrays)
+    restored = sbe_rd.SBEReader.from_npz(tmp_path / "00103.npz")
+    assert restored.config == reader.config
+    assert restored.sample_rate == 24
+    np.testing.assert_array_equal(restored.parsed_meta, reader.parsed_meta)
+
+
+@pytest.mark.parametrize("newline", ["\r\n", "\n"])
+def test_from_paths_mmap(tmp_path, newline):
+    xml_config = make_xmlcon(scan_time=0)
+    raw_hex = make_hex(100, xml_config).replace("\r\n", newline)
+    with open(tmp_path / "00101.hex", "w", newline="") as f:
+        f.write(raw_hex)
+    with open(tmp_path / "00101.XMLCON", "w") as f:
+        f.write(xml_config)
+
+    text = sbe_rd.SBEReader.from_paths(
+        tmp_path / "00101.hex", tmp_path / "00101.XMLCON"
+    )
+    mapped = sbe_rd.SBEReader.from_paths(
+        tmp_path / "00101.hex", tmp_path / "00101.XMLCON", mmap=True
+    )
+
+    # scans are a strided view of the mapped file, not a copy
+    assert mapped.raw_hex is None
+    assert not mapped._scan_bytes.flags.owndata
+    assert mapped._scan_bytes.strides == (text.scan_length + len(newline), 1)
+
+    # header is only parsed when needed
+    assert mapped._raw_comments is None
+    np.testing.assert_array_equal(mapped.parsed_scans, text.parsed_scans)
+    np.testing.assert_array_equal(mapped.parsed_meta, text.parsed_meta)
+    assert mapped.raw_comments == text.raw_comments
+
+
+@pytest.mark.parametrize("flags", [{}, {"scan_time": 0}])
+def test_parse_parallel(tmp_path, flags):
+    xml_config = make_xmlcon(**flags)
+    with open(tmp_path / "00101.XMLCON", "w") as f:
+        f.write(xml_config)
+    lines = make_hex(1000, xml_config).splitlines()
+    # drop some scans, so reconstructed times depend on the scan gaps
+    lines = lines[:300] + lines[340:]
+    with open(tmp_path / "00101.hex", "w", newline="") as f:
+        f.write("\r\n".join(lines) + "\r\n")
+
+    def read(**kwargs):
+        return sbe_rd.SBEReader.from_paths(
+            tmp_path / "00101.hex", tmp_path / "00101.XMLCON", mmap=True, **kwargs
+        )
+
+    serial = read()
+    parallel = read(workers=3)
+    assert parallel._can_parallelize()
+    np.testing.assert_array_equal(parallel.parsed_scans, serial.parsed_scans)
+    np.testing.assert_array_equal(parallel.parsed_meta, serial.parsed_meta)
+
+    # channel selection is applied in the workers too
+    parallel = read(workers=4, channels=[2, 7])
+    np.testing.assert_array_equal(parallel.parsed_scans, serial.parsed_scans[:, [2, 7]])
+
+    # text readers (no memory map) fall back to a single process
+    text = sbe_rd.SBEReader("\n".join(lines), xml_config, workers=3)
+    assert not text._can_parallelize()
+    np.testing.assert_array_equal(text.parsed_meta, serial.parsed_meta)
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_from_paths_whitespace(tmp_path, mmap):
+    xml_config = make_xmlcon()
+    with open(tmp_path / "00101.XMLCON", "w") as f:
+        f.write(xml_config)
+    lines = make_hex(10, xml_config).splitlines()
+    clean = sbe_rd.SBEReader("\n".join(lines), xml_config)
+
+    def read():
+        return sbe_rd.SBEReader.from_paths(
+            tmp_path / "00101.hex", tmp_path / "00101.XMLCON", mmap=mmap
+        )
+
+    # CRLF file with trailing spaces on every line (constant stride)
+    with open(tmp_path / "00101.hex", "w", newline="") as f:
+        f.write("  \r\n".join(lines) + "  \r\n")
+    reader = read()
+    np.testing.assert_array_equal(reader.parsed_scans, clean.parsed_scans)
+    np.testing.assert_array_equal(reader.parsed_meta, clean.parsed_meta)
+
+    # ... and on some lines only, plus a stray \r and a leading tab
+    lines[6] += " "
+    lines[8] += "\r"
+    lines[9] = "\t" + lines[9] + " \t"
+    with open(tmp_path / "00101.hex", "w", newline="") as f:
+        f.write("\r\n".join(lines) + "\r\n")
+    reader = read()
+    np.testing.assert_array_equal(reader.parsed_scans, clean.parsed_scans)
+    np.testing.assert_array_equal(reader.parsed_meta, clean.parsed_meta)
+
+
+def test_from_paths_mmap_bad_length(tmp_path):
+    xml_config = make_xmlcon()
+    with open(tmp_path / "00101.XMLCON", "w") as f:
+        f.write(xml_config)
+    lines = make_hex(10, xml_config).splitlines()
+
+    # a scan line which is too short
+    with open(tmp_path / "00101.hex", "w") as f:
+        f.write("\n".join(lines[:8] + [lines[8][:-1]] + lines[9:]))
+    with pytest.raises(ValueError, match="data length does not match"):
+        sbe_rd.SBEReader.from_paths(
+            tmp_path / "00101.hex", tmp_path / "00101.XMLCON", mmap=True
+        )
+
+    # partial line at the end of the file
+    with open(tmp_path / "00101.hex", "w") as f:
+        f.write("\n".join(lines) + "\n" + lines[-1][:10])
+    with pytest.raises(ValueError, match="data length does not match"):
+        sbe_rd.SBEReader.from_paths(
+            tmp_path / "00101.hex", tmp_path / "00101.XMLCON", mmap=True
+        )
+
+    # missing header
+    with open(tmp_path / "00101.hex", "w") as f:
+        f.write("\n".join(lines[5:]))
+    with pytest.raises(ValueError, match="END"):
+        sbe_rd.SBEReader.from_paths(
+            tmp_path / "00101.hex", tmp_path / "00101.XMLCON", mmap=True
+        )
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+@pytest.mark.parametrize("newline", ["\r\n", "\n"])
+def test_salvage(tmp_path, mmap, newline):
+    xml_config = make_xmlcon(scan_time=0)
+    with open(tmp_path / "00101.XMLCON", "w") as f:
+        f.write(xml_config)
+    lines = make_hex(10, xml_config).splitlines()
+    clean = sbe_rd.SBEReader("\n".join(lines), xml_config)
+
+    # corrupt the first, a middle, and the last (partial) scan lines, and garble
+    # one of the right length
+    lines[5] = lines[5][:-3]
+    lines[9] = lines[9] + "0F"
+    lines[11] = lines[11][:-2] + "?F"
+    lines[14] = lines[14][:10]
+    with open(tmp_path / "00101.hex", "w", newline="") as f:
+        f.write(newline.join(lines) + newline)
+
+    def read(salvage=None):
+        return sbe_rd.SBEReader.from_paths(
+            tmp_path / "00101.hex",
+            tmp_path / "00101.XMLCON",
+            mmap=mmap,
+            salvage=salvage,
+        )
+
+    with pytest.raises(ValueError, match=r"bad scans: \[0, 4, 9\]"):
+        read()
+
+    good = [1, 2, 3, 5, 7, 8]
+    reader = read("drop")
+    np.testing.assert_array_equal(reader.bad_scans, [0, 4, 6, 9])
+    np.testing.assert_array_equal(reader.parsed_scans, clean.parsed_scans[good])
+
+    reader = read("nan")
+    assert reader.n_scans == 10
+    scans, meta = reader.parsed_scans, reader.parsed_meta
+    assert np.isnan(scans[[0, 4, 6, 9]]).all()
+    np.testing.assert_array_equal(scans[good], clean.parsed_scans[good])
+    assert np.isnan(meta["GPSLAT"][[0, 4, 6, 9]]).all()
+    # scan times are reconstructed from position, so still valid
+    np.testing.assert_array_equal(
+        meta["scan_datetime"], clean.parsed_meta["scan_datetime"]
+    )
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_non_hex_characters(tmp_path, mmap):
+    xml_config = make_xmlcon()
+    with open(tmp_path / "00101.XMLCON", "w") as f:
+        f.write(xml_config)
+    lines = make_hex(10, xml_config).splitlines()
+
+    # garbled characters in scan lines of the right length are not decoded
+    lines[8] = "Z" + lines[8][1:]
+    lines[12] = lines[12][:20] + "g" + lines[12][21:]
+    with open(tmp_path / "00101.hex", "w") as f:
+        f.write("\n".join(lines) + "\n")
+    with pytest.raises(ValueError, match=r"non-hex characters \(bad scans: \[3, 7\]\)"):
+        sbe_rd.SBEReader.from_paths(
+            tmp_path / "00101.hex", tmp_path / "00101.XMLCON", mmap=mmap
+        )
+
+    follower = sbe_rd.HexFollower(tmp_path / "00101.hex", tmp_path / "00101.XMLCON")
+    with pytest.raises(ValueError, match="non-hex characters"):
+        follower.poll()
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_from_paths_stitched(tmp_path, mmap):
+    xml_config = make_xmlcon(scan_time=0)
+    with open(tmp_path / "00101.XMLCON", "w") as f:
+        f.write(xml_config)
+    raw_hex = make_hex(3000, xml_config)
+    full = sbe_rd.SBEReader(raw_hex, xml_config)
+
+    # lose 60 scans (< 256) and 700 scans (modulo wraps) in two restarts
+    paths = [tmp_path / name for name in ["00101.hex", "00101a.hex", "00101b.hex"]]
+    for path, text in zip(paths, split_hex(raw_hex, [(200, 260), (1000, 1700)])):
+        with open(path, "w", newline="") as f:
+            f.write(text)
+    reader = sbe_rd.SBEReader.from_paths(paths, tmp_path / "00101.XMLCON", mmap=mmap)
+
+    kept = np.r_[0:200, 260:1000, 1700:3000]
+    assert reader.n_scans == len(kept)
+    np.testing.assert_array_equal(reader.parsed_scans, full.parsed_scans[kept])
+    gaps = reader.scan_gaps()
+    np.testing.assert_array_equal(gaps["scan"], [200, 940])
+    np.testing.assert_array_equal(gaps["n_missing"], [60, 700])
+
+    # reconstructed times continue across files
+    meta = reader.parsed_meta
+    np.testing.assert_array_equal(
+        meta["scan_datetime"], full.parsed_meta["scan_datetime"][kept]
+    )
+    chunks = [chunk_meta for _, chunk_meta in reader.iter_chunks(150)]
+    np.testing.assert_array_equal(np.concatenate(chunks), meta)
+
+
+@pytest.mark.parametrize("flags", [{}, {"scan_time": 0}])
+def test_iter_chunks(flags):
+    xml_config = make_xmlcon(**flags)
+    reader = sbe_rd.SBEReader(make_hex(100, xml_config), xml_config)
+    chunks = list(reader.iter_chunks(30))
+    assert [len(meta) for _, meta in chunks] == [30, 30, 30, 10]
+    assert reader._parsed_scans is None  # chunks are not cached
+
+    np.testing.assert_array_equal(
+        np.concatenate([scans for scans, _ in chunks]), reader.parsed_scans
+    )
+    np.testing.assert_array_equal(
+        np.concatenate([meta for _, meta in chunks]), reader.parsed_meta
+    )
+
+    # already decoded readers are sliced instead of re-decoded
+    assert all(
+        np.shares_memory(scans, reader.parsed_scans)
+        for scans, _ in reader.iter_chunks(30)
+    )
+
+    with pytest.raises(ValueError, match="positive"):
+        next(reader.iter_chunks(0))
+
+
+def test_iter_chunks_memory_limit(tmp_path):
+    memory_limit = 8 * 2**20  # bytes
+    xml_config = make_xmlcon()
+    scan_length = sbe_rd.SBEReader("", xml_config).scan_length
+
+    # random hex file, larger than the memory limit
+    n_scans = 2 * memory_limit // scan_length
+    digits = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+    lines = np.full((n_scans, scan_length + 2), ord("\r"), dtype=np.uint8)
+    lines[:, :scan_length] = np.random.default_rng(0).choice(
+        digits, lines[:, :-2].shape
+    )
+    lines[:, -1] = ord("\n")
+    with open(tmp_path / "00101.hex", "wb") as f:
+        f.write(make_hex(0, xml_config).encode())
+        f.write(lines.tobytes())
+    with open(tmp_path / "00101.XMLCON", "w") as f:
+        f.write(xml_config)
+    del lines
+    assert (tmp_path / "00101.hex").stat().st_size > memory_limit
+
+    tracemalloc.start()
+    reader = sbe_rd.SBEReader.from_paths(
+        tmp_path / "00101.hex", tmp_path / "00101.XMLCON", mmap=True
+    )
+    total_scans, freq_sum = 0, 0
+    for scans, meta in reader.iter_chunks(10_000):
+        total_scans += len(meta)
+        freq_sum += scans[:, 0].sum()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert total_scans == n_scans
+    assert peak < memory_limit
+    assert freq_sum == pytest.approx(reader.parsed_scans[:, 0].sum())
+
+
+def test_hex_follower(tmp_path):
+    xml_config = make_xmlcon(scan_time=0)
+    raw_hex = make_hex(50, xml_config).encode()
+    with open(tmp_path / "00101.XMLCON", "w") as f:
+        f.write(xml_config)
+    hex_file = tmp_path / "00101.hex"
+    hex_file.touch()
+    follower = sbe_rd.HexFollower(hex_file, tmp_path / "00101.XMLCON")
+
+    # simulate acquisition by appending uneven pieces of the file
+    header_end = raw_hex.find(b"*END*")
+    pieces = [0, 10, header_end, header_end + 200, header_end + 201, 1000, 3000]
+    pieces += [len(raw_hex)]
+    results = []
+    for start, stop in zip(pieces[:-1], pieces[1:]):
+        with open(hex_file, "ab") as f:
+            f.write(raw_hex[start:stop])
+        results.append(follower.poll())
+
+        # only complete lines are consumed, i.e. (# of newlines - 5 header lines)
+        complete_lines = raw_hex.count(b"\n", 0, stop)
+        assert follower.n_scans == max(complete_lines - 5, 0)
+        if follower.header_complete:
+            assert follower.offset == raw_hex.rfind(b"\n", 0, stop) + 1
+    assert [len(meta) for _, meta in results] == [0, 0, 2, 0, 8, 24, 16]
+    assert follower.n_scans == 50
+
+    # nothing new to read
+    scans, meta = follower.poll()
+    assert len(scans) == len(meta) == 0
+
+    reader = sbe_rd.SBEReader(raw_hex.decode(), xml_config)
+    np.testing.assert_array_equal(
+        np.concatenate([scans for scans, _ in results]), reader.parsed_scans
+    )
+    np.testing.assert_array_equal(
+        np.concatenate([meta for _, meta in results]), reader.parsed_meta
+    )
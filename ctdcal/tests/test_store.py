@@ -0,0 +1,128 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ctdcal import store
+
+
+@pytest.fixture
+def cast_df():
+    return pd.DataFrame(
+        {
+            "CTDPRS": np.linspace(0, 100, 50),
+            "CTDTMP1": np.linspace(20, 5, 50),
+            "pump_on": np.arange(50) > 10,
+            "pressure_temp_int": np.full(50, 2280, dtype=np.int64),
+            "odd name/1": np.zeros(50),
+        }
+    )
+
+
+def test_save_load(tmp_path, cast_df):
+    path = tmp_path / "00101"
+    assert not store.exists(path)
+    store.save(cast_df, path)
+    assert store.exists(path)
+    assert store.columns(path) == cast_df.columns.tolist()
+    assert (path / "CTDPRS.npy").exists()
+
+    for mmap in [True, False]:
+        pd.testing.assert_frame_equal(store.load(path, mmap=mmap), cast_df)
+
+    # column projection, in the requested order
+    df = store.load(path, columns=["pump_on", "CTDPRS"])
+    pd.testing.assert_frame_equal(df, cast_df[["pump_on", "CTDPRS"]])
+    with pytest.raises(KeyError, match="CTDSAL"):
+        store.load(path, columns=["CTDSAL"])
+
+    # edits to a mapped DataFrame do not change the stored data
+    df.loc[0:5, "CTDPRS"] = -1
+    pd.testing.assert_frame_equal(store.load(path), cast_df)
+
+    # non-default index, object columns of one type
+    trimmed_df = cast_df[10:30].copy()
+    trimmed_df["flag"] = ["a"] * 20
+    store.save(trimmed_df, path)
+    assert store.columns(path)[-1] == "flag"
+    pd.testing.assert_frame_equal(
+        store.load(path), trimmed_df.astype({"flag": "str"}), check_dtype=False
+    )
+
+    trimmed_df["flag"] = [1.0, "a"] * 10
+    with pytest.raises(TypeError, match="mixed types"):
+        store.save(trimmed_df, path)
+
+    store.remove(path)
+    assert not store.exists(path) and not path.exists()
+
+
+def test_compact(cast_df):
+    patterns = {"CTDTMP*": "float32", "pressure_*": "int16", "CTD*": "int16"}
+    assert store.column_dtypes(cast_df.columns, patterns) == {
+        "CTDPRS": np.int16,
+        "CTDTMP1": np.float32,
+        "pressure_temp_int": np.int16,
+    }
+
+    df = store.compact(cast_df, {"CTDTMP*": "float32", "pressure_*": "int16"})
+    assert df["CTDTMP1"].dtype == np.float32
+    assert df["pressure_temp_int"].dtype == np.int16
+    assert df["CTDPRS"].dtype == np.float64
+    assert store.compact(df, {"CTDTMP*": "float32"}) is df  # nothing to cast
+
+    # only cast to integers/bools without loss (no NaN, overflow or fractions)
+    cast_df["pressure_temp_int"] = cast_df["pressure_temp_int"].astype(float)
+    cast_df["pump_on"] = cast_df["pump_on"].astype(float)
+    df = store.compact(cast_df, {"pressure_*": "int16", "pump_on": "bool"})
+    assert df["pressure_temp_int"].dtype == np.int16
+    assert df["pump_on"].dtype == bool
+
+    cast_df.loc[0, "pressure_temp_int"] = np.nan
+    cast_df.loc[1, "pump_on"] = 0.5
+    df = store.compact(cast_df, {"pressure_*": "int16", "pump_on": "bool"})
+    assert df["pressure_temp_int"].dtype == np.float64
+    assert df["pump_on"].dtype == np.float64
+    overflow_df = cast_df[["pressure_temp_int"]].fillna(0) * 100
+    assert store.compact(overflow_df, {"pressure_*": "int16"}) is overflow_df
+
+
+def test_newer_version(tmp_path, cast_df):
+    store.save(cast_df, tmp_path / "00101")
+    meta_file = tmp_path / "00101" / "columns.json"
+    meta = json.loads(meta_file.read_text())
+    meta["version"] += 1
+    meta_file.write_text(json.dumps(meta))
+    with pytest.raises(ValueError, match="newer version"):
+        store.load(tmp_path / "00101")
+
+
+def test_legacy_pickle(tmp_path, cast_df):
+    cast_df.to_pickle(tmp_path / "00101.pkl")
+    assert store.exists(tmp_path / "00101")
+    pd.testing.assert_frame_equal(store.load(tmp_path / "00101"), cast_df)
+    pd.testing.assert_frame_equal(store.load(tmp_path / "00101.pkl"), cast_df)
+    df = store.load(tmp_path / "00101", columns=["CTDPRS"])
+    pd.testing.assert_frame_equal(df, cast_df[["CTDPRS"]])
+
+    # saving replaces the pickle
+    store.save(cast_df, tmp_path / "00101")
+    assert not (tmp_path / "00101.pkl").exists()
+
+    with pytest.raises(FileNotFoundError):
+        store.load(tmp_path / "00201")
+
+
+def test_glob(tmp_path, cast_df):
+    store.save(cast_df, tmp_path / "00101_btl_mean")
+    cast_df.to_pickle(tmp_path / "00201_btl_mean.pkl")
+    store.save(cast_df, tmp_path / "00301_btl_mean")
+    cast_df.to_pickle(tmp_path / "00301_btl_mean.pkl")  # listed once
+    store.save(cast_df, tmp_path / "00101_time")
+    (tmp_path / "00401_btl_mean").mkdir()  # incomplete store
+
+    assert store.glob(tmp_path, "*_btl_mean") == [
+        tmp_path / f"{ssscc}_btl_mean" for ssscc in ["00101", "00201", "00301"]
+    ]
+    assert len(store.glob(tmp_path)) == 4
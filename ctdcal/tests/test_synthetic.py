@@ -0,0 +1,99 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from ctdcal import convert
+from ctdcal import sbe_reader as sbe_rd
+from ctdcal import store, synthetic
+from ctdcal.tests.conftest import make_xmlcon
+
+SENSORS = ("55", "3", "45", "55", "3", "38")
+
+
+def test_hex_chars():
+    rng = np.random.default_rng(0)
+    words = rng.integers(0, 2**24, (50, 3))
+    chars = synthetic._hex_chars(words, 6)
+    assert chars.shape == (50, 18)
+    np.testing.assert_array_equal(
+        sbe_rd._hex_words(sbe_rd._hex_nibbles(chars), 6), words
+    )
+
+    times = rng.integers(0, 2**32, 50)
+    chars = synthetic._hex_chars_lsb(times, 4)
+    np.testing.assert_array_equal(
+        sbe_rd._hex_words_lsb(sbe_rd._hex_nibbles(chars)), times
+    )
+
+
+@pytest.mark.parametrize(
+    "flags",
+    [{}, {"spar": 1, "nmea_depth": 1}, {"nmea_pos": 0, "nmea_time": 0, "scan_time": 0}],
+)
+def test_write_hex(tmp_path, flags):
+    # SBE43 conversion needs GPS position
+    sensors = SENSORS if flags.get("nmea_pos", 1) else SENSORS[:-1]
+    xml_config = make_xmlcon(sensors=sensors, **flags)
+    profile = synthetic.cast_profile(max_pressure=200, n_bottles=3, seed=1)
+    start_time = datetime.datetime(2021, 3, 1, 12, 0, 0)
+    raw = synthetic.raw_counts(xml_config, profile, start_time=start_time)
+    synthetic.write_hex(tmp_path / "00101.hex", xml_config, raw, start_time=start_time)
+
+    reader = sbe_rd.SBEReader(
+        (tmp_path / "00101.hex").read_text(encoding="cp437"), xml_config
+    )
+    assert reader.n_scans == len(profile)
+    assert len(reader.scan_gaps()) == 0
+
+    # generated metadata decodes back exactly
+    meta = reader.parsed_meta
+    np.testing.assert_array_equal(meta["pump_on"], profile["pump_on"])
+    np.testing.assert_array_equal(meta["btl_fire"], profile["btl_fire"])
+    np.testing.assert_array_equal(meta["scan_datetime"], raw["scan_datetime"])
+    assert meta["scan_datetime"][0] == 1614600000.0  # 2021-03-01 12:00:00
+    if "GPSLAT" in meta.dtype.names:
+        np.testing.assert_array_equal(meta["GPSLAT"], 32.7)
+        np.testing.assert_array_equal(meta["GPSLON"], -117.2)
+
+    # sensor conversions recover the profile, to within raw count resolution
+    converted = convert.convertFromSBEReader(reader, "00101")
+    np.testing.assert_allclose(converted["CTDPRS"], profile["CTDPRS"], atol=0.01)
+    np.testing.assert_allclose(converted["CTDTMP1"], profile["CTDTMP"], atol=1e-3)
+    np.testing.assert_allclose(converted["CTDTMP2"], profile["CTDTMP"], atol=1e-3)
+    np.testing.assert_allclose(converted["CTDSAL"], profile["CTDSAL"], atol=1e-3)
+    if "CTDOXYVOLTS" in converted:
+        np.testing.assert_allclose(
+            converted["CTDOXYVOLTS"], profile["CTDOXYVOLTS"], atol=5 / 4095
+        )
+
+
+def test_cast_profile():
+    profile = synthetic.cast_profile(max_pressure=500, n_bottles=4, bottle_stop=20)
+    assert profile["CTDPRS"].max() == pytest.approx(500, abs=0.1)
+    assert not profile["pump_on"].iloc[0] and profile["pump_on"].iloc[-1]
+
+    # one 1.5 second bottle fire per stop
+    fires = np.flatnonzero(np.diff(profile["btl_fire"].astype(int)) == 1)
+    assert len(fires) == 4
+    assert profile["btl_fire"].sum() == 4 * 36
+
+
+def test_make_cruise(data_dirs):
+    xml_config = make_xmlcon(sensors=SENSORS)
+    ssscc_list = synthetic.make_cruise(
+        data_dirs["raw"], xml_config, 3, max_pressure=100, n_bottles=2
+    )
+    assert ssscc_list == ["00101", "00201", "00301"]
+
+    convert.hex_to_ctd(ssscc_list)
+    for ssscc in ssscc_list:
+        converted = store.load(data_dirs["converted"] + ssscc)
+        assert converted["CTDPRS"].max() == pytest.approx(100, abs=0.1)
+        assert converted["btl_fire"].any()
+
+    convert.make_btl_mean(ssscc_list)
+    btl_mean = store.load(data_dirs["bottle"] + "00101_btl_mean")
+    np.testing.assert_allclose(btl_mean["CTDPRS"], [100, 5], atol=0.01)
+    assert btl_mean["CTDPRS"].dtype == np.float64
+    assert btl_mean["CTDOXYVOLTS"].dtype == np.float32  # see config ctd_dtypes
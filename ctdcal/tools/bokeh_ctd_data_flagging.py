@@ -1,6 +1,5 @@
 import pandas as pd
 import glob
-import pickle
 import gsw
 
 from bokeh.io import curdoc
@@ -19,6 +18,10 @@ from bokeh.models import (
     BoxSelectTool,
 )
 
+from ctdcal import get_ctdcal_config, store
+
+cfg = get_ctdcal_config()
+
 # TODO: abstract parts of this to a separate file
 # TODO: following above, make parts reusable?
 
@@ -29,20 +32,20 @@ ctd_data = []
 for f in file_list:
     print(f"Loading {f}")
     df = pd.read_csv(f, header=12, skiprows=[13], skipfooter=1, engine="python")
+    df = store.compact(df, cfg.ctd_dtypes)  # e.g. float32 CTDXMISS, int16 flags
     df["SSSCC"] = f.strip("../../data/pressure/")[:5]
     ctd_data.append(df)
 ctd_data = pd.concat(ctd_data, axis=0, sort=False)
 
 # load bottle trip file
-file_list = sorted(glob.glob("../../data/bottle/*.pkl"))
-ssscc_list = [ssscc.strip("../../data/bottle/")[:5] for ssscc in file_list]
+file_list = store.glob("../../data/bottle", "*_btl_mean")  # incl. legacy .pkl
+ssscc_list = [f.name[:5] for f in file_list]
 upcast_data = []
 for f in file_list:
-    with open(f, "rb") as x:
-        df = pickle.load(x)
-        df["SSSCC"] = f.strip("../../data/bottle/")[:5]
-        # change to secondary if that is what's used
-        upcast_data.append(df[["SSSCC", "CTDCOND1", "CTDTMP1", "CTDPRS"]])
+    # change to secondary if that is what's used
+    df = store.load(f, columns=["CTDCOND1", "CTDTMP1", "CTDPRS"])
+    df.insert(0, "SSSCC", f.name[:5])
+    upcast_data.append(df)
 upcast_data = pd.concat(upcast_data, axis=0, sort=False)
 upcast_data["CTDSAL"] = gsw.SP_from_C(
     upcast_data["CTDCOND1"], upcast_data["CTDTMP1"], upcast_data["CTDPRS"]